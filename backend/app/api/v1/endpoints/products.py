@@ -1,44 +1,100 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+import hashlib
+import time
+from fastapi import APIRouter, Depends, Header, Query, HTTPException, Request, status
 from typing import Optional, List
+from app.core.config import settings
 from app.models.user import User
 from app.utils.dependencies import get_optional_user, get_current_verified_user
-from app.services.product_service import ProductService
+from app.services.product_service import ProductService, catalog_generation, EMPTY_LISTING_PREFIX
+from app.services.suggest_service import product_suggestions
+from app.services.product_serializer import to_product_response, to_product_detail_response, product_etag
+from app.utils.responses import FastJSONResponse
+from app.utils.etag import INSTANCE_ID, weak_etag, cache_headers, check_not_modified
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate, 
     ProductFilters,
     ProductSort,
+    CountStrategy,
     ProductListResponse,
+    ProductFacetsResponse,
     ProductResponse,
     ProductDetailResponse,
     CategoryResponse,
-    BrandResponse
+    BrandResponse,
+    ProductSuggestion,
+    ProductImportFormat,
+    ProductImportResponse,
+    ProductBulkUpdate,
+    ProductBulkUpdateResponse
 )
 
-router = APIRouter()
+# Product payloads are built without validation and rendered with orjson;
+# routes return FastJSONResponse directly so FastAPI does not re-validate them
+router = APIRouter(default_response_class=FastJSONResponse)
 
-@router.get("/", response_model=ProductListResponse)
-async def get_products(
-    page: int = Query(1, ge=1, description="Page number"),
-    size: int = Query(20, ge=1, le=100, description="Items per page"),
-    sort: ProductSort = Query(ProductSort.RELEVANCE, description="Sort option"),
-    
-    # Filters
+IMPORT_CONTENT_TYPES = {
+    "application/x-ndjson": ProductImportFormat.NDJSON,
+    "application/jsonl": ProductImportFormat.NDJSON,
+    "text/csv": ProductImportFormat.CSV
+}
+
+def get_product_filters(
     category: Optional[str] = Query(None, description="Filter by category"),
     subcategory: Optional[str] = Query(None, description="Filter by subcategory"),
     boutique_id: Optional[str] = Query(None, description="Filter by boutique"),
     brand: Optional[str] = Query(None, description="Filter by brand"),
     min_price: Optional[float] = Query(None, ge=0, description="Minimum price"),
     max_price: Optional[float] = Query(None, ge=0, description="Maximum price"),
-    color: Optional[str] = Query(None, description="Filter by color"),
-    size: Optional[str] = Query(None, description="Filter by size"),
+    color: Optional[str] = Query(None, description="Filter by color (comma-separated to match any)"),
+    size: Optional[str] = Query(None, alias="product_size", description="Filter by size (comma-separated to match any)"),
     condition: Optional[str] = Query(None, description="Filter by condition"),
     search: Optional[str] = Query(None, description="Search query"),
     in_stock_only: bool = Query(True, description="Show only in-stock products"),
     is_featured: Optional[bool] = Query(None, description="Filter featured products"),
-    is_trending: Optional[bool] = Query(None, description="Filter trending products"),
-    
-    current_user: Optional[User] = Depends(get_optional_user)
+    is_trending: Optional[bool] = Query(None, description="Filter trending products")
+) -> ProductFilters:
+    """Product listing filters from query parameters"""
+    return ProductFilters(
+        category=category,
+        subcategory=subcategory,
+        boutique_id=boutique_id,
+        brand=brand,
+        min_price=min_price,
+        max_price=max_price,
+        color=color,
+        size=size,
+        condition=condition,
+        search=search,
+        in_stock_only=in_stock_only,
+        is_featured=is_featured,
+        is_trending=is_trending
+    )
+
+def listing_etag(request: Request, if_none_match: Optional[str] = Header(None)) -> str:
+    """
+    Weak ETag of catalog listings, checked before the listing is computed
+    Specific to the route and its query parameters (in any order), changes
+    with every product and stock write of this worker, and at least every
+    PRODUCT_LISTING_ETAG_WINDOW seconds to pick up writes of other workers
+    """
+    query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{query}".encode(), digest_size=8).hexdigest()
+    window = int(time.time()) // settings.PRODUCT_LISTING_ETAG_WINDOW
+    etag = weak_etag(INSTANCE_ID, catalog_generation.value, window, digest)
+    check_not_modified(if_none_match, etag)
+    return etag
+
+@router.get("/", response_model=ProductListResponse)
+async def get_products(
+    page: int = Query(1, ge=1, description="Page number"),
+    size: int = Query(20, ge=1, le=100, description="Items per page"),
+    sort: ProductSort = Query(ProductSort.RELEVANCE, description="Sort option"),
+    cursor: Optional[str] = Query(None, description="Pagination cursor returned as next_cursor (replaces page)"),
+    count_strategy: Optional[CountStrategy] = Query(None, description="How to compute total (default: cheapest suitable)"),
+    filters: ProductFilters = Depends(get_product_filters),
+    current_user: Optional[User] = Depends(get_optional_user),
+    etag: str = Depends(listing_etag)
 ):
     """
     Obtenir la liste des produits avec filtres avancés
@@ -60,186 +116,166 @@ async def get_products(
     - Date (newest/oldest)
     - Popularity (views, sales)
     - Rating
+    
+    Pagination:
+    - page/size for classic numbered pages
+    - cursor/size to follow next_cursor, which stays fast on deep pages
+    
+    Total count (count_strategy):
+    - exact, cached (per filter set)
+    - estimated: only without any condition (status and in_stock_only unset),
+      served as cached with only those two, 400 with other filters
+    - none: skips counting, total is null and has_next is still reliable
     """
-    filters = ProductFilters(
-        category=category,
-        subcategory=subcategory,
-        boutique_id=boutique_id,
-        brand=brand,
-        min_price=min_price,
-        max_price=max_price,
-        color=color,
-        size=size,
-        condition=condition,
-        search=search,
-        in_stock_only=in_stock_only,
-        is_featured=is_featured,
-        is_trending=is_trending
-    )
+    try:
+        body = await ProductService.search_products_json(
+            filters=filters,
+            sort=sort,
+            page=page,
+            size=size,
+            cursor=cursor,
+            count_strategy=count_strategy
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # Searches that find products feed the popular query suggestions
+    if filters.search and page == 1 and cursor is None and not body.startswith(EMPTY_LISTING_PREFIX):
+        product_suggestions.record_query(filters.search)
     
-    return await ProductService.search_products(
+    return FastJSONResponse(body, headers=cache_headers(etag))
+
+@router.get("/facets", response_model=ProductFacetsResponse)
+async def get_product_facets(
+    page: int = Query(1, ge=1, description="Page number"),
+    size: int = Query(20, ge=1, le=100, description="Items per page"),
+    sort: ProductSort = Query(ProductSort.RELEVANCE, description="Sort option"),
+    filters: ProductFilters = Depends(get_product_filters),
+    etag: str = Depends(listing_etag)
+):
+    """
+    Recherche à facettes en une seule requête
+    
+    Returns the result page together with category/subcategory, brand,
+    price range and condition counts. Each facet applies every active
+    filter except its own, so it lists the alternatives to the selection.
+    """
+    return FastJSONResponse(await ProductService.faceted_search(
         filters=filters,
         sort=sort,
         page=page,
         size=size
-    )
+    ), headers=cache_headers(etag))
+
+@router.get("/suggest", response_model=List[ProductSuggestion])
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100, description="Partially typed query"),
+    limit: int = Query(8, ge=1, le=20, description="Number of suggestions to return"),
+    etag: str = Depends(listing_etag)
+):
+    """
+    Suggestions de recherche pendant la saisie
+    
+    Product names, brands, categories and popular searches starting with
+    the typed text (at any word, accents and Arabic diacritics ignored)
+    """
+    return FastJSONResponse(await ProductService.suggest(q, limit), headers=cache_headers(etag))
 
 @router.get("/categories", response_model=List[CategoryResponse])
-async def get_categories():
+async def get_categories(etag: str = Depends(listing_etag)):
     """Obtenir toutes les catégories avec le nombre de produits"""
-    return await ProductService.get_categories()
+    return FastJSONResponse(await ProductService.get_categories(), headers=cache_headers(etag))
 
 @router.get("/brands", response_model=List[BrandResponse])
-async def get_brands():
+async def get_brands(etag: str = Depends(listing_etag)):
     """Obtenir toutes les marques avec le nombre de produits"""
-    return await ProductService.get_brands()
+    return FastJSONResponse(await ProductService.get_brands(), headers=cache_headers(etag))
 
 @router.get("/featured", response_model=List[ProductResponse])
 async def get_featured_products(
-    limit: int = Query(10, ge=1, le=50, description="Number of products to return")
+    limit: int = Query(10, ge=1, le=50, description="Number of products to return"),
+    etag: str = Depends(listing_etag)
 ):
     """Obtenir les produits mis en avant"""
-    return await ProductService.get_featured_products(limit=limit)
+    return FastJSONResponse(await ProductService.get_rail_json("featured", limit), headers=cache_headers(etag))
 
 @router.get("/trending", response_model=List[ProductResponse])
 async def get_trending_products(
-    limit: int = Query(10, ge=1, le=50, description="Number of products to return")
+    limit: int = Query(10, ge=1, le=50, description="Number of products to return"),
+    etag: str = Depends(listing_etag)
 ):
     """Obtenir les produits tendance"""
-    return await ProductService.get_trending_products(limit=limit)
+    return FastJSONResponse(await ProductService.get_rail_json("trending", limit), headers=cache_headers(etag))
 
 @router.get("/new-arrivals", response_model=List[ProductResponse])
 async def get_new_arrivals(
-    limit: int = Query(10, ge=1, le=50, description="Number of products to return")
+    limit: int = Query(10, ge=1, le=50, description="Number of products to return"),
+    etag: str = Depends(listing_etag)
 ):
     """Obtenir les nouveautés"""
-    return await ProductService.get_new_arrivals(limit=limit)
+    return FastJSONResponse(await ProductService.get_rail_json("new-arrivals", limit), headers=cache_headers(etag))
 
 @router.get("/{product_id}", response_model=ProductDetailResponse)
 async def get_product(
     product_id: str,
-    current_user: Optional[User] = Depends(get_optional_user)
+    current_user: Optional[User] = Depends(get_optional_user),
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Obtenir les détails complets d'un produit
     
-    Incrémente automatiquement le compteur de vues
+    Incrémente automatiquement le compteur de vues. Répond 304 sans corps
+    quand If-None-Match contient l'ETag de la version courante; ces
+    revalidations ne comptent pas comme des vues.
     """
     user_id = str(current_user.id) if current_user else None
     
-    product = await ProductService.get_product_by_id(product_id, user_id)
+    product = await ProductService.get_product_by_id(product_id, user_id, count_view=False)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Produit non trouvé"
         )
     
-    return ProductDetailResponse(
-        id=str(product.id),
-        name=product.name,
-        name_ar=product.name_ar,
-        slug=product.slug,
-        description=product.description,
-        description_ar=product.description_ar,
-        boutique_id=product.boutique_id,
-        boutique_name=product.boutique_name,
-        category=product.category,
-        subcategory=product.subcategory,
-        tags=product.tags,
-        brand=product.brand,
-        base_price=product.base_price,
-        sale_price=product.sale_price,
-        current_price=product.current_price,
-        discount_percentage=product.discount_percentage,
-        currency=product.currency,
-        main_image=product.main_image,
-        images=product.images,
-        condition=product.condition,
-        status=product.status,
-        is_featured=product.is_featured,
-        is_trending=product.is_trending,
-        is_in_stock=product.is_in_stock,
-        total_stock=product.total_stock,
-        rating=product.rating,
-        rating_count=product.rating_count,
-        sales_count=product.sales_count,
-        views=product.views,
-        created_at=product.created_at.isoformat(),
-        # Additional detail fields
-        variants=[v.dict() for v in product.variants],
-        colors=[c.dict() for c in product.colors],
-        material=product.material,
-        care_instructions=product.care_instructions,
-        shipping_details=product.shipping_details.dict(),
-        seo=product.seo.dict(),
-        available_sizes=product.get_available_sizes(),
-        available_colors=[c.name for c in product.colors]
-    )
+    # Answered before the payload is built and the view is counted
+    etag = product_etag(product)
+    check_not_modified(if_none_match, etag)
+    ProductService.record_view(product, user_id)
+    return FastJSONResponse(to_product_detail_response(product), headers=cache_headers(etag))
 
 @router.get("/slug/{slug}", response_model=ProductDetailResponse)
 async def get_product_by_slug(
     slug: str,
-    current_user: Optional[User] = Depends(get_optional_user)
+    current_user: Optional[User] = Depends(get_optional_user),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Obtenir un produit par son slug"""
     user_id = str(current_user.id) if current_user else None
     
-    product = await ProductService.get_product_by_slug(slug, user_id)
+    product = await ProductService.get_product_by_slug(slug, user_id, count_view=False)
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Produit non trouvé"
         )
     
-    return ProductDetailResponse(
-        id=str(product.id),
-        name=product.name,
-        name_ar=product.name_ar,
-        slug=product.slug,
-        description=product.description,
-        description_ar=product.description_ar,
-        boutique_id=product.boutique_id,
-        boutique_name=product.boutique_name,
-        category=product.category,
-        subcategory=product.subcategory,
-        tags=product.tags,
-        brand=product.brand,
-        base_price=product.base_price,
-        sale_price=product.sale_price,
-        current_price=product.current_price,
-        discount_percentage=product.discount_percentage,
-        currency=product.currency,
-        main_image=product.main_image,
-        images=product.images,
-        condition=product.condition,
-        status=product.status,
-        is_featured=product.is_featured,
-        is_trending=product.is_trending,
-        is_in_stock=product.is_in_stock,
-        total_stock=product.total_stock,
-        rating=product.rating,
-        rating_count=product.rating_count,
-        sales_count=product.sales_count,
-        views=product.views,
-        created_at=product.created_at.isoformat(),
-        # Additional detail fields
-        variants=[v.dict() for v in product.variants],
-        colors=[c.dict() for c in product.colors],
-        material=product.material,
-        care_instructions=product.care_instructions,
-        shipping_details=product.shipping_details.dict(),
-        seo=product.seo.dict(),
-        available_sizes=product.get_available_sizes(),
-        available_colors=[c.name for c in product.colors]
-    )
+    # Answered before the payload is built and the view is counted
+    etag = product_etag(product)
+    check_not_modified(if_none_match, etag)
+    ProductService.record_view(product, user_id)
+    return FastJSONResponse(to_product_detail_response(product), headers=cache_headers(etag))
 
 @router.get("/{product_id}/similar", response_model=List[ProductResponse])
 async def get_similar_products(
     product_id: str,
-    limit: int = Query(8, ge=1, le=20, description="Number of similar products")
+    limit: int = Query(8, ge=1, le=20, description="Number of similar products"),
+    etag: str = Depends(listing_etag)
 ):
     """Obtenir des produits similaires"""
-    return await ProductService.get_similar_products(product_id, limit)
+    return FastJSONResponse(await ProductService.get_similar_products(product_id, limit), headers=cache_headers(etag))
 
 @router.post("/", response_model=ProductResponse)
 async def create_product(
@@ -256,7 +292,64 @@ async def create_product(
             product_data, 
             str(current_user.id)
         )
-        return ProductService._product_to_response(product)
+        return FastJSONResponse(to_product_response(product))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/import", response_model=ProductImportResponse)
+async def import_products(
+    request: Request,
+    current_user: User = Depends(get_current_verified_user)
+):
+    """
+    Importer des produits en masse (pour les marchands)
+    
+    Le corps est lu en flux, au format NDJSON (Content-Type:
+    application/x-ndjson, un objet ProductCreate par ligne) ou CSV
+    (Content-Type: text/csv, ligne d'en-tête avec les champs de
+    ProductCreate, champs imbriqués en JSON). Les lignes invalides sont
+    signalées avec leur numéro sans interrompre l'import.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    import_format = IMPORT_CONTENT_TYPES.get(content_type)
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Format non supporté, utilisez application/x-ndjson ou text/csv"
+        )
+    
+    try:
+        return await ProductService.import_products(
+            request.stream(),
+            import_format,
+            str(current_user.id)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.post("/bulk-update", response_model=ProductBulkUpdateResponse)
+async def bulk_update_products(
+    payload: ProductBulkUpdate,
+    current_user: User = Depends(get_current_verified_user)
+):
+    """
+    Mettre à jour les prix et stocks de nombreux produits (propriétaire uniquement)
+    
+    Chaque ligne cible un produit (product_id) ou une variante (sku) et
+    reçoit son propre résultat; les mises à jour sont appliquées dans
+    l'ordre en une seule écriture groupée.
+    """
+    try:
+        return await ProductService.bulk_update_products(
+            payload.updates,
+            str(current_user.id)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -281,7 +374,7 @@ async def update_product(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Produit non trouvé"
             )
-        return ProductService._product_to_response(product)
+        return FastJSONResponse(to_product_response(product))
     except PermissionError:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -50,6 +50,75 @@ class Settings(BaseSettings):
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
     MAX_PAGE_SIZE: int = 100
+    PRODUCT_COUNT_CACHE_TTL: int = 60  # seconds
+    PRODUCT_COUNT_CACHE_SIZE: int = 2048
+    
+    # Search
+    # The in-process BM25 index (typo and prefix matching) supersedes $text/textScore
+    # once built; $text ranks searches while it is disabled or still building
+    SEARCH_INDEX_ENABLED: bool = True  # False: search with the MongoDB text index only
+    SEARCH_MAX_CANDIDATES: int = 1000  # Largest match set ranked by the index, broader searches use $text
+    SEARCH_INDEX_REFRESH_INTERVAL: int = 600  # seconds, picks up writes from other workers
+    SEARCH_FUZZY_MIN_SIMILARITY: float = 0.45  # Trigram similarity of typo-tolerant matches, 1 to disable
+    SEARCH_FUZZY_MAX_EXPANSIONS: int = 5  # Similar terms searched per query word
+    SUGGEST_INDEX_ENABLED: bool = True  # False: suggest product names with a prefix query
+    SUGGEST_INDEX_REFRESH_INTERVAL: int = 600  # seconds, picks up writes from other workers
+    SUGGEST_MIN_QUERY_COUNT: int = 3  # Searches before a query is suggested
+    SUGGEST_MAX_TRACKED_QUERIES: int = 10000
+    FACET_PRICE_BUCKETS: int = 8
+    FACET_MAX_BRANDS: int = 50
+    
+    # Catalog stats (category/brand counts)
+    CATALOG_STATS_REFRESH_INTERVAL: int = 60  # seconds, reloads the in-process snapshot
+    CATALOG_STATS_RECONCILE_INTERVAL: int = 3600  # seconds, recomputes counts from products
+    
+    # View counters
+    VIEW_COUNTER_FLUSH_INTERVAL: int = 10  # seconds between bulk writes of buffered views
+    
+    # Homepage rails (featured, trending, new arrivals)
+    PRODUCT_RAIL_CACHE_TTL: int = 60  # seconds, bounds staleness of writes made by other workers
+    
+    # Listing result cache (rendered first pages of product listings)
+    PRODUCT_LISTING_CACHE_TTL: int = 30  # seconds, bounds staleness of writes made by other workers
+    PRODUCT_LISTING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    PRODUCT_LISTING_CACHE_MAX_PAGE: int = 5  # Deeper pages and cursor pages are not cached
+
+    # Catalog snapshot (columnar in-process copy of active products for listings)
+    CATALOG_SNAPSHOT_ENABLED: bool = True  # False, or on Windows (no fcntl): every listing queries MongoDB
+    CATALOG_SNAPSHOT_REFRESH_INTERVAL: int = 300  # seconds, picks up writes from other workers, views and sales
+    CATALOG_SNAPSHOT_DIR: str = ""  # Shared by the workers of a host; empty: <DATABASE_NAME>-catalog in /dev/shm or the temp directory
+
+    # Conditional GET (ETag / If-None-Match)
+    PRODUCT_LISTING_ETAG_WINDOW: int = 60  # seconds, listing ETags also change at least this often
+    
+    # Similar products (precomputed neighbor lists)
+    SIMILAR_PRODUCTS_K: int = 20  # Neighbors stored per product
+    SIMILAR_PRODUCTS_MAX_FEATURES: int = 2048  # Vocabulary: the features shared by the most products
+    SIMILAR_PRODUCTS_REFRESH_INTERVAL: int = 300  # seconds, 0 to run scripts/compute_similar_products.py instead
+    SIMILAR_PRODUCTS_REBUILD_INTERVAL: int = 86400  # seconds, full recompute (new vocabulary, deletions)
+
+    # Bulk product import (NDJSON/CSV)
+    PRODUCT_IMPORT_BATCH_SIZE: int = 500  # Products per insert_many
+    PRODUCT_IMPORT_MAX_ROW_LENGTH: int = 256 * 1024  # characters, longer rows are rejected
+    PRODUCT_IMPORT_MAX_ERRORS: int = 1000  # Row errors listed in the response
+
+    # Trending score (exponentially decayed views, sales and wishlist adds)
+    TRENDING_BUCKET_SECONDS: int = 3600  # Activity is counted per bucket
+    TRENDING_HALF_LIFE_HOURS: float = 48.0  # Activity loses half its weight every half-life
+    TRENDING_HORIZON_HOURS: int = 336  # Older buckets expire (weight below 1% at 7 half-lives)
+    TRENDING_VIEW_WEIGHT: float = 1.0
+    TRENDING_SALE_WEIGHT: float = 20.0
+    TRENDING_WISHLIST_WEIGHT: float = 5.0
+    TRENDING_SCORE_TOLERANCE: float = 0.05  # Relative change before a stored score is rewritten
+    TRENDING_REFRESH_INTERVAL: int = 900  # seconds, 0 to run scripts/compute_trending_scores.py instead
+    TRENDING_ACTIVITY_FLUSH_INTERVAL: int = 10  # seconds between bulk writes of buffered activity
+
+    # Bulk price/stock updates
+    PRODUCT_BULK_UPDATE_MAX_ROWS: int = 1000  # Rows per request, applied with one bulk_write
+
+    # Cart totals (price snapshots of cart products)
+    CART_PRICE_SNAPSHOT_TTL: int = 30  # seconds, bounds staleness of writes made by other workers
+    CART_PRICE_SNAPSHOT_SIZE: int = 10000  # Products kept
     
     class Config:
         env_file = ".env"
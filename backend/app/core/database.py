@@ -38,6 +38,9 @@ async def init_db():
     from app.models.wishlist import Wishlist
     from app.models.chat import ChatRoom, ChatMessage
     from app.models.inspiration import InspirationPost
+    from app.models.catalog_stats import CategoryStats, BrandStats
+    from app.models.product_neighbors import ProductNeighbors
+    from app.models.product_activity import ProductActivity
     
     # Initialize Beanie with all models
     await init_beanie(
@@ -51,7 +54,11 @@ async def init_db():
             Wishlist,
             ChatRoom,
             ChatMessage,
-            InspirationPost
+            InspirationPost,
+            CategoryStats,
+            BrandStats,
+            ProductNeighbors,
+            ProductActivity
         ]
     )
     print("✅ Database initialized with Beanie ODM")
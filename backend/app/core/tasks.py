@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import IO, Awaitable, Callable, Dict
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+# Background loops started at application startup, by name
+_periodic_tasks: Dict[str, asyncio.Task] = {}
+
+# Lock files of the roles this worker leads, kept open until it exits
+_leader_locks: Dict[str, IO] = {}
+
+def start_periodic_task(name: str, interval: float, job: Callable[[], Awaitable[None]]):
+    """
+    Run job every `interval` seconds in the background
+    Failures are logged and the loop keeps running
+    """
+    if interval <= 0 or name in _periodic_tasks:
+        return
+
+    async def runner():
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Periodic task %s failed", name)
+
+    _periodic_tasks[name] = asyncio.create_task(runner(), name=name)
+
+async def stop_periodic_tasks():
+    """Cancel all periodic tasks and wait for them to finish"""
+    tasks = list(_periodic_tasks.values())
+    _periodic_tasks.clear()
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def _try_lock(lock: IO) -> bool:
+    """Take an exclusive lock on an open lock file without waiting, released when it is closed"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    # Windows: lock the first byte of the file
+    lock.seek(0)
+    try:
+        msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+def job_lock_directory() -> Path:
+    """Directory of the job lock files shared by the workers of a host"""
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return Path(root) / f"{settings.DATABASE_NAME}-jobs"
+
+async def run_as_leader(name: str, min_interval: float, job: Callable[[], Awaitable[None]]) -> bool:
+    """
+    Run a job in one worker of the host, at most once per min_interval
+
+    The worker holding the job's lock file runs it when its last completed run
+    (a stamp file) is older than min_interval; the other workers skip it.
+    Returns whether the job ran.
+    """
+    directory = job_lock_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = directory / f"{name}.stamp"
+
+    # Closing the file releases the lock
+    with open(directory / f"{name}.lock", "a") as lock:
+        if not _try_lock(lock):
+            return False
+
+        try:
+            if time.time() - stamp.stat().st_mtime < min_interval:
+                return False
+        except FileNotFoundError:
+            pass
+
+        await job()
+        stamp.touch()
+        return True
+
+def hold_leadership(name: str) -> bool:
+    """
+    Whether this worker leads the workers of the host for a role
+
+    The first worker asking takes the role's lock file and keeps it until
+    it exits; the system then releases the lock and the next worker asking
+    takes over. Jobs keeping state between runs use this rather than
+    run_as_leader, so their state lives in one worker.
+    """
+    if name in _leader_locks:
+        return True
+
+    directory = job_lock_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    lock = open(directory / f"{name}.leader", "a")
+    if not _try_lock(lock):
+        lock.close()
+        return False
+
+    _leader_locks[name] = lock
+    logger.info("Worker %d leads %s", os.getpid(), name)
+    return True
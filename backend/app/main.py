@@ -5,7 +5,16 @@ from fastapi.staticfiles import StaticFiles
 import time
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core.database import init_db, close_mongo_connection
+from app.core.tasks import hold_leadership, run_as_leader, start_periodic_task, stop_periodic_tasks
+from app.services.search_service import product_search_index
+from app.services.suggest_service import product_suggestions
+from app.services.catalog_snapshot import catalog_snapshot, SHARED_SNAPSHOT_SUPPORTED
+from app.services.catalog_stats_service import CatalogStatsService
+from app.services.view_counter import flush_view_counters
+from app.services.similar_products_service import SimilarProductsService
+from app.services.trending_service import TrendingService, product_activity
+from app.services.product_service import ProductService
 from app.api.v1 import api_router
 
 # Create FastAPI application
@@ -24,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Add trusted host middleware for security
@@ -47,11 +57,122 @@ app.mount("/static", StaticFiles(directory="uploads"), name="static")
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+async def reconcile_catalog_stats():
+    """Reconcile catalog stats in one worker, at most twice per interval"""
+    await run_as_leader(
+        "catalog-stats-reconcile",
+        settings.CATALOG_STATS_RECONCILE_INTERVAL / 2,
+        CatalogStatsService.reconcile
+    )
+
+async def recompute_trending_scores():
+    """Recompute trending scores in one worker, at most twice per interval"""
+    await run_as_leader(
+        "trending-scores",
+        settings.TRENDING_REFRESH_INTERVAL / 2,
+        TrendingService.recompute
+    )
+
+async def refresh_similar_products():
+    if hold_leadership("similar-products"):
+        await SimilarProductsService.refresh()
+
+async def rebuild_similar_products():
+    if hold_leadership("similar-products"):
+        await SimilarProductsService.rebuild()
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and other startup tasks"""
     await init_db()
+    
+    # Build the in-process search index, then refresh it periodically
+    if settings.SEARCH_INDEX_ENABLED:
+        await product_search_index.rebuild()
+        start_periodic_task(
+            "search-index-rebuild",
+            settings.SEARCH_INDEX_REFRESH_INTERVAL,
+            product_search_index.rebuild
+        )
+    
+    # Search-as-you-type suggestions, same refresh scheme
+    if settings.SUGGEST_INDEX_ENABLED:
+        await product_suggestions.rebuild()
+        start_periodic_task(
+            "suggestion-index-rebuild",
+            settings.SUGGEST_INDEX_REFRESH_INTERVAL,
+            product_suggestions.rebuild
+        )
+    
+    # Columnar snapshot of active products serving plain listings, mapped by every worker of the host
+    if settings.CATALOG_SNAPSHOT_ENABLED and SHARED_SNAPSHOT_SUPPORTED:
+        await catalog_snapshot.rebuild()
+        start_periodic_task(
+            "catalog-snapshot-rebuild",
+            settings.CATALOG_SNAPSHOT_REFRESH_INTERVAL,
+            catalog_snapshot.rebuild
+        )
+    
+    # Materialized category/brand counts: one worker fixes drift left by previous runs
+    await reconcile_catalog_stats()
+    await CatalogStatsService.refresh_snapshot()
+    start_periodic_task(
+        "catalog-stats-refresh",
+        settings.CATALOG_STATS_REFRESH_INTERVAL,
+        CatalogStatsService.refresh_snapshot
+    )
+    start_periodic_task(
+        "catalog-stats-reconcile",
+        settings.CATALOG_STATS_RECONCILE_INTERVAL,
+        reconcile_catalog_stats
+    )
+    
+    # Buffered view counts
+    start_periodic_task(
+        "view-counter-flush",
+        settings.VIEW_COUNTER_FLUSH_INTERVAL,
+        flush_view_counters
+    )
+    
+    # Similar products: neighbor lists stay in MongoDB across restarts, the
+    # first refresh of the leading worker rebuilds the in-process model they
+    # are updated from; the other workers only read the stored lists
+    start_periodic_task(
+        "similar-products-refresh",
+        settings.SIMILAR_PRODUCTS_REFRESH_INTERVAL,
+        refresh_similar_products
+    )
+    if settings.SIMILAR_PRODUCTS_REFRESH_INTERVAL > 0:
+        start_periodic_task(
+            "similar-products-rebuild",
+            settings.SIMILAR_PRODUCTS_REBUILD_INTERVAL,
+            rebuild_similar_products
+        )
+    
+    # Trending score: buffered activity buckets, decayed score recomputed by
+    # one worker at startup and on a schedule
+    if settings.TRENDING_REFRESH_INTERVAL > 0:
+        await recompute_trending_scores()
+    start_periodic_task(
+        "product-activity-flush",
+        settings.TRENDING_ACTIVITY_FLUSH_INTERVAL,
+        product_activity.flush
+    )
+    start_periodic_task(
+        "trending-scores",
+        settings.TRENDING_REFRESH_INTERVAL,
+        recompute_trending_scores
+    )
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks, flush buffered writes and close the database connection"""
+    await stop_periodic_tasks()
+    await flush_view_counters()
+    await product_activity.flush()
+    await close_mongo_connection()
 
 # Health check endpoint
 @app.get("/health")
@@ -59,7 +180,8 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "listing_cache": ProductService.listing_cache_stats()
     }
 
 # Root endpoint
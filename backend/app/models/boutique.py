@@ -93,7 +93,6 @@ class Boutique(Document):
         name = "boutiques"
         indexes = [
             "name",
-            "slug",
             "owner_id",
             "status",
             "business_type",
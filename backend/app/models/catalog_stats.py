@@ -0,0 +1,29 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from typing import Optional
+from datetime import datetime
+from pymongo import IndexModel, ASCENDING
+
+class CategoryStats(Document):
+    """Number of active products per category/subcategory pair"""
+    category: str
+    subcategory: Optional[str] = None
+    product_count: int = 0
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "category_stats"
+        indexes = [
+            IndexModel([("category", ASCENDING), ("subcategory", ASCENDING)], unique=True)
+        ]
+
+class BrandStats(Document):
+    """Number of active products per brand"""
+    brand: Indexed(str, unique=True)
+    product_count: int = 0
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "brand_stats"
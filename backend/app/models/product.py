@@ -1,8 +1,11 @@
-from beanie import Document, Indexed
+from beanie import Document, Indexed, PydanticObjectId, before_event, Insert, Replace, Save, SaveChanges
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from datetime import datetime
 from enum import Enum
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+from app.utils.slug import normalize_search_text
 
 class ProductStatus(str, Enum):
     DRAFT = "draft"
@@ -47,7 +50,90 @@ class SEO(BaseModel):
     meta_description: Optional[str] = None
     keywords: List[str] = []
 
-class Product(Document):
+def variant_filter_key(value: str) -> str:
+    """Folded color/size name, as stored in the variant filter arrays"""
+    return normalize_search_text(value)
+
+def variant_filter_values(colors: List[Color], variants: List[ProductVariant]) -> Dict[str, List[str]]:
+    """
+    Color and size filter keys of a product's colors and variants
+    Returns the color_names, size_names and in_stock_sizes values
+    """
+    color_names = set()
+    size_names = set()
+    in_stock_sizes = set()
+    
+    for color in colors:
+        color_names.add(variant_filter_key(color.name))
+        for size in color.sizes:
+            size_names.add(variant_filter_key(size.size))
+            if size.stock > 0:
+                in_stock_sizes.add(variant_filter_key(size.size))
+    
+    for variant in variants:
+        if variant.color:
+            color_names.add(variant_filter_key(variant.color))
+        if variant.size:
+            size_names.add(variant_filter_key(variant.size))
+            if variant.stock > 0:
+                in_stock_sizes.add(variant_filter_key(variant.size))
+    
+    return {
+        "color_names": sorted(color_names - {""}),
+        "size_names": sorted(size_names - {""}),
+        "in_stock_sizes": sorted(in_stock_sizes - {""}),
+    }
+
+class ProductPricingMixin:
+    """Derived price and stock properties shared by Product and its projections"""
+    
+    @property
+    def current_price(self) -> float:
+        """Get current selling price"""
+        return self.sale_price if self.sale_price else self.base_price
+    
+    @property
+    def discount_percentage(self) -> Optional[float]:
+        """Calculate discount percentage"""
+        if self.sale_price and self.sale_price < self.base_price:
+            return round(((self.base_price - self.sale_price) / self.base_price) * 100, 1)
+        return None
+    
+    @property
+    def is_on_sale(self) -> bool:
+        """Check if product is on sale"""
+        return self.sale_price is not None and self.sale_price < self.base_price
+    
+    @property
+    def is_in_stock(self) -> bool:
+        """Check if product is in stock"""
+        return self.total_stock > 0
+
+class VariantPricingMixin:
+    """Variant price lookup shared by Product and CartProduct"""
+    
+    def get_price_for_variant(self, color: Optional[str] = None, size: Optional[str] = None) -> float:
+        """Get price for specific variant"""
+        # Find variant
+        variant = next(
+            (v for v in self.variants if v.color == color and v.size == size),
+            None
+        )
+        
+        if variant:
+            return variant.sale_price if variant.sale_price else variant.price
+        
+        # Fallback to base price with size adjustment
+        if color and size:
+            color_obj = next((c for c in self.colors if c.name == color), None)
+            if color_obj:
+                size_obj = next((s for s in color_obj.sizes if s.size == size), None)
+                if size_obj:
+                    return self.current_price + size_obj.price_adjustment
+        
+        return self.current_price
+
+class Product(ProductPricingMixin, VariantPricingMixin, Document):
     # Basic Information
     name: str
     name_ar: Optional[str] = None  # Arabic name
@@ -79,6 +165,11 @@ class Product(Document):
     total_stock: int = 0
     min_stock_alert: int = 5
     
+    # Filter keys derived from colors and variants on every write (multikey indexed)
+    color_names: List[str] = []
+    size_names: List[str] = []
+    in_stock_sizes: List[str] = []
+    
     # Product Details
     condition: ProductCondition = ProductCondition.NEW
     material: Optional[str] = None
@@ -106,6 +197,7 @@ class Product(Document):
     rating: float = 0.0
     rating_count: int = 0
     sales_count: int = 0
+    trending_score: float = 0.0  # Time-decayed activity, computed by TrendingService
     
     # Dates
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -115,42 +207,64 @@ class Product(Document):
         name = "products"
         indexes = [
             "name",
-            "slug", 
-            "boutique_id",
             "category",
             "subcategory",
             "brand",
-            "status",
-            "base_price",
-            "is_featured",
             "is_trending",
-            "rating",
-            "sales_count",
-            "created_at",
-            [("name", "text"), ("description", "text"), ("tags", "text")]  # Text search
+            "trending_score",  # Stored scores read by TrendingService.recompute, any status
+            "updated_at",  # Changed products read by SimilarProductsService.refresh
+            "color_names",
+            "size_names",
+            "in_stock_sizes",
+            [("name", "text"), ("description", "text"), ("tags", "text")],  # Text search
+            # Bulk updates by SKU; also serves boutique_id filters as its prefix
+            IndexModel([("boutique_id", ASCENDING), ("variants.sku", ASCENDING)], name="boutique_variant_sku"),
+            
+            # Listings (ESR: status equality, then the sort keys with their _id
+            # tiebreaker, then the total_stock range), one per listing sort;
+            # derived with scripts/index_advisor.py. Every query sorting on
+            # these keys filters on status, so they replace the single-field
+            # status, base_price, created_at, rating, sales_count and
+            # is_featured indexes.
+            IndexModel(
+                [("status", ASCENDING), ("is_featured", DESCENDING), ("rating", DESCENDING),
+                 ("views", DESCENDING), ("_id", DESCENDING), ("total_stock", ASCENDING)],
+                name="listing_relevance"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("base_price", ASCENDING), ("_id", ASCENDING), ("total_stock", ASCENDING)],
+                name="listing_price"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING), ("total_stock", ASCENDING)],
+                name="listing_created"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("trending_score", DESCENDING), ("views", DESCENDING),
+                 ("_id", DESCENDING), ("total_stock", ASCENDING)],
+                name="listing_trending"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("rating", DESCENDING), ("rating_count", DESCENDING),
+                 ("_id", DESCENDING), ("total_stock", ASCENDING)],
+                name="listing_rating"
+            ),
+            IndexModel(
+                [("status", ASCENDING), ("sales_count", DESCENDING), ("_id", DESCENDING), ("total_stock", ASCENDING)],
+                name="listing_sales"
+            ),
         ]
     
-    @property
-    def current_price(self) -> float:
-        """Get current selling price"""
-        return self.sale_price if self.sale_price else self.base_price
-    
-    @property
-    def discount_percentage(self) -> Optional[float]:
-        """Calculate discount percentage"""
-        if self.sale_price and self.sale_price < self.base_price:
-            return round(((self.base_price - self.sale_price) / self.base_price) * 100, 1)
-        return None
-    
-    @property
-    def is_on_sale(self) -> bool:
-        """Check if product is on sale"""
-        return self.sale_price is not None and self.sale_price < self.base_price
+    @before_event(Replace, Save, SaveChanges)
+    def touch(self):
+        """Record the modification time"""
+        self.updated_at = datetime.utcnow()
     
-    @property
-    def is_in_stock(self) -> bool:
-        """Check if product is in stock"""
-        return self.total_stock > 0
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def sync_variant_filters(self):
+        """Derive color_names, size_names and in_stock_sizes from colors and variants"""
+        for field, values in variant_filter_values(self.colors, self.variants).items():
+            setattr(self, field, values)
     
     def update_rating(self, new_rating: float):
         """Update product rating"""
@@ -159,7 +273,7 @@ class Product(Document):
         self.rating = round(total_points / self.rating_count, 2)
     
     def add_view(self):
-        """Increment view count"""
+        """Increment view count (in memory, persisted through view_counter.product_views)"""
         self.views += 1
     
     def get_available_sizes(self, color: Optional[str] = None) -> List[str]:
@@ -175,24 +289,55 @@ class Product(Document):
                 available_sizes.update(s.size for s in color_obj.sizes if s.stock > 0)
         
         return list(available_sizes)
-    
-    def get_price_for_variant(self, color: Optional[str] = None, size: Optional[str] = None) -> float:
-        """Get price for specific variant"""
-        # Find variant
-        variant = next(
-            (v for v in self.variants if v.color == color and v.size == size),
-            None
-        )
-        
-        if variant:
-            return variant.sale_price if variant.sale_price else variant.price
-        
-        # Fallback to base price with size adjustment
-        if color and size:
-            color_obj = next((c for c in self.colors if c.name == color), None)
-            if color_obj:
-                size_obj = next((s for s in color_obj.sizes if s.size == size), None)
-                if size_obj:
-                    return self.current_price + size_obj.price_adjustment
-        
-        return self.current_price
+
+class ProductCard(ProductPricingMixin, BaseModel):
+    """
+    Projection of the fields shown on product cards (listings, rails)
+    Leaves out variants, colors, SEO and shipping details, which are only
+    needed on the product page
+    """
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    name_ar: Optional[str] = None
+    slug: str
+    description: str
+    description_ar: Optional[str] = None
+    boutique_id: str
+    boutique_name: str
+    category: str
+    subcategory: Optional[str] = None
+    tags: List[str] = []
+    brand: Optional[str] = None
+    base_price: float
+    sale_price: Optional[float] = None
+    currency: str = "DZD"
+    main_image: str
+    images: List[str] = []
+    condition: ProductCondition = ProductCondition.NEW
+    status: ProductStatus = ProductStatus.ACTIVE
+    is_featured: bool = False
+    is_trending: bool = False
+    total_stock: int = 0
+    views: int = 0
+    rating: float = 0.0
+    rating_count: int = 0
+    sales_count: int = 0
+    trending_score: float = 0.0
+    created_at: datetime
+
+class CartProduct(ProductPricingMixin, VariantPricingMixin, BaseModel):
+    """Projection of the fields a cart total reads: prices, variants, stock and image"""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    boutique_name: str
+    main_image: str
+    base_price: float
+    sale_price: Optional[float] = None
+    variants: List[ProductVariant] = []
+    colors: List[Color] = []
+    total_stock: int = 0
+
+# $project stage fields for ProductCard, for aggregation pipelines
+PRODUCT_CARD_PROJECTION = {
+    (field.alias or name): 1 for name, field in ProductCard.model_fields.items()
+}
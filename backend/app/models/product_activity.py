@@ -0,0 +1,26 @@
+from beanie import Document
+from datetime import datetime
+from pymongo import IndexModel, ASCENDING
+
+from app.core.config import settings
+
+class ProductActivity(Document):
+    """
+    Views, sales and wishlist adds of a product during one time bucket
+    Feeds the trending score; buckets older than the scoring horizon expire
+    """
+    product_id: str
+    bucket: datetime  # Start of the bucket
+    views: int = 0
+    sales: int = 0
+    wishlists: int = 0
+
+    class Settings:
+        name = "product_activity"
+        indexes = [
+            IndexModel([("product_id", ASCENDING), ("bucket", ASCENDING)], unique=True),
+            IndexModel(
+                [("bucket", ASCENDING)],
+                expireAfterSeconds=settings.TRENDING_HORIZON_HOURS * 3600 + settings.TRENDING_BUCKET_SECONDS
+            ),
+        ]
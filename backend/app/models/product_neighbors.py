@@ -0,0 +1,20 @@
+from beanie import Document, PydanticObjectId
+from pydantic import Field
+from typing import List
+from datetime import datetime
+
+class ProductNeighbors(Document):
+    """
+    Precomputed similar products of a product, most similar first
+    The document _id is the product id, so lookups use the primary key
+    """
+    neighbor_ids: List[PydanticObjectId] = []
+    scores: List[float] = []
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "product_neighbors"
+        indexes = [
+            "updated_at"
+        ]
@@ -117,6 +117,29 @@ class ProductUpdate(BaseModel):
     is_featured: Optional[bool] = None
     is_trending: Optional[bool] = None
 
+class ProductStockPriceUpdate(BaseModel):
+    # Target: a product id, or the SKU of a variant of one of the merchant's products
+    product_id: Optional[str] = None
+    sku: Optional[str] = None
+    # With a SKU these apply to the variant (stock, price, sale_price)
+    total_stock: Optional[int] = Field(None, ge=0)
+    base_price: Optional[float] = Field(None, gt=0)
+    sale_price: Optional[float] = Field(None, gt=0)  # null removes the sale price
+
+class ProductBulkUpdate(BaseModel):
+    updates: List[ProductStockPriceUpdate]
+
+class ProductBulkUpdateResult(BaseModel):
+    index: int  # Position in updates
+    product_id: Optional[str] = None
+    updated: bool
+    error: Optional[str] = None
+
+class ProductBulkUpdateResponse(BaseModel):
+    updated: int
+    failed: int
+    results: List[ProductBulkUpdateResult]
+
 class ProductFilters(BaseModel):
     category: Optional[str] = None
     subcategory: Optional[str] = None
@@ -143,6 +166,12 @@ class ProductSort(str, Enum):
     RATING = "rating"
     SALES = "sales"
 
+class CountStrategy(str, Enum):
+    EXACT = "exact"  # Count matching products on every request
+    CACHED = "cached"  # Exact count cached per normalized filters
+    ESTIMATED = "estimated"  # Collection metadata, listings without any condition only
+    NONE = "none"  # No count, has_next from fetching one extra product
+
 class ProductListParams(BaseModel):
     page: int = Field(1, ge=1)
     size: int = Field(20, ge=1, le=100)
@@ -186,12 +215,34 @@ class ProductResponse(BaseModel):
 
 class ProductListResponse(BaseModel):
     products: List[ProductResponse]
-    total: int
+    total: Optional[int]  # None when count_strategy is "none"
     page: int
     size: int
-    total_pages: int
+    total_pages: Optional[int]
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
+    count_strategy: CountStrategy = CountStrategy.EXACT  # How `total` was produced
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class CategoryFacet(BaseModel):
+    name: str
+    count: int
+    subcategories: List[FacetCount] = []
+
+class PriceBucket(BaseModel):
+    min_price: float
+    max_price: float
+    count: int
+
+class ProductFacetsResponse(ProductListResponse):
+    categories: List[CategoryFacet]
+    brands: List[FacetCount]
+    price_histogram: List[PriceBucket]
+    conditions: List[FacetCount]
 
 class ProductDetailResponse(ProductResponse):
     variants: List[dict]
@@ -213,3 +264,30 @@ class BrandResponse(BaseModel):
     name: str
     product_count: int
     logo: Optional[str] = None
+
+class SuggestionKind(str, Enum):
+    PRODUCT = "product"  # Product name, links to the most popular product with it
+    BRAND = "brand"
+    CATEGORY = "category"
+    SUBCATEGORY = "subcategory"
+    QUERY = "query"  # Frequent search query
+
+class ProductSuggestion(BaseModel):
+    text: str
+    kind: SuggestionKind
+    product_id: Optional[str] = None
+    slug: Optional[str] = None
+
+class ProductImportFormat(str, Enum):
+    NDJSON = "ndjson"  # One ProductCreate JSON object per line
+    CSV = "csv"  # Header row of ProductCreate fields, nested fields as JSON cells
+
+class ProductImportError(BaseModel):
+    row: int  # Line number in the uploaded file
+    errors: List[str]
+
+class ProductImportResponse(BaseModel):
+    created: int
+    failed: int
+    errors: List[ProductImportError]
+    errors_truncated: bool = False  # More rows failed than are listed
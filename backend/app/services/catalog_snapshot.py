@@ -0,0 +1,592 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+from beanie import PydanticObjectId
+from pymongo import DESCENDING
+
+from app.core.config import settings
+from app.models.product import Product, ProductCard, ProductStatus
+from app.schemas.product import ProductFilters
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Workers publish in turn under a blocking file lock; without fcntl (Windows
+# development) listings query MongoDB
+SHARED_SNAPSHOT_SUPPORTED = fcntl is not None
+
+logger = logging.getLogger(__name__)
+
+CARD_FIELDS = set(ProductCard.model_fields)
+
+# Filtered by equality on integer codes
+CATEGORICAL_FIELDS = ("category", "subcategory", "brand", "boutique_id", "condition")
+
+# Filter and sort columns; booleans are stored as int8 so descending sorts can negate them
+NUMERIC_COLUMNS = {
+    "base_price": np.float64,
+    "total_stock": np.int64,
+    "views": np.int64,
+    "rating": np.float64,
+    "rating_count": np.int64,
+    "sales_count": np.int64,
+    "trending_score": np.float64,
+    "created_at": np.int64,  # Milliseconds, the precision MongoDB stores and sorts on
+    "is_featured": np.int8,
+    "is_trending": np.int8,
+    "id_high": np.int64,  # ObjectId bytes 0-7 (timestamp first), compared like MongoDB
+    "id_low": np.int64,  # ObjectId bytes 8-11
+}
+
+# Card fields kept as one JSON array per product in the string table of snapshot files
+RECORD_FIELDS = tuple(sorted(CARD_FIELDS - set(NUMERIC_COLUMNS) - set(CATEGORICAL_FIELDS) - {"id", "status"}))
+
+# Snapshot file: magic, header length, JSON header, then 64-byte aligned arrays
+FILE_MAGIC = b"MDZCAT01"
+FILE_ALIGNMENT = 64
+EPOCH = datetime(1970, 1, 1)
+
+def to_product_card(product: Product) -> ProductCard:
+    """Card projection of a loaded product"""
+    return ProductCard.model_validate(product.model_dump(by_alias=True, include=CARD_FIELDS))
+
+def object_id_parts(object_id: PydanticObjectId) -> Tuple[int, int]:
+    binary = object_id.binary
+    return int.from_bytes(binary[:8], "big"), int.from_bytes(binary[8:], "big")
+
+def snapshot_directory() -> Path:
+    """Directory shared by the workers of a host, on tmpfs when available"""
+    if settings.CATALOG_SNAPSHOT_DIR:
+        return Path(settings.CATALOG_SNAPSHOT_DIR)
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return Path(root) / f"{settings.DATABASE_NAME}-catalog"
+
+def sort_keys(sort_criteria: Sequence[Tuple[str, int]]) -> List[Tuple[str, bool]]:
+    """Sort columns in priority order, with whether each one is descending"""
+    keys = []
+    for field, direction in sort_criteria:
+        names = ("id_high", "id_low") if field == "_id" else (field,)
+        keys.extend((name, direction == DESCENDING) for name in names)
+    return keys
+
+def aligned(offset: int) -> int:
+    return -(-offset // FILE_ALIGNMENT) * FILE_ALIGNMENT
+
+class ColumnTable:
+    """
+    Rows of filter and sort columns, queried with vectorized masks
+    Subclasses provide the live rows and the product card of a row
+    """
+
+    size: int
+    columns: Dict[str, np.ndarray]
+    codes: Dict[str, np.ndarray]
+    code_values: Dict[str, Dict[str, int]]
+
+    def live_rows(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def card(self, row: int) -> ProductCard:
+        raise NotImplementedError
+
+    def key_values(self, key: Tuple[str, bool], rows: np.ndarray) -> np.ndarray:
+        name, descending = key
+        values = self.columns[name][rows]
+        # Negated so that smaller always sorts first
+        return -values if descending else values
+
+    def mask(self, filters: ProductFilters) -> np.ndarray:
+        """Rows matching the filters CatalogSnapshot.can_answer accepts"""
+        size = self.size
+        columns = self.columns
+        mask = self.live_rows()
+
+        if filters.in_stock_only:
+            mask &= columns["total_stock"][:size] > 0
+
+        for field in CATEGORICAL_FIELDS:
+            value = getattr(filters, field)
+            if not value:
+                continue
+            code = self.code_values[field].get(getattr(value, "value", value))
+            if code is None:
+                return np.zeros(size, dtype=bool)
+            mask &= self.codes[field][:size] == code
+
+        if filters.min_price is not None:
+            mask &= columns["base_price"][:size] >= filters.min_price
+        if filters.max_price is not None:
+            mask &= columns["base_price"][:size] <= filters.max_price
+        if filters.is_featured is not None:
+            mask &= columns["is_featured"][:size] == filters.is_featured
+        if filters.is_trending is not None:
+            mask &= columns["is_trending"][:size] == filters.is_trending
+
+        return mask
+
+    def top(self, filters: ProductFilters, keys: List[Tuple[str, bool]], count: int) -> Tuple[np.ndarray, int]:
+        """
+        The count first matching rows in key order, ordered
+        Returns (rows, number of matching rows)
+
+        Each key is partitioned in turn, so only rows tied on the keys before
+        it are compared on the next one
+        """
+        rows = np.flatnonzero(self.mask(filters))
+        matched = len(rows)
+        count = min(count, matched)
+
+        selected = []
+        remaining = rows
+        for key in keys:
+            if len(remaining) <= count:
+                break
+            values = self.key_values(key, remaining)
+            threshold = np.partition(values, count - 1)[count - 1]
+            before = values < threshold
+            selected.append(remaining[before])
+            count -= int(np.count_nonzero(before))
+            # Only rows tied on this key still compete for the remaining places
+            remaining = remaining[values == threshold]
+        selected.append(remaining[:count])
+
+        chosen = np.concatenate(selected)
+        order = np.lexsort([self.key_values(key, chosen) for key in reversed(keys)])
+        return chosen[order], matched
+
+class LocalTable(ColumnTable):
+    """Private, writable table"""
+
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.size = 0
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self.codes = {field: np.full(capacity, -1, dtype=np.int32) for field in CATEGORICAL_FIELDS}
+        self.code_values = {field: {} for field in CATEGORICAL_FIELDS}
+        self.cards: List[Optional[ProductCard]] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def live_rows(self) -> np.ndarray:
+        return self.alive[:self.size].copy()
+
+    def card(self, row: int) -> ProductCard:
+        return self.cards[row]
+
+    def upsert(self, card: ProductCard):
+        """Add or refresh a product; inactive products are removed"""
+        product_id = str(card.id)
+        if card.status != ProductStatus.ACTIVE:
+            self.discard(product_id)
+            return
+
+        row = self.rows.get(product_id)
+        if row is None:
+            row = self._append_row()
+            self.rows[product_id] = row
+            self.cards.append(card)
+        else:
+            self.cards[row] = card
+
+        self.alive[row] = True
+        for name, value in self._row_values(card).items():
+            self.columns[name][row] = value
+        for field in CATEGORICAL_FIELDS:
+            self.codes[field][row] = self._code(field, getattr(card, field))
+
+    def discard(self, product_id: str):
+        row = self.rows.pop(product_id, None)
+        if row is not None:
+            self.alive[row] = False
+            self.cards[row] = None
+
+    def _append_row(self) -> int:
+        if self.size == len(self.alive):
+            capacity = 2 * len(self.alive)
+            self.alive = np.resize(self.alive, capacity)
+            self.alive[self.size:] = False
+            for name in self.columns:
+                self.columns[name] = np.resize(self.columns[name], capacity)
+            for field in self.codes:
+                self.codes[field] = np.resize(self.codes[field], capacity)
+        self.size += 1
+        return self.size - 1
+
+    def _code(self, field: str, value) -> int:
+        if value is None:
+            return -1
+        value = getattr(value, "value", value)
+        codes = self.code_values[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    @staticmethod
+    def _row_values(card: ProductCard) -> Dict[str, object]:
+        id_high, id_low = object_id_parts(card.id)
+        return {
+            "base_price": card.base_price,
+            "total_stock": card.total_stock,
+            "views": card.views,
+            "rating": card.rating,
+            "rating_count": card.rating_count,
+            "sales_count": card.sales_count,
+            "trending_score": card.trending_score,
+            "created_at": np.datetime64(card.created_at, "ms").astype(np.int64),
+            "is_featured": card.is_featured,
+            "is_trending": card.is_trending,
+            "id_high": id_high,
+            "id_low": id_low,
+        }
+
+    def build(self, cards: List[ProductCard]):
+        """Fill an empty table with one vectorized pass per column"""
+        count = len(cards)
+        self.__init__(max(self.INITIAL_CAPACITY, count))
+        self.size = count
+        self.cards = list(cards)
+        self.rows = {str(card.id): row for row, card in enumerate(cards)}
+        self.alive[:count] = True
+
+        columns = self.columns
+        for name in ("base_price", "total_stock", "views", "rating", "rating_count",
+                     "sales_count", "trending_score", "is_featured", "is_trending"):
+            columns[name][:count] = [getattr(card, name) for card in cards]
+        columns["created_at"][:count] = np.array(
+            [card.created_at for card in cards], dtype="datetime64[ms]"
+        ).astype(np.int64)
+        binary = np.frombuffer(b"".join(card.id.binary for card in cards), dtype=np.uint8).reshape(-1, 12)
+        columns["id_high"][:count] = binary[:, :8].copy().view(">u8").ravel().astype(np.int64)
+        columns["id_low"][:count] = binary[:, 8:].copy().view(">u4").ravel().astype(np.int64)
+
+        for field in CATEGORICAL_FIELDS:
+            self.codes[field][:count] = [self._code(field, getattr(card, field)) for card in cards]
+
+def write_snapshot_file(path: Path, cards: List[ProductCard], as_of: float):
+    """
+    Write products as a snapshot file
+    Rows are sorted by _id so that mapped tables find products by binary search
+    """
+    cards = sorted(cards, key=lambda card: card.id.binary)
+    table = LocalTable()
+    table.build(cards)
+    count = len(cards)
+
+    records = []
+    for card in cards:
+        document = card.model_dump(mode="json", include=set(RECORD_FIELDS))
+        records.append(orjson.dumps([document[field] for field in RECORD_FIELDS]))
+    record_offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(record) for record in records], out=record_offsets[1:])
+
+    arrays = {name: column[:count] for name, column in table.columns.items()}
+    arrays.update({f"code:{field}": codes[:count] for field, codes in table.codes.items()})
+    arrays["record_offsets"] = record_offsets
+    arrays["records"] = np.frombuffer(b"".join(records), dtype=np.uint8)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        offset = aligned(offset + array.nbytes)
+    header = json.dumps({
+        "as_of": as_of,
+        "rows": count,
+        "arrays": layout,
+        # Dicts keep insertion order: the position of a value in its list is its code
+        "values": {field: list(values) for field, values in table.code_values.items()},
+    }).encode()
+
+    data_start = aligned(len(FILE_MAGIC) + 8 + len(header))
+    with open(path, "wb") as file:
+        file.write(FILE_MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name][1])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+
+class MappedTable(ColumnTable):
+    """
+    Read-only table memory-mapped from a snapshot file
+    Every worker mapping the same file shares its pages; only the mask of
+    rows hidden by local writes is private
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if buffer[:len(FILE_MAGIC)] != FILE_MAGIC:
+            raise ValueError(f"Not a catalog snapshot file: {path}")
+        header_start = len(FILE_MAGIC) + 8
+        header_length = int.from_bytes(buffer[len(FILE_MAGIC):header_start], "little")
+        header = json.loads(buffer[header_start:header_start + header_length])
+        data_start = aligned(header_start + header_length)
+
+        # Views over the mapping, nothing is copied
+        arrays = {
+            name: np.frombuffer(buffer, dtype=np.dtype(dtype), count=length, offset=data_start + offset)
+            for name, (dtype, offset, length) in header["arrays"].items()
+        }
+        self.as_of: float = header["as_of"]
+        self.size: int = header["rows"]
+        self.columns = {name: arrays[name] for name in NUMERIC_COLUMNS}
+        self.codes = {field: arrays[f"code:{field}"] for field in CATEGORICAL_FIELDS}
+        self.values: Dict[str, list] = header["values"]
+        self.code_values = {
+            field: {value: code for code, value in enumerate(values)}
+            for field, values in self.values.items()
+        }
+        self._record_offsets = arrays["record_offsets"]
+        self._records = arrays["records"]
+        self._hidden: Optional[np.ndarray] = None  # Allocated on the first local write
+
+    def __len__(self) -> int:
+        return self.size - (int(np.count_nonzero(self._hidden)) if self._hidden is not None else 0)
+
+    def live_rows(self) -> np.ndarray:
+        if self._hidden is None:
+            return np.ones(self.size, dtype=bool)
+        return ~self._hidden
+
+    def find(self, product_id: str) -> Optional[int]:
+        """Row of a product, by binary search on _id"""
+        if not PydanticObjectId.is_valid(product_id):
+            return None
+        id_high, id_low = object_id_parts(PydanticObjectId(product_id))
+        high = self.columns["id_high"]
+        start, end = np.searchsorted(high, id_high, "left"), np.searchsorted(high, id_high, "right")
+        # ObjectIds of one process share their first 8 bytes for a second: search the last 4 too
+        row = start + int(np.searchsorted(self.columns["id_low"][start:end], id_low))
+        return row if row < end and self.columns["id_low"][row] == id_low else None
+
+    def hide(self, product_id: str):
+        """Leave a product out, its local version (if any) takes over"""
+        row = self.find(product_id)
+        if row is not None:
+            if self._hidden is None:
+                self._hidden = np.zeros(self.size, dtype=bool)
+            self._hidden[row] = True
+
+    def card(self, row: int) -> ProductCard:
+        start, end = self._record_offsets[row], self._record_offsets[row + 1]
+        document = dict(zip(RECORD_FIELDS, orjson.loads(self._records[start:end].tobytes())))
+        columns = self.columns
+        document.update(
+            _id=PydanticObjectId(
+                int(columns["id_high"][row]).to_bytes(8, "big") + int(columns["id_low"][row]).to_bytes(4, "big")
+            ),
+            status=ProductStatus.ACTIVE,
+            created_at=EPOCH + timedelta(milliseconds=int(columns["created_at"][row])),
+            is_featured=bool(columns["is_featured"][row]),
+            is_trending=bool(columns["is_trending"][row]),
+        )
+        for name in ("base_price", "total_stock", "views", "rating", "rating_count", "sales_count", "trending_score"):
+            document[name] = columns[name][row].item()
+        for field in CATEGORICAL_FIELDS:
+            code = int(self.codes[field][row])
+            document[field] = self.values[field][code] if code >= 0 else None
+        return ProductCard.model_validate(document)
+
+def current_snapshot_file(directory: Path) -> Optional[Path]:
+    """Latest published snapshot file, if any"""
+    try:
+        name = (directory / "current").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return directory / name if name else None
+
+def snapshot_file_age(path: Path) -> float:
+    """Seconds since the catalog of a snapshot file was read, from its name"""
+    as_of_ms = int(path.stem.split("-")[1])
+    return time.time() - as_of_ms / 1000
+
+def publish_snapshot_file(directory: Path, cards: List[ProductCard], as_of: float) -> Path:
+    """
+    Write a new snapshot version and make it the current one
+    The file and the pointer to it are renamed into place, so readers see
+    either the previous version or the complete new one. Older versions are
+    unlinked: workers still mapping one keep their mapping until they switch
+    """
+    previous = current_snapshot_file(directory)
+    path = directory / f"catalog-{int(as_of * 1000)}-{os.getpid()}.snap"
+    temporary = path.with_suffix(".tmp")
+    write_snapshot_file(temporary, cards, as_of)
+    os.replace(temporary, path)
+
+    pointer = directory / f"current.{os.getpid()}.tmp"
+    pointer.write_text(path.name)
+    os.replace(pointer, directory / "current")
+
+    for stale in directory.glob("catalog-*.snap"):
+        if stale not in (path, previous):
+            stale.unlink(missing_ok=True)
+    return path
+
+class CatalogSnapshot:
+    """
+    Columnar in-memory copy of the active catalog, answering product
+    listings without MongoDB
+
+    Filter and sort fields are NumPy columns (categorical fields as integer
+    codes), one row per product. A listing is a vectorized mask, then a
+    partial selection of the rows of the requested page (ColumnTable.top).
+    The order is the MongoDB one (same keys, _id as final tiebreaker), so
+    cursors issued from the snapshot continue on MongoDB.
+
+    The catalog is held once per host: one worker reads it and publishes a
+    snapshot file (fixed-width columns plus a string table of card records)
+    in a shared directory, on tmpfs by default, and every worker maps the
+    current file read-only. Products written by this worker go to a small
+    private table overriding the mapped rows, until a version read after
+    the write is mapped.
+
+    Searches, color and size filters, other statuses and cursor pages are
+    left to MongoDB (see can_answer).
+    """
+
+    def __init__(self):
+        self.enabled = False  # Set by the first rebuild, writes are not tracked before
+        self.ready = False
+        self._base: Optional[MappedTable] = None
+        self._local = LocalTable()
+        # Last local write per product: (time, card or None when removed)
+        self._writes: Dict[str, Tuple[float, Optional[ProductCard]]] = {}
+
+    def __len__(self) -> int:
+        return (len(self._base) if self._base is not None else 0) + len(self._local)
+
+    def can_answer(self, filters: ProductFilters, cursor: Optional[str]) -> bool:
+        """Whether a listing request can be served from the snapshot"""
+        return (
+            self.ready
+            and cursor is None
+            and filters.status == ProductStatus.ACTIVE
+            and not filters.search
+            and not filters.color
+            and not filters.size
+        )
+
+    def upsert(self, card: ProductCard):
+        """Add or refresh a product; inactive products are removed"""
+        if not self.enabled:
+            return
+        product_id = str(card.id)
+        self._writes[product_id] = (time.time(), card)
+        if self._base is not None:
+            self._base.hide(product_id)
+        self._local.upsert(card)
+
+    def remove(self, product_id: str):
+        """Drop a product from the snapshot"""
+        if not self.enabled:
+            return
+        product_id = str(product_id)
+        self._writes[product_id] = (time.time(), None)
+        if self._base is not None:
+            self._base.hide(product_id)
+        self._local.discard(product_id)
+
+    def query(
+        self,
+        filters: ProductFilters,
+        sort_criteria: Sequence[Tuple[str, int]],
+        skip: int,
+        limit: int
+    ) -> Tuple[List[ProductCard], int]:
+        """
+        Cards of the matching products from skip, up to limit, in sort order
+        Returns (cards, number of matching products)
+        """
+        keys = sort_keys(sort_criteria)
+        tables = [table for table in (self._base, self._local) if table is not None and table.size]
+
+        total = 0
+        selections = []
+        for table in tables:
+            rows, matched = table.top(filters, keys, skip + limit)
+            total += matched
+            selections.append((table, rows))
+        if skip >= total or limit <= 0:
+            return [], total
+
+        candidates = [(table, row) for table, rows in selections for row in rows]
+        if len(selections) > 1:
+            # Merge the ordered rows of the mapped and local tables
+            order = np.lexsort([
+                np.concatenate([table.key_values(key, rows) for table, rows in selections])
+                for key in reversed(keys)
+            ])
+            candidates = [candidates[index] for index in order]
+        return [table.card(row) for table, row in candidates[skip:skip + limit]], total
+
+    async def rebuild(self):
+        """
+        Publish a new snapshot version when the current one is due, then map it
+        Workers take turns on a lock file: the first one finding the current
+        version older than half the refresh interval reads the catalog and
+        publishes it, the others map the version it published
+        """
+        self.enabled = True
+        directory = snapshot_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with open(directory / "publish.lock", "a") as lock:
+            await asyncio.to_thread(fcntl.flock, lock, fcntl.LOCK_EX)
+            current = current_snapshot_file(directory)
+            if current is None or snapshot_file_age(current) >= settings.CATALOG_SNAPSHOT_REFRESH_INTERVAL / 2:
+                as_of = time.time()
+                cards = await Product.find(
+                    Product.status == ProductStatus.ACTIVE
+                ).project(ProductCard).to_list()
+                path = await asyncio.to_thread(publish_snapshot_file, directory, cards, as_of)
+                logger.info(
+                    "Catalog snapshot published with %d products (%.1f MB)",
+                    len(cards), path.stat().st_size / 1e6
+                )
+            # Closing the file releases the lock
+
+        self.sync(directory)
+
+    def sync(self, directory: Optional[Path] = None):
+        """Map the current snapshot version if it is not mapped yet"""
+        path = current_snapshot_file(directory or snapshot_directory())
+        if path is None or (self._base is not None and self._base.path == path):
+            return
+
+        base = MappedTable(path)
+        # Local writes made before the catalog was read are part of the new version
+        self._writes = {
+            product_id: write for product_id, write in self._writes.items()
+            if write[0] >= base.as_of
+        }
+        local = LocalTable()
+        for product_id, (_, card) in self._writes.items():
+            base.hide(product_id)
+            if card is not None:
+                local.upsert(card)
+
+        self._base = base
+        self._local = local
+        self.ready = True
+        logger.info("Catalog snapshot %s mapped with %d products", path.name, len(self))
+
+# Process-wide snapshot used by ProductService
+catalog_snapshot = CatalogSnapshot()
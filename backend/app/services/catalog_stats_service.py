@@ -0,0 +1,210 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.models.product import Product, ProductStatus
+from app.models.catalog_stats import CategoryStats, BrandStats
+from app.schemas.product import CategoryResponse, BrandResponse
+from app.utils.slug import generate_slug
+
+logger = logging.getLogger(__name__)
+
+# (category, subcategory, brand) a product is counted under, None when not counted
+StatsKey = Optional[Tuple[str, Optional[str], Optional[str]]]
+
+class CatalogStatsService:
+    """
+    Materialized category and brand counts
+
+    The category_stats/brand_stats collections are maintained with atomic
+    $inc by product writes. Reads are served from an in-process snapshot of
+    those collections, refreshed periodically so that writes made by other
+    workers show up. A reconciliation job recomputes the counts from the
+    products collection and corrects any drift.
+    """
+
+    _category_counts: Dict[Tuple[str, Optional[str]], int] = {}
+    _brand_counts: Dict[str, int] = {}
+    _loaded = False
+
+    @staticmethod
+    def product_key(product: Product) -> StatsKey:
+        """Stats key of a product, None if it is not counted (inactive)"""
+        if product.status != ProductStatus.ACTIVE:
+            return None
+        return (product.category, product.subcategory, product.brand)
+
+    @staticmethod
+    async def record_change(before: StatsKey, after: StatsKey):
+        """Apply the count changes of a product write (create: before=None, delete: after=None)"""
+        if before == after:
+            return
+
+        if before:
+            await CatalogStatsService._increment(before, -1)
+        if after:
+            await CatalogStatsService._increment(after, 1)
+
+    @staticmethod
+    async def record_created(keys: List[StatsKey]):
+        """Apply the count changes of many created products, one update per distinct key"""
+        for key, count in Counter(key for key in keys if key).items():
+            await CatalogStatsService._increment(key, count)
+
+    @staticmethod
+    async def _increment(key: Tuple[str, Optional[str], Optional[str]], delta: int):
+        category, subcategory, brand = key
+        now = datetime.utcnow()
+
+        await CategoryStats.get_motor_collection().update_one(
+            {"category": category, "subcategory": subcategory},
+            {"$inc": {"product_count": delta}, "$set": {"updated_at": now}},
+            upsert=True
+        )
+        pair = (category, subcategory)
+        CatalogStatsService._category_counts[pair] = CatalogStatsService._category_counts.get(pair, 0) + delta
+
+        if brand:
+            await BrandStats.get_motor_collection().update_one(
+                {"brand": brand},
+                {"$inc": {"product_count": delta}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+            CatalogStatsService._brand_counts[brand] = CatalogStatsService._brand_counts.get(brand, 0) + delta
+
+    @staticmethod
+    async def get_categories() -> List[CategoryResponse]:
+        """Categories with product counts, from the snapshot"""
+        if not CatalogStatsService._loaded:
+            await CatalogStatsService.refresh_snapshot()
+
+        totals: Dict[str, int] = {}
+        subcategories: Dict[str, List[str]] = {}
+        for (category, subcategory), count in CatalogStatsService._category_counts.items():
+            if count <= 0:
+                continue
+            totals[category] = totals.get(category, 0) + count
+            names = subcategories.setdefault(category, [])
+            if subcategory is not None:
+                names.append(subcategory)
+
+        return [
+            CategoryResponse(
+                name=category,
+                slug=generate_slug(category),
+                product_count=count,
+                subcategories=sorted(subcategories[category])
+            )
+            for category, count in sorted(totals.items(), key=lambda item: -item[1])
+        ]
+
+    @staticmethod
+    async def get_brands() -> List[BrandResponse]:
+        """Brands with product counts, from the snapshot"""
+        if not CatalogStatsService._loaded:
+            await CatalogStatsService.refresh_snapshot()
+
+        return [
+            BrandResponse(name=brand, product_count=count)
+            for brand, count in sorted(CatalogStatsService._brand_counts.items(), key=lambda item: -item[1])
+            if count > 0
+        ]
+
+    @staticmethod
+    async def refresh_snapshot():
+        """Reload the in-process snapshot from the stats collections"""
+        category_counts = {
+            (stats.category, stats.subcategory): stats.product_count
+            async for stats in CategoryStats.find_all()
+        }
+        brand_counts = {
+            stats.brand: stats.product_count
+            async for stats in BrandStats.find_all()
+        }
+
+        CatalogStatsService._category_counts = category_counts
+        CatalogStatsService._brand_counts = brand_counts
+        CatalogStatsService._loaded = True
+
+    @staticmethod
+    async def reconcile():
+        """
+        Recompute the counts from the products collection and correct drift
+
+        Corrections are applied as $inc deltas, so increments made by product
+        writes while the job runs are kept. A write landing between reading
+        the stats and counting the products can leave a count off by one
+        until the next run. Runs in one worker at a time (see main.py).
+        """
+
+        category_pipeline = [
+            {"$match": {"status": ProductStatus.ACTIVE.value}},
+            {"$group": {
+                "_id": {"category": "$category", "subcategory": "$subcategory"},
+                "count": {"$sum": 1}
+            }}
+        ]
+        brand_pipeline = [
+            {"$match": {"status": ProductStatus.ACTIVE.value, "brand": {"$ne": None}}},
+            {"$group": {"_id": "$brand", "count": {"$sum": 1}}}
+        ]
+
+        await CatalogStatsService.refresh_snapshot()
+        stored_categories = CatalogStatsService._category_counts
+        stored_brands = CatalogStatsService._brand_counts
+
+        category_counts = {
+            (item["_id"]["category"], item["_id"].get("subcategory")): item["count"]
+            for item in await Product.aggregate(category_pipeline).to_list()
+        }
+        brand_counts = {
+            item["_id"]: item["count"]
+            for item in await Product.aggregate(brand_pipeline).to_list()
+        }
+
+        category_deltas = {
+            pair: category_counts.get(pair, 0) - stored_categories.get(pair, 0)
+            for pair in set(category_counts) | set(stored_categories)
+        }
+        brand_deltas = {
+            brand: brand_counts.get(brand, 0) - stored_brands.get(brand, 0)
+            for brand in set(brand_counts) | set(stored_brands)
+        }
+        category_deltas = {pair: delta for pair, delta in category_deltas.items() if delta}
+        brand_deltas = {brand: delta for brand, delta in brand_deltas.items() if delta}
+
+        now = datetime.utcnow()
+        category_collection = CategoryStats.get_motor_collection()
+        brand_collection = BrandStats.get_motor_collection()
+
+        if category_deltas:
+            await category_collection.bulk_write([
+                UpdateOne(
+                    {"category": category, "subcategory": subcategory},
+                    {"$inc": {"product_count": delta}, "$set": {"updated_at": now}},
+                    upsert=True
+                )
+                for (category, subcategory), delta in category_deltas.items()
+            ], ordered=False)
+        if brand_deltas:
+            await brand_collection.bulk_write([
+                UpdateOne(
+                    {"brand": brand},
+                    {"$inc": {"product_count": delta}, "$set": {"updated_at": now}},
+                    upsert=True
+                )
+                for brand, delta in brand_deltas.items()
+            ], ordered=False)
+
+        # Emptied entries; the count condition keeps those incremented meanwhile
+        await category_collection.delete_many({"product_count": 0})
+        await brand_collection.delete_many({"product_count": 0})
+
+        await CatalogStatsService.refresh_snapshot()
+
+        drift = len(category_deltas) + len(brand_deltas)
+        if drift:
+            logger.info("Catalog stats reconciled, %d counts corrected", drift)
@@ -0,0 +1,114 @@
+import json
+from typing import Any, Optional
+
+from app.models.product import Product
+from app.schemas.product import ProductFilters, CountStrategy
+from app.core.config import settings
+from app.utils.cache import TTLCache, MISSING
+
+# Filters applied to every listing by default, which do not make it a filtered listing
+UNFILTERED_FIELDS = {"status", "in_stock_only"}
+
+class ProductCountService:
+    """
+    Count strategies for product listings
+
+    - exact: count the matching products on every request
+    - cached: exact count reused for a short time per normalized filter set
+    - estimated: collection metadata count, which counts every document
+      (drafts, inactive and out-of-stock products included), so only valid
+      for a listing without any condition
+    - none: no count at all, has_next comes from fetching one extra product
+    """
+
+    _cache = TTLCache(
+        ttl=settings.PRODUCT_COUNT_CACHE_TTL,
+        max_entries=settings.PRODUCT_COUNT_CACHE_SIZE
+    )
+
+    @staticmethod
+    def resolve_strategy(
+        requested: Optional[CountStrategy],
+        filtered: bool,
+        cursor_mode: bool,
+        unconditional: bool = False
+    ) -> CountStrategy:
+        """
+        Pick the count strategy for a listing request
+        unconditional: the listing has no query condition at all, not even
+        the default status and stock ones
+        An explicit ESTIMATED on a filtered listing raises ValueError; on a
+        listing with only the default status and stock conditions it is
+        served as CACHED
+        """
+
+        if requested is None:
+            # Infinite scroll follows next_cursor and never displays a total
+            if cursor_mode:
+                return CountStrategy.NONE
+            return CountStrategy.ESTIMATED if unconditional else CountStrategy.CACHED
+
+        # The metadata count ignores the query, so it cannot serve filtered listings
+        if requested == CountStrategy.ESTIMATED and filtered:
+            raise ValueError("count_strategy=estimated is only available for unfiltered listings")
+        if requested == CountStrategy.ESTIMATED and not unconditional:
+            return CountStrategy.CACHED
+
+        return requested
+
+    @staticmethod
+    def is_filtered(filters: ProductFilters) -> bool:
+        """
+        Whether a listing narrows the catalog beyond the default status and
+        stock filters, which every listing applies and the estimate ignores
+        """
+        return any(
+            getattr(filters, field) is not None
+            for field in ProductFilters.model_fields
+            if field not in UNFILTERED_FIELDS
+        )
+
+    @staticmethod
+    def is_unconditional(filters: ProductFilters) -> bool:
+        """Whether a listing has no query condition, so it lists the whole collection"""
+        return not filters.status and not filters.in_stock_only and not ProductCountService.is_filtered(filters)
+
+    @staticmethod
+    async def count(strategy: CountStrategy, query: Any, filters: ProductFilters) -> Optional[int]:
+        """Count products matching query with the given strategy"""
+
+        if strategy == CountStrategy.NONE:
+            return None
+
+        if strategy == CountStrategy.ESTIMATED:
+            return await Product.get_motor_collection().estimated_document_count()
+
+        if strategy == CountStrategy.CACHED:
+            key = ProductCountService.cache_key(filters)
+            total = ProductCountService._cache.get(key)
+            if total is MISSING:
+                total = await ProductCountService._exact_count(query)
+                ProductCountService._cache.set(key, total)
+            return total
+
+        return await ProductCountService._exact_count(query)
+
+    @staticmethod
+    def cache_key(filters: ProductFilters) -> str:
+        """Canonical representation of filters, independent of field order and unset values"""
+        data = filters.model_dump(mode="json", exclude_none=True)
+        if "search" in data:
+            # Search matching is case-insensitive
+            data["search"] = " ".join(data["search"].lower().split())
+        return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+    @staticmethod
+    def invalidate():
+        """Drop cached counts after catalog changes"""
+        ProductCountService._cache.clear()
+
+    @staticmethod
+    async def _exact_count(query: Any) -> int:
+        if query:
+            return await Product.find(query).count()
+        return await Product.count()
@@ -1,11 +1,18 @@
+import asyncio
 from typing import List, Optional, Dict
 from datetime import datetime
 import secrets
 import string
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pymongo import UpdateOne
 
-from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus
-from app.models.product import Product
+from app.models.order import Order, OrderItem, OrderStatus, PaymentStatus, ShippingAddress, PaymentInfo
+from app.models.product import Product, CartProduct
 from app.models.user import User
+from app.services.trending_service import product_activity
+from app.core.config import settings
+from app.utils.cache import TTLCache, MISSING
 from app.schemas.order import (
     OrderCreate, 
     OrderUpdate, 
@@ -16,27 +23,42 @@ from app.schemas.order import (
     CartResponse
 )
 
+# Cart products by id, so that recalculating a cart (on every quantity
+# change) does not read them again; product writes of this process drop
+# their snapshot, writes of other workers show up after the TTL
+cart_products = TTLCache(ttl=settings.CART_PRICE_SNAPSHOT_TTL, max_entries=settings.CART_PRICE_SNAPSHOT_SIZE)
+
 class OrderService:
     
     @staticmethod
     async def create_order(order_data: OrderCreate, customer_id: str) -> Order:
-        """Create a new order"""
+        """
+        Create a new order
+        Products are loaded with one query and their stock is reserved with
+        conditional updates before the order is saved, so concurrent orders
+        cannot sell more than the stock
+        """
         
         # Get customer info
         customer = await User.get(customer_id)
         if not customer:
             raise ValueError("Customer not found")
         
+        products = await OrderService._get_products([item_data.product_id for item_data in order_data.items])
+        
         # Validate and process items
         order_items = []
         subtotal = 0.0
+        quantities: Dict[str, int] = {}  # Ordered quantity per product, over all its lines
         
         for item_data in order_data.items:
-            product = await Product.get(item_data.product_id)
+            product = products.get(item_data.product_id)
             if not product:
                 raise ValueError(f"Product {item_data.product_id} not found")
             
-            if not product.is_in_stock or product.total_stock < item_data.quantity:
+            product_id = str(product.id)
+            quantities[product_id] = quantities.get(product_id, 0) + item_data.quantity
+            if not product.is_in_stock or product.total_stock < quantities[product_id]:
                 raise ValueError(f"Product {product.name} is out of stock")
             
             # Calculate price (could include variant pricing)
@@ -81,25 +103,107 @@ class OrderService:
             tax=tax,
             discount=discount,
             total_amount=total_amount,
-            shipping_address=order_data.shipping_address,
+            shipping_address=ShippingAddress(**order_data.shipping_address.model_dump()),
             delivery_method=order_data.delivery_method,
             delivery_notes=order_data.delivery_notes,
-            payment_info=order_data.payment_info,
+            payment_info=PaymentInfo(**order_data.payment_info.model_dump(), amount=total_amount),
             special_instructions=order_data.special_instructions,
             gift_message=order_data.gift_message
         )
         
-        await order.save()
+        # Reserve the stock first: the stock check above may be stale by now
+        await OrderService._reserve_stock(quantities, products)
+        try:
+            await order.save()
+        except Exception:
+            await OrderService._release_stock(quantities)
+            raise
         
-        # Update product stock
-        for item_data, order_item in zip(order_data.items, order_items):
-            product = await Product.get(item_data.product_id)
-            product.total_stock -= item_data.quantity
-            product.sales_count += item_data.quantity
-            await product.save()
+        for product_id, quantity in quantities.items():
+            product_activity.record(product_id, "sales", quantity)
+        await OrderService._on_stock_changed(quantities)
         
         return order
     
+    @staticmethod
+    async def _get_products(product_ids: List[str]) -> Dict[str, Product]:
+        """Products by id, loaded with one query; unknown and invalid ids are left out"""
+        object_ids = {PydanticObjectId(product_id) for product_id in product_ids if PydanticObjectId.is_valid(product_id)}
+        if not object_ids:
+            return {}
+        
+        products = await Product.find(In(Product.id, list(object_ids))).to_list()
+        return {str(product.id): product for product in products}
+    
+    @staticmethod
+    async def _reserve_stock(quantities: Dict[str, int], products: Dict[str, Product]):
+        """
+        Decrement the stock of ordered products
+        
+        Each line is an update that only matches while the product has enough
+        stock. The lines are sent concurrently rather than as one bulk_write,
+        whose result only tells how many updates matched, not which: the
+        matched_count of each line tells whether it was reserved. If a line
+        fails, the reserved ones are given back and the order is refused
+        """
+        lines = list(quantities.items())
+        now = datetime.utcnow()
+        collection = Product.get_motor_collection()
+        results = await asyncio.gather(*(
+            collection.update_one(
+                {"_id": PydanticObjectId(product_id), "total_stock": {"$gte": quantity}},
+                {"$inc": {"total_stock": -quantity, "sales_count": quantity}, "$set": {"updated_at": now}}
+            )
+            for product_id, quantity in lines
+        ), return_exceptions=True)
+        
+        reserved = {
+            product_id: quantity
+            for (product_id, quantity), result in zip(lines, results)
+            if not isinstance(result, BaseException) and result.matched_count
+        }
+        if len(reserved) == len(lines):
+            return
+        
+        await OrderService._release_stock(reserved)
+        
+        error = next((result for result in results if isinstance(result, BaseException)), None)
+        if error is not None:
+            raise error
+        
+        # A line matches nothing when its product is short of stock, or was deleted since it was loaded
+        unmatched = [PydanticObjectId(product_id) for product_id, _ in lines if product_id not in reserved]
+        existing = {
+            str(document["_id"])
+            for document in await collection.find({"_id": {"$in": unmatched}}, {"_id": 1}).to_list(None)
+        }
+        for product_id in map(str, unmatched):
+            if product_id not in existing:
+                raise ValueError(f"Product {product_id} not found")
+        raise ValueError(f"Product {products[str(unmatched[0])].name} is out of stock")
+    
+    @staticmethod
+    async def _release_stock(quantities: Dict[str, int]):
+        """Give back reserved stock (failed or cancelled orders) with one bulk_write"""
+        if not quantities:
+            return
+        
+        now = datetime.utcnow()
+        await Product.get_motor_collection().bulk_write([
+            UpdateOne(
+                {"_id": PydanticObjectId(product_id)},
+                {"$inc": {"total_stock": quantity, "sales_count": -quantity}, "$set": {"updated_at": now}}
+            )
+            for product_id, quantity in quantities.items()
+        ], ordered=False)
+    
+    @staticmethod
+    async def _on_stock_changed(quantities: Dict[str, int]):
+        """Refresh cached listings, counts, cart prices and the catalog snapshot after stock moved"""
+        # Imported here: product_service imports this module for cart_products
+        from app.services.product_service import ProductService
+        await ProductService.on_stock_changed([PydanticObjectId(product_id) for product_id in quantities])
+    
     @staticmethod
     async def get_order_by_id(order_id: str, customer_id: Optional[str] = None) -> Optional[Order]:
         """Get order by ID with optional customer verification"""
@@ -183,26 +287,34 @@ class OrderService:
         order.add_status_update(OrderStatus.CANCELLED, reason, customer_id)
         await order.save()
         
-        # Restore product stock
+        # Restore product stock, with increments: saving whole products would
+        # overwrite the stock reserved by concurrent orders
+        quantities: Dict[str, int] = {}
         for item in order.items:
-            product = await Product.get(item.product_id)
-            if product:
-                product.total_stock += item.quantity
-                product.sales_count -= item.quantity
-                await product.save()
+            if PydanticObjectId.is_valid(item.product_id):
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        await OrderService._release_stock(quantities)
+        for product_id, quantity in quantities.items():
+            product_activity.record(product_id, "sales", -quantity)
+        await OrderService._on_stock_changed(quantities)
         
         return True
     
     @staticmethod
     async def calculate_cart_total(cart_items: List[CartItem]) -> CartResponse:
-        """Calculate cart totals without creating order"""
+        """
+        Calculate cart totals without creating order
+        Prices are evaluated from the cart product snapshots, see _get_cart_products
+        """
+        
+        products = await OrderService._get_cart_products([cart_item.product_id for cart_item in cart_items])
         
         items = []
         subtotal = 0.0
         total_items = 0
         
         for cart_item in cart_items:
-            product = await Product.get(cart_item.product_id)
+            product = products.get(cart_item.product_id)
             if not product:
                 continue
             
@@ -240,6 +352,34 @@ class OrderService:
             total_amount=total_amount
         )
     
+    @staticmethod
+    async def _get_cart_products(product_ids: List[str]) -> Dict[str, CartProduct]:
+        """
+        Cart products by id: cached snapshots, and the others loaded with one
+        query projected on the fields a cart total reads
+        Unknown and invalid ids are left out; unknown ids are cached too
+        """
+        products: Dict[str, CartProduct] = {}
+        missing = set()
+        
+        for product_id in product_ids:
+            product = cart_products.get(product_id)
+            if product is MISSING:
+                if PydanticObjectId.is_valid(product_id):
+                    missing.add(PydanticObjectId(product_id))
+            elif product is not None:
+                products[product_id] = product
+        
+        if missing:
+            async for product in Product.find(In(Product.id, list(missing))).project(CartProduct):
+                missing.discard(product.id)
+                products[str(product.id)] = product
+                cart_products.set(str(product.id), product)
+            for object_id in missing:
+                cart_products.set(str(object_id), None)
+        
+        return products
+    
     @staticmethod
     def _generate_order_number() -> str:
         """Generate unique order number"""
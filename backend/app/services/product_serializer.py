@@ -0,0 +1,78 @@
+from typing import Any, Dict, Union
+
+from app.models.product import Product, ProductCard
+from app.schemas.product import ProductResponse, ProductDetailResponse
+from app.utils.etag import strong_etag, version_tag
+
+# Responses are built from documents that were already validated when they
+# were loaded from MongoDB, so they are constructed instead of being
+# validated a second time.
+
+# Part of product ETags, bump when the shape of the detail payload changes
+DETAIL_FORMAT_VERSION = 1
+
+def product_response_data(product: Union[Product, ProductCard]) -> Dict[str, Any]:
+    """ProductResponse fields of a product (or its card projection)"""
+    return {
+        "id": str(product.id),
+        "name": product.name,
+        "name_ar": product.name_ar,
+        "slug": product.slug,
+        "description": product.description,
+        "description_ar": product.description_ar,
+        "boutique_id": product.boutique_id,
+        "boutique_name": product.boutique_name,
+        "category": product.category,
+        "subcategory": product.subcategory,
+        "tags": product.tags,
+        "brand": product.brand,
+        "base_price": product.base_price,
+        "sale_price": product.sale_price,
+        "current_price": product.current_price,
+        "discount_percentage": product.discount_percentage,
+        "currency": product.currency,
+        "main_image": product.main_image,
+        "images": product.images,
+        "condition": product.condition,
+        "status": product.status,
+        "is_featured": product.is_featured,
+        "is_trending": product.is_trending,
+        "is_in_stock": product.is_in_stock,
+        "total_stock": product.total_stock,
+        "rating": product.rating,
+        "rating_count": product.rating_count,
+        "sales_count": product.sales_count,
+        "views": product.views,
+        "created_at": product.created_at.isoformat(),
+    }
+
+def product_detail_data(product: Product) -> Dict[str, Any]:
+    """ProductDetailResponse fields of a full product document"""
+    data = product_response_data(product)
+    data.update(
+        variants=[variant.model_dump() for variant in product.variants],
+        colors=[color.model_dump() for color in product.colors],
+        material=product.material,
+        care_instructions=product.care_instructions,
+        shipping_details=product.shipping_details.model_dump(),
+        seo=product.seo.model_dump(),
+        available_sizes=product.get_available_sizes(),
+        available_colors=[color.name for color in product.colors],
+    )
+    return data
+
+def to_product_response(product: Union[Product, ProductCard]) -> ProductResponse:
+    """Convert a product (or its card projection) to ProductResponse without validation"""
+    return ProductResponse.model_construct(**product_response_data(product))
+
+def to_product_detail_response(product: Product) -> ProductDetailResponse:
+    """Convert a product to ProductDetailResponse without validation"""
+    return ProductDetailResponse.model_construct(**product_detail_data(product))
+
+def product_etag(product: Product) -> str:
+    """
+    Strong ETag of a product's detail payload, from its modification time
+    The view counter is updated without touching updated_at, so it does not
+    invalidate the tag
+    """
+    return strong_etag(product.id, version_tag(product.updated_at), DETAIL_FORMAT_VERSION)
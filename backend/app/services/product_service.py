@@ -1,10 +1,27 @@
-from typing import List, Optional, Tuple
+import hashlib
+import json
+import re
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
 from beanie import PydanticObjectId
-from beanie.operators import RegEx, In, GTE, LTE, And, Or
-from pymongo import ASCENDING, DESCENDING
+from beanie.operators import RegEx, In, GTE, LTE, And, Or, Text
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import BaseModel, Field, ValidationError
 
-from app.models.product import Product, ProductStatus, ProductCondition
+from app.models.product import (
+    Product,
+    ProductCard,
+    ProductStatus,
+    ProductCondition,
+    PRODUCT_CARD_PROJECTION,
+    Color,
+    ProductVariant,
+    variant_filter_key,
+    variant_filter_values
+)
 from app.models.boutique import Boutique
+from app.models.product_neighbors import ProductNeighbors
 from app.schemas.product import (
     ProductCreate, 
     ProductUpdate, 
@@ -14,13 +31,84 @@ from app.schemas.product import (
     ProductDetailResponse,
     ProductListResponse,
     CategoryResponse,
-    BrandResponse
+    BrandResponse,
+    CountStrategy,
+    FacetCount,
+    CategoryFacet,
+    PriceBucket,
+    ProductFacetsResponse,
+    ProductImportFormat,
+    ProductImportError,
+    ProductImportResponse,
+    ProductStockPriceUpdate,
+    ProductBulkUpdateResult,
+    ProductBulkUpdateResponse,
+    ProductSuggestion,
+    SuggestionKind
+)
+from app.services.count_service import ProductCountService
+from app.services.catalog_stats_service import CatalogStatsService
+from app.services.view_counter import product_views
+from app.services.trending_service import product_activity
+from app.services.product_serializer import to_product_response
+from app.services.slug_allocator import product_slugs
+from app.services.similar_products_service import similar_products_index
+from app.services.search_service import (
+    product_search_index,
+    blend_relevance,
+    is_text_searchable,
+    SearchRankingProjection,
+    TEXT_RELEVANCE_EXPRESSION
 )
+from app.services.suggest_service import product_suggestions, SuggestDocument
+from app.services.catalog_snapshot import catalog_snapshot, to_product_card
+from app.services.order_service import cart_products
 from app.core.config import settings
-from app.utils.slug import generate_slug
+from app.utils.cursor import encode_cursor, decode_cursor, keyset_filter, document_sort_values
+from app.utils.cache import TTLCache, GenerationCounter, KeyedGenerationCounter, ByteSizeLRUCache
+from app.utils.responses import dump_json
+from app.utils.row_stream import iter_csv_rows, iter_ndjson_rows
+
+# Filter groups that have their own facet in faceted search
+FACET_FILTER_GROUPS = ("category", "brand", "price", "condition")
+
+# CSV import cells holding JSON; list fields also accept comma-separated values
+CSV_JSON_FIELDS = ("tags", "images", "variants", "colors", "shipping_details", "seo")
+CSV_LIST_FIELDS = ("tags", "images")
+
+class StockPriceTarget(BaseModel):
+    """Projection of the fields a bulk price/stock update reads"""
+    id: PydanticObjectId = Field(alias="_id")
+    boutique_id: str
+    category: str = ""
+    base_price: float = 0
+    sale_price: Optional[float] = None
+    colors: List[Color] = []
+    variants: List[ProductVariant] = []
+
+# Bumped by every product write of this process; cache keys that embed it
+# stop matching immediately, writes of other workers show up after the TTL
+catalog_generation = GenerationCounter()
+
+# Same, per category and per boutique: cached listings filtered on one only
+# go stale when a product of that category or boutique is written
+category_generations = KeyedGenerationCounter()
+boutique_generations = KeyedGenerationCounter()
+
+# Body prefix of a listing without products (fields render in schema order)
+EMPTY_LISTING_PREFIX = b'{"products":[]'
 
 class ProductService:
     
+    # Rendered homepage rails, keyed by (rail, limit, catalog generation)
+    _rail_cache = TTLCache(ttl=settings.PRODUCT_RAIL_CACHE_TTL, max_entries=256)
+    
+    # Rendered first pages of listings, keyed by listing_cache_key
+    _listing_cache = ByteSizeLRUCache(
+        ttl=settings.PRODUCT_LISTING_CACHE_TTL,
+        max_bytes=settings.PRODUCT_LISTING_CACHE_MAX_BYTES
+    )
+    
     @staticmethod
     async def create_product(product_data: ProductCreate, boutique_id: str) -> Product:
         """Create a new product"""
@@ -30,18 +118,17 @@ class ProductService:
         if not boutique or boutique.status != "approved":
             raise ValueError("Boutique not found or not approved")
         
-        # Generate slug
-        slug = await ProductService.generate_unique_slug(product_data.name)
-        
-        # Create product
+        # Create product, the slug is allocated on insert
         product = Product(
             **product_data.dict(exclude={"boutique_id"}),
             boutique_id=str(boutique.id),
             boutique_name=boutique.name,
-            slug=slug
+            slug=""
         )
         
-        await product.save()
+        await product_slugs.insert(product, product_data.name)
+        ProductService._on_product_saved(product)
+        await CatalogStatsService.record_change(None, CatalogStatsService.product_key(product))
         
         # Update boutique product count
         boutique.total_products += 1
@@ -50,182 +137,745 @@ class ProductService:
         return product
     
     @staticmethod
-    async def get_product_by_id(product_id: str, user_id: Optional[str] = None) -> Optional[Product]:
-        """Get product by ID and increment view count"""
+    async def import_products(
+        chunks: AsyncIterator[bytes],
+        import_format: ProductImportFormat,
+        boutique_id: str
+    ) -> ProductImportResponse:
+        """
+        Create products from an NDJSON or CSV stream
+        Rows are validated as they arrive and inserted in batches, a failing
+        row is reported and skipped without aborting the import
+        """
         
-        product = await Product.get(product_id)
-        if not product:
-            return None
+        boutique = await Boutique.get(boutique_id)
+        if not boutique or boutique.status != "approved":
+            raise ValueError("Boutique not found or not approved")
         
-        # Increment view count (but not for the boutique owner)
-        if not user_id or user_id != product.boutique_id:
-            product.add_view()
-            await product.save()
+        if import_format == ProductImportFormat.CSV:
+            rows = iter_csv_rows(chunks, settings.PRODUCT_IMPORT_MAX_ROW_LENGTH)
+        else:
+            rows = iter_ndjson_rows(chunks, settings.PRODUCT_IMPORT_MAX_ROW_LENGTH)
+        
+        result = ProductImportResponse(created=0, failed=0, errors=[])
+        batch: List[Tuple[int, Product]] = []
+        
+        async for line, row, error in rows:
+            if error is None and import_format == ProductImportFormat.CSV:
+                row, error = ProductService._parse_csv_cells(row)
+            if error is not None:
+                ProductService._record_import_errors(result, line, [error])
+                continue
+            
+            try:
+                product_data = ProductCreate(**{**row, "boutique_id": str(boutique.id)})
+            except ValidationError as e:
+                ProductService._record_import_errors(result, line, [
+                    f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in e.errors()
+                ])
+                continue
+            
+            # insert_many neither assigns ids nor runs the document event hooks
+            product = Product(
+                **product_data.dict(exclude={"boutique_id"}),
+                id=PydanticObjectId(),
+                boutique_id=str(boutique.id),
+                boutique_name=boutique.name,
+                slug=""
+            )
+            product.sync_variant_filters()
+            batch.append((line, product))
+            
+            if len(batch) >= settings.PRODUCT_IMPORT_BATCH_SIZE:
+                await ProductService._insert_import_batch(batch, boutique, result)
+                batch = []
+        
+        await ProductService._insert_import_batch(batch, boutique, result)
+        return result
+    
+    @staticmethod
+    async def _insert_import_batch(batch: List[Tuple[int, Product]], boutique: Boutique, result: ProductImportResponse):
+        """Insert a batch of imported products and apply the side effects of create_product once"""
+        if not batch:
+            return
+        
+        products = [product for _, product in batch]
+        failures = await product_slugs.insert_many(products, [product.name for product in products])
+        for position, message in failures.items():
+            ProductService._record_import_errors(result, batch[position][0], [message])
+        
+        created = [product for position, product in enumerate(products) if position not in failures]
+        if not created:
+            return
+        result.created += len(created)
+        
+        for product in created:
+            ProductService._on_product_saved(product)
+        await CatalogStatsService.record_created([CatalogStatsService.product_key(product) for product in created])
+        
+        await Boutique.get_motor_collection().update_one(
+            {"_id": boutique.id},
+            {"$inc": {"total_products": len(created)}}
+        )
+    
+    @staticmethod
+    def _parse_csv_cells(row: Dict[str, str]) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        Turn CSV cells into ProductCreate input
+        Nested fields are JSON cells, tags and images may also be comma-separated
+        """
+        data: dict = dict(row)
+        for field in CSV_JSON_FIELDS:
+            value = data.get(field)
+            if value is None:
+                continue
+            if field in CSV_LIST_FIELDS and not value.lstrip().startswith("["):
+                data[field] = [item.strip() for item in value.split(",") if item.strip()]
+                continue
+            try:
+                data[field] = json.loads(value)
+            except ValueError:
+                return None, f"{field}: invalid JSON"
+        return data, None
+    
+    @staticmethod
+    def _record_import_errors(result: ProductImportResponse, line: int, errors: List[str]):
+        result.failed += 1
+        if len(result.errors) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+            result.errors.append(ProductImportError(row=line, errors=errors))
+        else:
+            result.errors_truncated = True
+    
+    @staticmethod
+    async def get_product_by_id(product_id: str, user_id: Optional[str] = None, count_view: bool = True) -> Optional[Product]:
+        """Get product by ID and increment view count"""
         
+        product = await Product.get(product_id)
+        if product and count_view:
+            ProductService.record_view(product, user_id)
         return product
     
     @staticmethod
-    async def get_product_by_slug(slug: str, user_id: Optional[str] = None) -> Optional[Product]:
+    async def get_product_by_slug(slug: str, user_id: Optional[str] = None, count_view: bool = True) -> Optional[Product]:
         """Get product by slug"""
         
         product = await Product.find_one(Product.slug == slug)
-        if not product:
-            return None
-        
-        # Increment view count
+        if product and count_view:
+            ProductService.record_view(product, user_id)
+        return product
+    
+    @staticmethod
+    def record_view(product: Product, user_id: Optional[str] = None):
+        """
+        Increment the view count (but not for the boutique owner)
+        Buffered and flushed in bulk, only the given copy is updated here
+        """
         if not user_id or user_id != product.boutique_id:
             product.add_view()
-            await product.save()
+            product_views.add(str(product.id))
+            product_activity.record(str(product.id), "views")
+    
+    @staticmethod
+    async def search_products_json(
+        filters: ProductFilters,
+        sort: ProductSort = ProductSort.RELEVANCE,
+        page: int = 1,
+        size: int = 20,
+        cursor: Optional[str] = None,
+        count_strategy: Optional[CountStrategy] = None
+    ) -> bytes:
+        """
+        search_products rendered as a JSON body
+        First pages are cached until a product write can change them (see
+        listing_cache_key); concurrent misses share one query
+        """
+        async def render() -> bytes:
+            return dump_json(await ProductService.search_products(
+                filters=filters,
+                sort=sort,
+                page=page,
+                size=size,
+                cursor=cursor,
+                count_strategy=count_strategy
+            ))
         
-        return product
+        key = ProductService.listing_cache_key(filters, sort, page, size, cursor, count_strategy)
+        if key is None:
+            return await render()
+        return await ProductService._listing_cache.get_or_load(key, render)
+    
+    @staticmethod
+    def listing_cache_key(
+        filters: ProductFilters,
+        sort: ProductSort,
+        page: int,
+        size: int,
+        cursor: Optional[str],
+        count_strategy: Optional[CountStrategy]
+    ) -> Optional[tuple]:
+        """
+        Cache key of a listing request, None when it is not cached
+        A hash of the canonical request, plus the generation of the filtered
+        category and boutique, or the catalog generation when neither is
+        filtered (any product write can change such a listing)
+        """
+        if cursor is not None or page > settings.PRODUCT_LISTING_CACHE_MAX_PAGE:
+            return None
+        
+        request = json.dumps({
+            "filters": ProductCountService.cache_key(filters),
+            "sort": sort.value,
+            "page": page,
+            "size": size,
+            "count_strategy": count_strategy.value if count_strategy else None
+        }, sort_keys=True, separators=(",", ":"))
+        key = [hashlib.blake2b(request.encode(), digest_size=16).digest()]
+        
+        if filters.category:
+            key.append(("category", category_generations.get(filters.category)))
+        if filters.boutique_id:
+            key.append(("boutique", boutique_generations.get(filters.boutique_id)))
+        if len(key) == 1:
+            key.append(("catalog", catalog_generation.value))
+        return tuple(key)
+    
+    @staticmethod
+    def listing_cache_stats() -> dict:
+        """Size and hit/miss counters of the listing result cache"""
+        return ProductService._listing_cache.stats()
     
     @staticmethod
     async def search_products(
         filters: ProductFilters,
         sort: ProductSort = ProductSort.RELEVANCE,
         page: int = 1,
-        size: int = 20
+        size: int = 20,
+        cursor: Optional[str] = None,
+        count_strategy: Optional[CountStrategy] = None
     ) -> ProductListResponse:
-        """Search and filter products"""
+        """
+        Search and filter products
+        
+        Two pagination modes are supported:
+        - page/size: classic offset pagination
+        - cursor: keyset pagination resuming after the last product of the
+          previous page, so deep pages do not walk every earlier match
+        
+        The total is produced by the requested count strategy, or by the
+        cheapest suitable one when none is requested
+        
+        Plain listings of active products are answered from the in-process
+        catalog snapshot when it is loaded
+        """
+        
+        if catalog_snapshot.can_answer(filters, cursor):
+            return ProductService._search_snapshot(filters, sort, page, size, count_strategy)
+        
+        query_conditions = ProductService._filter_conditions(filters)
+        
+        # Text search
+        search_scores = None
+        text_search = False
+        if filters.search:
+            search_condition, search_scores, text_search = ProductService._search_condition(filters.search)
+            query_conditions.append(search_condition)
+        
+        # Relevance of a text search blends the match score with rating and views
+        if sort == ProductSort.RELEVANCE:
+            if search_scores is not None:
+                return await ProductService._search_by_score(
+                    query_conditions, search_scores, page, size, cursor, count_strategy
+                )
+            if text_search:
+                return await ProductService._search_by_text_score(
+                    query_conditions, filters, page, size, cursor, count_strategy
+                )
+        
+        sort_criteria = ProductService._sort_criteria(sort)
+        
+        # Count before adding the keyset condition so total covers the whole result set
+        count_query = And(*query_conditions) if query_conditions else {}
+        count_strategy = ProductCountService.resolve_strategy(
+            count_strategy,
+            filtered=ProductCountService.is_filtered(filters),
+            cursor_mode=cursor is not None,
+            unconditional=ProductCountService.is_unconditional(filters)
+        )
+        
+        # Keyset pagination: resume strictly after the cursor position
+        if cursor:
+            cursor_values = decode_cursor(cursor, sort.value)
+            query_conditions.append(keyset_filter(sort_criteria, cursor_values))
+        
+        # Combine all conditions
+        query = And(*query_conditions) if query_conditions else {}
+        
+        # Execute query with pagination
+        skip = 0 if cursor else (page - 1) * size
+        
+        if query_conditions:
+            products = await Product.find(query).sort(*sort_criteria).skip(skip).limit(size + 1).project(ProductCard).to_list()
+        else:
+            products = await Product.find_all().sort(*sort_criteria).skip(skip).limit(size + 1).project(ProductCard).to_list()
+        
+        total = await ProductCountService.count(count_strategy, count_query, filters)
         
-        # Build query
-        query_conditions = []
+        # The extra fetched product only tells whether another page exists
+        has_more = len(products) > size
+        products = products[:size]
+        
+        # Calculate pagination info
+        total_pages = (total + size - 1) // size if total is not None else None
+        has_next = has_more
+        has_prev = cursor is not None or page > 1
+        next_cursor = (
+            encode_cursor(sort.value, document_sort_values(products[-1], sort_criteria))
+            if has_more else None
+        )
+        
+        # Convert to response format
+        product_responses = [to_product_response(product) for product in products]
+        
+        return ProductListResponse(
+            products=product_responses,
+            total=total,
+            page=page,
+            size=size,
+            total_pages=total_pages,
+            has_next=has_next,
+            has_prev=has_prev,
+            next_cursor=next_cursor,
+            count_strategy=count_strategy
+        )
+    
+    @staticmethod
+    def _search_snapshot(
+        filters: ProductFilters,
+        sort: ProductSort,
+        page: int,
+        size: int,
+        count_strategy: Optional[CountStrategy]
+    ) -> ProductListResponse:
+        """
+        Listing page from the catalog snapshot, in the MongoDB order
+        The count is exact whatever the strategy, except NONE which omits it
+        """
+        sort_criteria = ProductService._sort_criteria(sort)
+        count_strategy = ProductCountService.resolve_strategy(
+            count_strategy,
+            filtered=ProductCountService.is_filtered(filters),
+            cursor_mode=False,
+            unconditional=ProductCountService.is_unconditional(filters)
+        )
+        
+        products, matched = catalog_snapshot.query(filters, sort_criteria, (page - 1) * size, size)
+        total = matched if count_strategy != CountStrategy.NONE else None
+        has_next = page * size < matched
+        
+        return ProductListResponse(
+            products=[to_product_response(product) for product in products],
+            total=total,
+            page=page,
+            size=size,
+            total_pages=(total + size - 1) // size if total is not None else None,
+            has_next=has_next,
+            has_prev=page > 1,
+            next_cursor=(
+                encode_cursor(sort.value, document_sort_values(products[-1], sort_criteria))
+                if has_next else None
+            ),
+            count_strategy=count_strategy
+        )
+    
+    @staticmethod
+    async def faceted_search(
+        filters: ProductFilters,
+        sort: ProductSort = ProductSort.RELEVANCE,
+        page: int = 1,
+        size: int = 20
+    ) -> ProductFacetsResponse:
+        """
+        Search products and compute facet counts in a single $facet aggregation
+        
+        Each facet ignores its own filter (the category facet ignores the
+        category filter, and so on) so that it lists the alternatives to the
+        current selection, while honouring every other active filter
+        
+        Relevance pages of in-process index searches are ranked beforehand
+        by _rank_by_score, as in search_products, so both endpoints order a
+        query alike
+        """
+        
+        groups = ProductService._filter_condition_groups(filters)
+        base_conditions = list(groups["common"])
+        search_scores = None
+        text_search = False
+        if filters.search:
+            search_condition, search_scores, text_search = ProductService._search_condition(filters.search)
+            base_conditions.append(search_condition)
+        
+        def facet_match(exclude: Tuple[str, ...]) -> dict:
+            # Facet-owned filters, except the facet's own group
+            conditions = [
+                condition
+                for group in FACET_FILTER_GROUPS if group not in exclude
+                for condition in groups[group]
+            ]
+            return {"$match": Product.find(*conditions).get_filter_query() if conditions else {}}
+        
+        # Page selection, in the order search_products uses for the same query
+        skip = (page - 1) * size
+        if sort == ProductSort.RELEVANCE and search_scores is not None:
+            # Ranked like _search_by_score, the page then fetched in that order
+            ranked = await ProductService._rank_by_score(
+                base_conditions + [condition for group in FACET_FILTER_GROUPS for condition in groups[group]],
+                search_scores
+            )
+            window_ids = [PydanticObjectId(pid) for _, pid in ranked[skip:skip + size]]
+            page_stages = [
+                {"$match": {"_id": {"$in": window_ids}}},
+                {"$addFields": {"relevance": {"$indexOfArray": [window_ids, "$_id"]}}},
+                {"$sort": {"relevance": 1}}
+            ]
+        elif sort == ProductSort.RELEVANCE and text_search:
+            page_stages = [
+                {"$addFields": {"relevance": TEXT_RELEVANCE_EXPRESSION}},
+                {"$sort": {"relevance": -1, "_id": -1}},
+                {"$skip": skip},
+                {"$limit": size}
+            ]
+        else:
+            page_stages = [
+                {"$sort": dict(ProductService._sort_criteria(sort))},
+                {"$skip": skip},
+                {"$limit": size}
+            ]
+        
+        all_filters = facet_match(())
+        pipeline = [{"$facet": {
+            "products": [
+                all_filters,
+                *page_stages,
+                {"$project": PRODUCT_CARD_PROJECTION}
+            ],
+            "total": [all_filters, {"$count": "count"}],
+            "categories": [
+                facet_match(("category",)),
+                {"$group": {
+                    "_id": {"category": "$category", "subcategory": "$subcategory"},
+                    "count": {"$sum": 1}
+                }}
+            ],
+            "brands": [
+                facet_match(("brand",)),
+                {"$match": {"brand": {"$ne": None}}},
+                {"$group": {"_id": "$brand", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": settings.FACET_MAX_BRANDS}
+            ],
+            "price_histogram": [
+                facet_match(("price",)),
+                {"$bucketAuto": {"groupBy": "$base_price", "buckets": settings.FACET_PRICE_BUCKETS}}
+            ],
+            "conditions": [
+                facet_match(("condition",)),
+                {"$group": {"_id": "$condition", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1}}
+            ]
+        }}]
+        
+        result = (await Product.find(*base_conditions).aggregate(pipeline).to_list())[0]
+        
+        total = result["total"][0]["count"] if result["total"] else 0
+        total_pages = (total + size - 1) // size
+        
+        # Fold category/subcategory pairs into categories
+        categories: Dict[str, CategoryFacet] = {}
+        for item in result["categories"]:
+            name = item["_id"]["category"]
+            category = categories.setdefault(name, CategoryFacet(name=name, count=0))
+            category.count += item["count"]
+            subcategory = item["_id"].get("subcategory")
+            if subcategory:
+                category.subcategories.append(FacetCount(value=subcategory, count=item["count"]))
+        for category in categories.values():
+            category.subcategories.sort(key=lambda facet: -facet.count)
+        
+        return ProductFacetsResponse(
+            products=[
+                to_product_response(ProductCard.model_validate(doc))
+                for doc in result["products"]
+            ],
+            total=total,
+            page=page,
+            size=size,
+            total_pages=total_pages,
+            has_next=page < total_pages,
+            has_prev=page > 1,
+            count_strategy=CountStrategy.EXACT,
+            categories=sorted(categories.values(), key=lambda category: -category.count),
+            brands=[FacetCount(value=item["_id"], count=item["count"]) for item in result["brands"]],
+            price_histogram=[
+                PriceBucket(
+                    min_price=item["_id"]["min"],
+                    max_price=item["_id"]["max"],
+                    count=item["count"]
+                )
+                for item in result["price_histogram"]
+            ],
+            conditions=[FacetCount(value=item["_id"], count=item["count"]) for item in result["conditions"]]
+        )
+    
+    @staticmethod
+    def _filter_conditions(filters: ProductFilters) -> list:
+        """Build query conditions for filters (text search excluded)"""
+        groups = ProductService._filter_condition_groups(filters)
+        return [condition for conditions in groups.values() for condition in conditions]
+    
+    @staticmethod
+    def _filter_condition_groups(filters: ProductFilters) -> Dict[str, list]:
+        """
+        Query conditions for filters, grouped by FACET_FILTER_GROUPS
+        Filters without a facet of their own go to the "common" group
+        """
+        groups = {"common": [], **{group: [] for group in FACET_FILTER_GROUPS}}
+        common = groups["common"]
         
         # Status filter (always apply)
         if filters.status:
-            query_conditions.append(Product.status == filters.status)
+            common.append(Product.status == filters.status)
         
         # Stock filter
         if filters.in_stock_only:
-            query_conditions.append(Product.total_stock > 0)
+            common.append(Product.total_stock > 0)
         
         # Category filters
         if filters.category:
-            query_conditions.append(Product.category == filters.category)
+            groups["category"].append(Product.category == filters.category)
         if filters.subcategory:
-            query_conditions.append(Product.subcategory == filters.subcategory)
+            groups["category"].append(Product.subcategory == filters.subcategory)
         
         # Boutique filter
         if filters.boutique_id:
-            query_conditions.append(Product.boutique_id == filters.boutique_id)
+            common.append(Product.boutique_id == filters.boutique_id)
         
         # Brand filter
         if filters.brand:
-            query_conditions.append(Product.brand == filters.brand)
+            groups["brand"].append(Product.brand == filters.brand)
         
         # Price range
         if filters.min_price is not None:
-            query_conditions.append(Product.base_price >= filters.min_price)
+            groups["price"].append(Product.base_price >= filters.min_price)
         if filters.max_price is not None:
-            query_conditions.append(Product.base_price <= filters.max_price)
+            groups["price"].append(Product.base_price <= filters.max_price)
         
-        # Color filter
-        if filters.color:
-            query_conditions.append(RegEx(Product.colors, filters.color, "i"))
+        # Color filter (comma-separated values match any of them)
+        color_keys = ProductService._variant_keys(filters.color)
+        if color_keys:
+            common.append(In(Product.color_names, color_keys))
         
-        # Size filter
-        if filters.size:
-            query_conditions.append(RegEx(Product.variants, filters.size, "i"))
+        # Size filter, restricted to sizes still in stock when listing in-stock products
+        size_keys = ProductService._variant_keys(filters.size)
+        if size_keys:
+            size_field = Product.in_stock_sizes if filters.in_stock_only else Product.size_names
+            common.append(In(size_field, size_keys))
         
         # Condition filter
         if filters.condition:
-            query_conditions.append(Product.condition == filters.condition)
+            groups["condition"].append(Product.condition == filters.condition)
         
         # Featured/Trending filters
         if filters.is_featured is not None:
-            query_conditions.append(Product.is_featured == filters.is_featured)
+            common.append(Product.is_featured == filters.is_featured)
         if filters.is_trending is not None:
-            query_conditions.append(Product.is_trending == filters.is_trending)
+            common.append(Product.is_trending == filters.is_trending)
         
-        # Text search
-        if filters.search:
-            search_conditions = [
-                RegEx(Product.name, filters.search, "i"),
-                RegEx(Product.description, filters.search, "i"),
-                RegEx(Product.tags, filters.search, "i"),
-                RegEx(Product.brand, filters.search, "i") if filters.search else None
-            ]
-            search_conditions = [cond for cond in search_conditions if cond is not None]
-            if search_conditions:
-                query_conditions.append(Or(*search_conditions))
+        return groups
+    
+    @staticmethod
+    def _variant_keys(value: Optional[str]) -> List[str]:
+        """Filter keys of a comma-separated color or size filter"""
+        if not value:
+            return []
+        keys = (variant_filter_key(part) for part in value.split(","))
+        return [key for key in keys if key]
+    
+    @staticmethod
+    def _search_condition(search: str) -> Tuple[object, Optional[Dict[str, float]], bool]:
+        """
+        Build the text search condition
+        Returns (condition, in-process index scores or None, whether $text is used)
         
-        # Combine all conditions
-        query = And(*query_conditions) if query_conditions else {}
+        The in-process index takes precedence once built; $text (ranked by
+        textScore with the same blend) serves searches until then, or always
+        with SEARCH_INDEX_ENABLED=False
+        
+        Filters apply after candidate selection, so a query matching more
+        than SEARCH_MAX_CANDIDATES products is served by $text or regexes
+        too: a truncated candidate list would drop filtered matches and cap
+        the total
+        """
+        if product_search_index.ready:
+            # Ranked candidates from the in-process index, one extra to detect truncation
+            ranked = product_search_index.search(search, limit=settings.SEARCH_MAX_CANDIDATES + 1)
+            if len(ranked) <= settings.SEARCH_MAX_CANDIDATES:
+                search_scores = dict(ranked)
+                return In(Product.id, [PydanticObjectId(pid) for pid in search_scores]), search_scores, False
         
-        # Build sort
+        if is_text_searchable(search):
+            # Whole words: served by the text index on name, description and tags
+            return Text(search), None, True
+        
+        # Partial words: the text index cannot match them, scan with regexes
+        search_conditions = [
+            RegEx(Product.name, search, "i"),
+            RegEx(Product.description, search, "i"),
+            RegEx(Product.tags, search, "i"),
+            RegEx(Product.brand, search, "i")
+        ]
+        return Or(*search_conditions), None, False
+    
+    @staticmethod
+    def _sort_criteria(sort: ProductSort) -> List[Tuple[str, int]]:
+        """Sort fields for a sort option, with _id as final tiebreaker"""
         sort_options = {
             ProductSort.RELEVANCE: [("is_featured", DESCENDING), ("rating", DESCENDING), ("views", DESCENDING)],
             ProductSort.PRICE_ASC: [("base_price", ASCENDING)],
             ProductSort.PRICE_DESC: [("base_price", DESCENDING)],
             ProductSort.NEWEST: [("created_at", DESCENDING)],
             ProductSort.OLDEST: [("created_at", ASCENDING)],
-            ProductSort.POPULARITY: [("views", DESCENDING), ("sales_count", DESCENDING)],
+            ProductSort.POPULARITY: [("trending_score", DESCENDING), ("views", DESCENDING)],
             ProductSort.RATING: [("rating", DESCENDING), ("rating_count", DESCENDING)],
             ProductSort.SALES: [("sales_count", DESCENDING)]
         }
         
-        sort_criteria = sort_options.get(sort, sort_options[ProductSort.RELEVANCE])
+        sort_criteria = list(sort_options.get(sort, sort_options[ProductSort.RELEVANCE]))
+        # _id makes the order total, which keyset pagination relies on
+        sort_criteria.append(("_id", sort_criteria[-1][1]))
+        return sort_criteria
+    
+    @staticmethod
+    async def _rank_by_score(query_conditions: list, search_scores: Dict[str, float]) -> List[Tuple[float, str]]:
+        """Products matching the conditions as (blended relevance, id), best first"""
         
-        # Execute query with pagination
-        skip = (page - 1) * size
+        matching = await Product.find(And(*query_conditions)).project(SearchRankingProjection).to_list()
+        return sorted(
+            (
+                (
+                    blend_relevance(search_scores[str(item.id)], item.rating, item.views, item.is_featured),
+                    str(item.id)
+                )
+                for item in matching
+            ),
+            key=lambda item: (-item[0], item[1])
+        )
+    
+    @staticmethod
+    async def _search_by_score(
+        query_conditions: list,
+        search_scores: Dict[str, float],
+        page: int,
+        size: int,
+        cursor: Optional[str],
+        count_strategy: Optional[CountStrategy]
+    ) -> ProductListResponse:
+        """
+        Paginate in-process search results ordered by blended relevance
+        Every match is ranked, so the count is exact whatever the strategy,
+        except NONE which omits it
+        """
         
-        if query_conditions:
-            products = await Product.find(query).sort(*sort_criteria).skip(skip).limit(size).to_list()
-            total = await Product.find(query).count()
+        # Same strategies as the $text search path
+        count_strategy = ProductCountService.resolve_strategy(
+            count_strategy,
+            filtered=True,
+            cursor_mode=cursor is not None
+        )
+        ranked = await ProductService._rank_by_score(query_conditions, search_scores)
+        matched = len(ranked)
+        total = matched if count_strategy != CountStrategy.NONE else None
+        
+        if cursor:
+            after_score, after_id = decode_cursor(cursor, ProductSort.RELEVANCE.value, types=(float, str))
+            ranked = [item for item in ranked if (-item[0], item[1]) > (-after_score, after_id)]
+            start = 0
         else:
-            products = await Product.find_all().sort(*sort_criteria).skip(skip).limit(size).to_list()
-            total = await Product.count()
+            start = (page - 1) * size
         
-        # Calculate pagination info
-        total_pages = (total + size - 1) // size
-        has_next = page < total_pages
-        has_prev = page > 1
+        window = ranked[start:start + size]
+        has_next = len(ranked) > start + size
         
-        # Convert to response format
-        product_responses = [
-            ProductResponse(
-                id=str(product.id),
-                name=product.name,
-                name_ar=product.name_ar,
-                slug=product.slug,
-                description=product.description,
-                description_ar=product.description_ar,
-                boutique_id=product.boutique_id,
-                boutique_name=product.boutique_name,
-                category=product.category,
-                subcategory=product.subcategory,
-                tags=product.tags,
-                brand=product.brand,
-                base_price=product.base_price,
-                sale_price=product.sale_price,
-                current_price=product.current_price,
-                discount_percentage=product.discount_percentage,
-                currency=product.currency,
-                main_image=product.main_image,
-                images=product.images,
-                condition=product.condition,
-                status=product.status,
-                is_featured=product.is_featured,
-                is_trending=product.is_trending,
-                is_in_stock=product.is_in_stock,
-                total_stock=product.total_stock,
-                rating=product.rating,
-                rating_count=product.rating_count,
-                sales_count=product.sales_count,
-                views=product.views,
-                created_at=product.created_at.isoformat()
-            )
-            for product in products
+        products = await Product.find(
+            In(Product.id, [PydanticObjectId(pid) for _, pid in window])
+        ).project(ProductCard).to_list()
+        products_by_id = {str(product.id): product for product in products}
+        
+        return ProductListResponse(
+            products=[
+                to_product_response(products_by_id[pid])
+                for _, pid in window if pid in products_by_id
+            ],
+            total=total,
+            page=page,
+            size=size,
+            total_pages=(total + size - 1) // size if total is not None else None,
+            has_next=has_next,
+            has_prev=cursor is not None or page > 1,
+            next_cursor=encode_cursor(ProductSort.RELEVANCE.value, list(window[-1])) if has_next else None,
+            count_strategy=count_strategy
+        )
+    
+    @staticmethod
+    async def _search_by_text_score(
+        query_conditions: list,
+        filters: ProductFilters,
+        page: int,
+        size: int,
+        cursor: Optional[str],
+        count_strategy: Optional[CountStrategy]
+    ) -> ProductListResponse:
+        """Paginate $text search results ordered by textScore blended with rating and views"""
+        
+        query = And(*query_conditions)
+        sort_criteria = [("relevance", DESCENDING), ("_id", DESCENDING)]
+        count_strategy = ProductCountService.resolve_strategy(
+            count_strategy,
+            filtered=True,
+            cursor_mode=cursor is not None
+        )
+        
+        pipeline = [{"$addFields": {"relevance": TEXT_RELEVANCE_EXPRESSION}}]
+        if cursor:
+            pipeline.append({"$match": keyset_filter(sort_criteria, decode_cursor(cursor, ProductSort.RELEVANCE.value))})
+            skip = 0
+        else:
+            skip = (page - 1) * size
+        pipeline += [
+            {"$sort": dict(sort_criteria)},
+            {"$skip": skip},
+            {"$limit": size + 1},
+            {"$project": {**PRODUCT_CARD_PROJECTION, "relevance": 1}}
         ]
         
+        documents = await Product.find(query).aggregate(pipeline).to_list()
+        total = await ProductCountService.count(count_strategy, query, filters)
+        
+        has_next = len(documents) > size
+        documents = documents[:size]
+        
         return ProductListResponse(
-            products=product_responses,
+            products=[to_product_response(ProductCard.model_validate(doc)) for doc in documents],
             total=total,
             page=page,
             size=size,
-            total_pages=total_pages,
+            total_pages=(total + size - 1) // size if total is not None else None,
             has_next=has_next,
-            has_prev=has_prev
+            has_prev=cursor is not None or page > 1,
+            next_cursor=(
+                encode_cursor(ProductSort.RELEVANCE.value, [documents[-1]["relevance"], documents[-1]["_id"]])
+                if has_next else None
+            ),
+            count_strategy=count_strategy
         )
     
     @staticmethod
@@ -240,14 +890,162 @@ class ProductService:
         if product.boutique_id != user_id:
             raise PermissionError("Not authorized to update this product")
         
+        stats_before = CatalogStatsService.product_key(product)
+        previous_category = product.category
+        
         # Update fields
         update_data = product_data.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(product, field, value)
         
         await product.save()
+        ProductService._on_product_saved(product, previous_category)
+        await CatalogStatsService.record_change(stats_before, CatalogStatsService.product_key(product))
         return product
     
+    @staticmethod
+    async def bulk_update_products(updates: List[ProductStockPriceUpdate], user_id: str) -> ProductBulkUpdateResponse:
+        """
+        Apply price and stock changes to many products with one ordered bulk_write
+        Targets are loaded and their ownership checked with a single query
+        """
+        
+        if len(updates) > settings.PRODUCT_BULK_UPDATE_MAX_ROWS:
+            raise ValueError(f"At most {settings.PRODUCT_BULK_UPDATE_MAX_ROWS} updates per request")
+        
+        results = [ProductBulkUpdateResult(index=index, updated=False) for index in range(len(updates))]
+        product_ids = set()
+        skus = set()
+        
+        for result, update in zip(results, updates):
+            if (update.product_id is None) == (update.sku is None):
+                result.error = "Provide either product_id or sku"
+            elif not update.dict(exclude_unset=True, exclude={"product_id", "sku"}):
+                result.error = "Nothing to update"
+            elif update.sku is not None:
+                skus.add(update.sku)
+            elif PydanticObjectId.is_valid(update.product_id):
+                product_ids.add(PydanticObjectId(update.product_id))
+            else:
+                result.error = "Product not found"
+        
+        # SKUs are only unique within a boutique, so they are looked up in the merchant's products
+        conditions = []
+        if product_ids:
+            conditions.append({"_id": {"$in": list(product_ids)}})
+        if skus:
+            conditions.append({"boutique_id": user_id, "variants.sku": {"$in": list(skus)}})
+        
+        by_id: Dict[str, StockPriceTarget] = {}
+        by_sku: Dict[str, Dict[str, StockPriceTarget]] = {}
+        if conditions:
+            async for target in Product.find({"$or": conditions}).project(StockPriceTarget):
+                by_id[str(target.id)] = target
+                if target.boutique_id == user_id:
+                    for variant in target.variants:
+                        if variant.sku in skus:
+                            by_sku.setdefault(variant.sku, {})[str(target.id)] = target
+        
+        now = datetime.utcnow()
+        operations: List[UpdateOne] = []
+        applied: List[ProductBulkUpdateResult] = []
+        
+        for result, update in zip(results, updates):
+            if result.error:
+                continue
+            changes = update.dict(exclude_unset=True, exclude={"product_id", "sku"})
+            
+            if update.product_id is not None:
+                target = by_id.get(update.product_id)
+                if target is None:
+                    result.error = "Product not found"
+                    continue
+                if target.boutique_id != user_id:
+                    result.error = "Not authorized to update this product"
+                    continue
+                # total_stock is the sum of the variant stocks, which are updated by SKU
+                if "total_stock" in changes and target.variants:
+                    result.error = "Product has variants, update their stock by SKU"
+                    continue
+                result.error = ProductService._sale_price_error(target, changes)
+                if result.error:
+                    continue
+                # Later rows of the same request see the new prices
+                for field in ("base_price", "sale_price"):
+                    if field in changes:
+                        setattr(target, field, changes[field])
+                operations.append(UpdateOne({"_id": target.id}, {"$set": {**changes, "updated_at": now}}))
+            else:
+                matches = list(by_sku.get(update.sku, {}).values())
+                if len(matches) != 1:
+                    result.error = "SKU not found" if not matches else "SKU matches several products"
+                    continue
+                target = matches[0]
+                variant = next(variant for variant in target.variants if variant.sku == update.sku)
+                result.error = ProductService._sale_price_error(variant, changes, price_field="price")
+                if result.error:
+                    continue
+                operations.append(ProductService._variant_update(target, update.sku, changes, now))
+            
+            result.product_id = str(target.id)
+            applied.append(result)
+        
+        if operations:
+            try:
+                await Product.get_motor_collection().bulk_write(operations, ordered=True)
+            except BulkWriteError as e:
+                # Ordered: the failing update and every one after it were not applied
+                error = e.details["writeErrors"][0]
+                for position, result in enumerate(applied[error["index"]:]):
+                    result.error = error.get("errmsg", "Update failed") if position == 0 else "Not applied, an earlier update failed"
+                applied = applied[:error["index"]]
+            
+            for result in applied:
+                result.updated = True
+            await ProductService.on_stock_changed([by_id[result.product_id].id for result in applied])
+        
+        return ProductBulkUpdateResponse(
+            updated=len(applied),
+            failed=len(results) - len(applied),
+            results=results
+        )
+    
+    @staticmethod
+    def _sale_price_error(current, changes: dict, price_field: str = "base_price") -> Optional[str]:
+        """Error of a price change leaving the sale price at or above the price, if any"""
+        price = changes.get("base_price", getattr(current, price_field))
+        sale_price = changes["sale_price"] if "sale_price" in changes else current.sale_price
+        if sale_price is not None and sale_price >= price:
+            return "Sale price must be less than base price"
+        return None
+    
+    @staticmethod
+    def _variant_update(target: StockPriceTarget, sku: str, changes: dict, now: datetime) -> UpdateOne:
+        """
+        Targeted update of the variant with a SKU
+        total_stock moves by the variant's stock difference and in_stock_sizes
+        is derived again; target is updated in place so later rows of the same
+        request see the change
+        """
+        variant = next(variant for variant in target.variants if variant.sku == sku)
+        update: dict = {"$set": {"updated_at": now}}
+        
+        if "total_stock" in changes:
+            delta = changes["total_stock"] - variant.stock
+            variant.stock = changes["total_stock"]
+            update["$set"]["variants.$.stock"] = variant.stock
+            update["$set"]["in_stock_sizes"] = variant_filter_values(target.colors, target.variants)["in_stock_sizes"]
+            if delta:
+                update["$inc"] = {"total_stock": delta}
+        if "base_price" in changes:
+            variant.price = changes["base_price"]
+            update["$set"]["variants.$.price"] = variant.price
+        if "sale_price" in changes:
+            variant.sale_price = changes["sale_price"]
+            update["$set"]["variants.$.sale_price"] = variant.sale_price
+        
+        return UpdateOne({"_id": target.id, "variants.sku": sku}, update)
+    
     @staticmethod
     async def delete_product(product_id: str, user_id: str) -> bool:
         """Delete product (only by boutique owner or admin)"""
@@ -261,6 +1059,8 @@ class ProductService:
             raise PermissionError("Not authorized to delete this product")
         
         await product.delete()
+        ProductService._on_product_deleted(product)
+        await CatalogStatsService.record_change(CatalogStatsService.product_key(product), None)
         
         # Update boutique product count
         boutique = await Boutique.get(product.boutique_id)
@@ -272,69 +1072,53 @@ class ProductService:
     
     @staticmethod
     async def get_categories() -> List[CategoryResponse]:
-        """Get all product categories with counts"""
-        
-        pipeline = [
-            {"$match": {"status": "active"}},
-            {"$group": {
-                "_id": {
-                    "category": "$category",
-                    "subcategory": "$subcategory"
-                },
-                "count": {"$sum": 1}
-            }},
-            {"$group": {
-                "_id": "$_id.category",
-                "total_count": {"$sum": "$count"},
-                "subcategories": {
-                    "$push": {
-                        "$cond": [
-                            {"$ne": ["$_id.subcategory", None]},
-                            "$_id.subcategory",
-                            "$$REMOVE"
-                        ]
-                    }
-                }
-            }},
-            {"$sort": {"total_count": -1}}
-        ]
-        
-        result = await Product.aggregate(pipeline).to_list()
+        """Get all product categories with counts (materialized in category_stats)"""
+        return await CatalogStatsService.get_categories()
+    
+    @staticmethod
+    async def suggest(query: str, limit: int = 8) -> List[ProductSuggestion]:
+        """
+        Search-as-you-type suggestions for a partial query
+        Served from the in-process suggestion index; until it is built, falls
+        back to product names starting with the query
+        """
+        if product_suggestions.ready:
+            return [ProductSuggestion(**suggestion) for suggestion in product_suggestions.suggest(query, limit)]
         
-        categories = []
-        for item in result:
-            categories.append(CategoryResponse(
-                name=item["_id"],
-                slug=generate_slug(item["_id"]),
-                product_count=item["total_count"],
-                subcategories=list(set(item.get("subcategories", [])))
-            ))
+        products = await Product.find(
+            Product.status == ProductStatus.ACTIVE,
+            RegEx(Product.name, "^" + re.escape(query.strip()), "i")
+        ).sort([("views", DESCENDING)]).limit(limit).project(SuggestDocument).to_list()
         
-        return categories
+        return [
+            ProductSuggestion(text=product.name, kind=SuggestionKind.PRODUCT, product_id=str(product.id), slug=product.slug)
+            for product in products
+        ]
     
     @staticmethod
     async def get_brands() -> List[BrandResponse]:
-        """Get all brands with product counts"""
-        
-        pipeline = [
-            {"$match": {"status": "active", "brand": {"$ne": None}}},
-            {"$group": {
-                "_id": "$brand",
-                "count": {"$sum": 1}
-            }},
-            {"$sort": {"count": -1}}
-        ]
-        
-        result = await Product.aggregate(pipeline).to_list()
+        """Get all brands with product counts (materialized in brand_stats)"""
+        return await CatalogStatsService.get_brands()
+    
+    @staticmethod
+    async def get_rail_json(rail: str, limit: int = 10) -> bytes:
+        """
+        Homepage rail ("featured", "trending" or "new-arrivals") as a JSON body
+        Rails are identical for every visitor, so the rendered body is cached
+        per limit until the next product write; concurrent misses share one query
+        """
+        loaders = {
+            "featured": ProductService.get_featured_products,
+            "trending": ProductService.get_trending_products,
+            "new-arrivals": ProductService.get_new_arrivals,
+        }
+        load = loaders[rail]
         
-        brands = []
-        for item in result:
-            brands.append(BrandResponse(
-                name=item["_id"],
-                product_count=item["count"]
-            ))
+        async def render() -> bytes:
+            return dump_json(await load(limit=limit))
         
-        return brands
+        key = (rail, limit, catalog_generation.value)
+        return await ProductService._rail_cache.get_or_load(key, render)
     
     @staticmethod
     async def get_featured_products(limit: int = 10) -> List[ProductResponse]:
@@ -344,21 +1128,21 @@ class ProductService:
             Product.status == ProductStatus.ACTIVE,
             Product.is_featured == True,
             Product.total_stock > 0
-        ).sort([("created_at", DESCENDING)]).limit(limit).to_list()
+        ).sort([("created_at", DESCENDING)]).limit(limit).project(ProductCard).to_list()
         
-        return [ProductService._product_to_response(product) for product in products]
+        return [to_product_response(product) for product in products]
     
     @staticmethod
     async def get_trending_products(limit: int = 10) -> List[ProductResponse]:
-        """Get trending products"""
+        """Get trending products, by time-decayed trending score"""
         
         products = await Product.find(
             Product.status == ProductStatus.ACTIVE,
-            Product.is_trending == True,
+            Product.trending_score > 0,
             Product.total_stock > 0
-        ).sort([("views", DESCENDING), ("sales_count", DESCENDING)]).limit(limit).to_list()
+        ).sort([("trending_score", DESCENDING), ("views", DESCENDING)]).limit(limit).project(ProductCard).to_list()
         
-        return [ProductService._product_to_response(product) for product in products]
+        return [to_product_response(product) for product in products]
     
     @staticmethod
     async def get_new_arrivals(limit: int = 10) -> List[ProductResponse]:
@@ -367,13 +1151,35 @@ class ProductService:
         products = await Product.find(
             Product.status == ProductStatus.ACTIVE,
             Product.total_stock > 0
-        ).sort([("created_at", DESCENDING)]).limit(limit).to_list()
+        ).sort([("created_at", DESCENDING)]).limit(limit).project(ProductCard).to_list()
         
-        return [ProductService._product_to_response(product) for product in products]
+        return [to_product_response(product) for product in products]
     
     @staticmethod
     async def get_similar_products(product_id: str, limit: int = 8) -> List[ProductResponse]:
-        """Get similar products based on category and tags"""
+        """Get similar products from the precomputed neighbor lists"""
+        
+        neighbors = await ProductNeighbors.get(product_id)
+        if neighbors is None:
+            # Product created since the last similar products refresh
+            return await ProductService._similar_by_category(product_id, limit)
+        
+        products = await Product.find(
+            In(Product.id, neighbors.neighbor_ids),
+            Product.status == ProductStatus.ACTIVE,
+            Product.total_stock > 0
+        ).project(ProductCard).to_list()
+        products_by_id = {product.id: product for product in products}
+        
+        similar_products = [
+            products_by_id[neighbor_id] for neighbor_id in neighbors.neighbor_ids
+            if neighbor_id in products_by_id
+        ]
+        return [to_product_response(p) for p in similar_products[:limit]]
+    
+    @staticmethod
+    async def _similar_by_category(product_id: str, limit: int) -> List[ProductResponse]:
+        """Similar products based on category and tags, queried live"""
         
         product = await Product.get(product_id)
         if not product:
@@ -388,55 +1194,67 @@ class ProductService:
                 Product.category == product.category,
                 In(Product.tags, product.tags[:3])  # Use first 3 tags
             )
-        ).sort([("rating", DESCENDING), ("views", DESCENDING)]).limit(limit).to_list()
+        ).sort([("rating", DESCENDING), ("views", DESCENDING)]).limit(limit).project(ProductCard).to_list()
         
-        return [ProductService._product_to_response(p) for p in similar_products]
+        return [to_product_response(p) for p in similar_products]
     
     @staticmethod
     async def generate_unique_slug(name: str) -> str:
         """Generate unique slug for product"""
-        base_slug = generate_slug(name)
-        slug = base_slug
-        counter = 1
-        
-        while await Product.find_one(Product.slug == slug):
-            slug = f"{base_slug}-{counter}"
-            counter += 1
-        
-        return slug
-    
-    @staticmethod
-    def _product_to_response(product: Product) -> ProductResponse:
-        """Convert Product model to ProductResponse"""
-        return ProductResponse(
-            id=str(product.id),
-            name=product.name,
-            name_ar=product.name_ar,
-            slug=product.slug,
-            description=product.description,
-            description_ar=product.description_ar,
-            boutique_id=product.boutique_id,
-            boutique_name=product.boutique_name,
-            category=product.category,
-            subcategory=product.subcategory,
-            tags=product.tags,
-            brand=product.brand,
-            base_price=product.base_price,
-            sale_price=product.sale_price,
-            current_price=product.current_price,
-            discount_percentage=product.discount_percentage,
-            currency=product.currency,
-            main_image=product.main_image,
-            images=product.images,
-            condition=product.condition,
-            status=product.status,
-            is_featured=product.is_featured,
-            is_trending=product.is_trending,
-            is_in_stock=product.is_in_stock,
-            total_stock=product.total_stock,
-            rating=product.rating,
-            rating_count=product.rating_count,
-            sales_count=product.sales_count,
-            views=product.views,
-            created_at=product.created_at.isoformat()
+        return await product_slugs.next_slug(name)
+    
+    @staticmethod
+    def _bump_generations(categories: Set[str], boutique_ids: Set[str]):
+        """Invalidate cached data of the written categories and boutiques"""
+        catalog_generation.bump()
+        for category in categories:
+            category_generations.bump(category)
+        for boutique_id in boutique_ids:
+            boutique_generations.bump(boutique_id)
+    
+    @staticmethod
+    def _on_product_saved(product: Product, previous_category: Optional[str] = None):
+        """Keep in-process catalog state in sync after a product write"""
+        # A product moving category leaves the listings of its previous one
+        categories = {product.category}
+        if previous_category:
+            categories.add(previous_category)
+        ProductService._bump_generations(categories, {product.boutique_id})
+        ProductCountService.invalidate()
+        product_search_index.add(product)
+        product_suggestions.add(product)
+        catalog_snapshot.upsert(to_product_card(product))
+        cart_products.delete(str(product.id))
+    
+    @staticmethod
+    async def on_stock_changed(product_ids: List[PydanticObjectId]):
+        """
+        Keep in-process catalog state in sync after price or stock writes
+        (bulk updates, orders). These are not part of the search index, only
+        cached listings, counts, cart prices and the catalog snapshot change
+        """
+        if not product_ids:
+            return
+        
+        # Re-read the written products, in one query, for their category and boutique
+        cards = await Product.find(In(Product.id, product_ids)).project(ProductCard).to_list()
+        for product_id in product_ids:
+            cart_products.delete(str(product_id))
+        ProductService._bump_generations(
+            {card.category for card in cards},
+            {card.boutique_id for card in cards}
         )
+        ProductCountService.invalidate()
+        for card in cards:
+            catalog_snapshot.upsert(card)
+    
+    @staticmethod
+    def _on_product_deleted(product: Product):
+        """Keep in-process catalog state in sync after a product deletion"""
+        ProductService._bump_generations({product.category}, {product.boutique_id})
+        ProductCountService.invalidate()
+        product_search_index.remove(str(product.id))
+        product_suggestions.remove(str(product.id))
+        catalog_snapshot.remove(str(product.id))
+        cart_products.delete(str(product.id))
+        similar_products_index.discard(str(product.id))
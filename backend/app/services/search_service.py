@@ -0,0 +1,409 @@
+import bisect
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.models.product import Product, ProductStatus
+from app.utils.slug import search_words
+
+logger = logging.getLogger(__name__)
+
+# Words too common in product texts to help ranking
+STOPWORDS = {
+    "a", "au", "aux", "avec", "d", "de", "des", "du", "en", "et", "l", "la", "le",
+    "les", "ou", "par", "pour", "sur", "un", "une", "the", "and", "for", "with", "wa", "fy"
+}
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Normalized search tokens of a text (French/Arabic folded, stopwords removed)"""
+    if not text:
+        return []
+    return [word for word in search_words(text) if word not in STOPWORDS]
+
+# Relevance = text score * (1 + quality boost), so the boost does not depend
+# on the scale of the text scorer (BM25 or MongoDB textScore)
+RELEVANCE_RATING_WEIGHT = 0.3  # Applied to rating / 5
+RELEVANCE_VIEWS_WEIGHT = 0.05  # Applied to log10(1 + views)
+RELEVANCE_FEATURED_BOOST = 0.2
+
+def blend_relevance(text_score: float, rating: float, views: int, is_featured: bool) -> float:
+    """Blend a text match score with product popularity signals"""
+    boost = (
+        1
+        + RELEVANCE_RATING_WEIGHT * rating / 5
+        + RELEVANCE_VIEWS_WEIGHT * math.log10(1 + max(views, 0))
+        + (RELEVANCE_FEATURED_BOOST if is_featured else 0)
+    )
+    return text_score * boost
+
+# Same blend as blend_relevance, evaluated by MongoDB on the $text score
+TEXT_RELEVANCE_EXPRESSION = {
+    "$multiply": [
+        {"$meta": "textScore"},
+        {"$add": [
+            1,
+            {"$multiply": [RELEVANCE_RATING_WEIGHT / 5, "$rating"]},
+            {"$multiply": [RELEVANCE_VIEWS_WEIGHT, {"$log10": {"$add": [1, {"$max": ["$views", 0]}]}}]},
+            {"$cond": ["$is_featured", RELEVANCE_FEATURED_BOOST, 0]}
+        ]}
+    ]
+}
+
+# Shortest word the MongoDB text index can match; shorter words are usually
+# still being typed and need substring matching
+MIN_TEXT_SEARCH_WORD_LENGTH = 3
+
+def is_text_searchable(query: str) -> bool:
+    """Whether the MongoDB text index can answer a query (whole words only)"""
+    words = [word for word in re.findall(r"\w+", query.lower()) if word not in STOPWORDS]
+    return bool(words) and all(len(word) >= MIN_TEXT_SEARCH_WORD_LENGTH for word in words)
+
+# Spelling folds applied before trigram matching, so French, darija and
+# transliterated Arabic spellings of a word share trigrams
+# ("caftan", "kaftan" and "قفطان" -> "qftan" all fold to k-f-t-n)
+SPELLING_FOLDS = [
+    (re.compile(pattern), replacement) for pattern, replacement in [
+        ("dj", "j"),
+        ("ch", "sh"),
+        ("ph", "f"),
+        ("ou", "u"),
+        ("w", "u"),
+        ("ck", "k"),
+        ("q", "k"),
+        ("c(?=[eiy])", "s"),
+        ("c", "k"),
+        ("y", "i"),
+        ("(?<!s)h$", "a"),  # Final ta marbuta, transliterated "h"
+        (r"(.)\1+", r"\1"),
+    ]
+]
+VOWELS = re.compile("[aeiou]")
+
+def fold_spelling(term: str) -> str:
+    """Spelling-insensitive form of a normalized search term"""
+    for pattern, replacement in SPELLING_FOLDS:
+        term = pattern.sub(replacement, term)
+    return term
+
+def term_trigrams(term: str) -> FrozenSet[str]:
+    """
+    Trigrams of a term's folded spelling and of its consonant skeleton
+    The skeleton matches Arabic spellings, which drop short vowels
+    """
+    folded = fold_spelling(term)
+    skeleton = folded[:1] + VOWELS.sub("", folded[1:])
+    grams = set()
+    for prefix, text in (("", folded), ("#", skeleton)):
+        padded = f" {text} "
+        grams.update(prefix + padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+class TrigramIndex:
+    """
+    Trigram index of search terms for typo-tolerant lookups
+
+    Similarity is the Dice coefficient of term_trigrams. The threshold bounds
+    candidate generation: only terms whose trigram count can reach it are
+    read (postings are split by trigram count), and a term reaching it shares
+    at least one of the query's rarest trigrams (prefix filtering), so the
+    most common trigrams are never read. MAX_CANDIDATES caps the terms
+    compared on very dense vocabularies.
+    """
+
+    MAX_CANDIDATES = 1000
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, Set[str]]] = {}  # gram -> trigram count -> terms
+        self._grams: Dict[str, FrozenSet[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, term: str):
+        if term in self._grams:
+            return
+        grams = self._grams[term] = term_trigrams(term)
+        for gram in grams:
+            self._postings.setdefault(gram, {}).setdefault(len(grams), set()).add(term)
+
+    def remove(self, term: str):
+        grams = self._grams.pop(term, None)
+        if grams is None:
+            return
+        for gram in grams:
+            buckets = self._postings[gram]
+            bucket = buckets[len(grams)]
+            bucket.discard(term)
+            if not bucket:
+                del buckets[len(grams)]
+                if not buckets:
+                    del self._postings[gram]
+
+    def similar(self, term: str, min_similarity: float, limit: int) -> List[Tuple[str, float]]:
+        """Indexed terms at least min_similarity similar to term, most similar first"""
+        grams = term_trigrams(term)
+        size = len(grams)
+        sizes = range(
+            math.ceil(size * min_similarity / (2 - min_similarity)),
+            math.floor(size * (2 - min_similarity) / min_similarity) + 1
+        )
+        # Overlap needed by the smallest reachable term
+        min_overlap = math.ceil(min_similarity * (size + sizes.start) / 2)
+
+        postings = []
+        for gram in grams:
+            buckets = self._postings.get(gram, {})
+            postings.append([bucket for count, bucket in buckets.items() if count in sizes])
+        postings.sort(key=lambda buckets: sum(len(bucket) for bucket in buckets))
+
+        candidates: Set[str] = set()
+        for buckets in postings[:size - min_overlap + 1]:
+            for bucket in buckets:
+                candidates.update(bucket)
+            if len(candidates) >= self.MAX_CANDIDATES:
+                break
+
+        matches = []
+        for candidate in candidates:
+            candidate_grams = self._grams[candidate]
+            similarity = 2 * len(grams & candidate_grams) / (size + len(candidate_grams))
+            if similarity >= min_similarity:
+                matches.append((candidate, similarity))
+
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+class SearchRankingProjection(BaseModel):
+    """Projection loading the fields needed to rank search results"""
+    id: PydanticObjectId = Field(alias="_id")
+    rating: float = 0.0
+    views: int = 0
+    is_featured: bool = False
+
+class SearchDocument(BaseModel):
+    """Projection of the product fields that feed the search index"""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    name_ar: Optional[str] = None
+    description: str = ""
+    description_ar: Optional[str] = None
+    tags: List[str] = []
+    brand: Optional[str] = None
+    status: ProductStatus = ProductStatus.ACTIVE
+
+class ProductSearchIndex:
+    """
+    In-memory inverted index over active products, ranked with BM25
+
+    Field matches are weighted (a name hit counts more than a description hit)
+    by scaling term frequencies before BM25 saturation. Terms of names, brands
+    and tags are also trigram-indexed, so misspelled query words match them.
+    """
+
+    FIELD_WEIGHTS = {
+        "name": 3.0,
+        "name_ar": 3.0,
+        "brand": 2.0,
+        "tags": 2.0,
+        "description": 1.0,
+        "description_ar": 1.0,
+    }
+    FUZZY_FIELDS = ("name", "name_ar", "brand", "tags")
+    FUZZY_WEIGHT = 0.7  # Query weight of a fuzzy match, times its similarity
+    MIN_FUZZY_LENGTH = 4  # Shorter words have too few trigrams to compare
+    K1 = 1.2
+    B = 0.75
+    MAX_PREFIX_EXPANSIONS = 20
+
+    def __init__(self):
+        self.ready = False
+        self._pending: Optional[List[Tuple[str, object]]] = None  # Writes seen during a rebuild
+        self._reset()
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []  # Sorted, for prefix expansion
+        self._trigrams = TrigramIndex()
+        self._fuzzy_counts: Dict[str, int] = {}  # Products using a term in a fuzzy field
+        self._doc_fuzzy_terms: Dict[str, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, product):
+        """Index or re-index a product; inactive products are removed"""
+        if self._pending is not None:
+            self._pending.append(("add", product))
+
+        product_id = str(product.id)
+        self._unindex(product_id)
+
+        if product.status != ProductStatus.ACTIVE:
+            return
+
+        terms: Counter = Counter()
+        fuzzy_terms = set()
+        for field, weight in self.FIELD_WEIGHTS.items():
+            value = getattr(product, field, None)
+            if isinstance(value, list):
+                value = " ".join(value)
+            for token in tokenize(value):
+                terms[token] += weight
+                if field in self.FUZZY_FIELDS and len(token) >= self.MIN_FUZZY_LENGTH:
+                    fuzzy_terms.add(token)
+
+        if not terms:
+            return
+
+        for term in fuzzy_terms:
+            count = self._fuzzy_counts.get(term, 0)
+            if not count:
+                self._trigrams.add(term)
+            self._fuzzy_counts[term] = count + 1
+        self._doc_fuzzy_terms[product_id] = tuple(fuzzy_terms)
+
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            postings[product_id] = frequency
+
+        length = sum(terms.values())
+        self._doc_terms[product_id] = dict(terms)
+        self._doc_lengths[product_id] = length
+        self._total_length += length
+
+    def remove(self, product_id: str):
+        """Drop a product from the index"""
+        if self._pending is not None:
+            self._pending.append(("remove", product_id))
+
+        self._unindex(str(product_id))
+
+    def _unindex(self, product_id: str):
+        terms = self._doc_terms.pop(product_id, None)
+        if terms is None:
+            return
+
+        for term in terms:
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+
+        self._total_length -= self._doc_lengths.pop(product_id)
+
+        for term in self._doc_fuzzy_terms.pop(product_id):
+            count = self._fuzzy_counts.pop(term) - 1
+            if count:
+                self._fuzzy_counts[term] = count
+            else:
+                self._trigrams.remove(term)
+
+    def search(self, query: str, limit: int = 1000) -> List[Tuple[str, float]]:
+        """
+        Rank products for a free-text query
+        The last query word also matches as a prefix, so partially typed
+        words ("rob") still find products ("robe"), and every word matches
+        similarly spelled name, brand and tag terms ("caftane", "kaftan")
+        with a lower weight
+        Returns (product_id, score) pairs, best first
+        """
+        tokens = tokenize(query)
+        if not tokens or not self._doc_lengths:
+            return []
+
+        query_terms: Dict[str, float] = Counter(tokens[:-1])
+        for term in self._expand_prefix(tokens[-1]):
+            query_terms[term] += 1
+
+        for token in set(tokens):
+            for term, similarity in self._expand_fuzzy(token):
+                if term not in query_terms:
+                    query_terms[term] = self.FUZZY_WEIGHT * similarity
+
+        document_count = len(self._doc_lengths)
+        average_length = self._total_length / document_count
+        scores: Dict[str, float] = {}
+
+        for term, query_frequency in query_terms.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for product_id, frequency in postings.items():
+                norm = self.K1 * (1 - self.B + self.B * self._doc_lengths[product_id] / average_length)
+                score = idf * frequency * (self.K1 + 1) / (frequency + norm)
+                scores[product_id] = scores.get(product_id, 0.0) + score * query_frequency
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with prefix (exact term first)"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        expansions = []
+        for term in self._vocabulary[start:start + self.MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions or [prefix]
+
+    def _expand_fuzzy(self, word: str) -> List[Tuple[str, float]]:
+        """Name, brand and tag terms spelled like word, with their similarity"""
+        if len(word) < self.MIN_FUZZY_LENGTH or settings.SEARCH_FUZZY_MIN_SIMILARITY >= 1:
+            return []
+        return self._trigrams.similar(
+            word,
+            settings.SEARCH_FUZZY_MIN_SIMILARITY,
+            settings.SEARCH_FUZZY_MAX_EXPANSIONS
+        )
+
+    async def rebuild(self):
+        """
+        Rebuild the index from a snapshot of the active products
+        The new index is built aside and swapped in, so searches keep
+        using the previous one while the rebuild runs
+        """
+        fresh = ProductSearchIndex()
+        self._pending = []
+        try:
+            async for document in Product.find(
+                Product.status == ProductStatus.ACTIVE
+            ).project(SearchDocument):
+                fresh.add(document)
+
+            # Replay writes made while the snapshot was being read
+            for action, item in self._pending:
+                if action == "add":
+                    fresh.add(item)
+                else:
+                    fresh.remove(item)
+        finally:
+            self._pending = None
+
+        self._postings = fresh._postings
+        self._doc_terms = fresh._doc_terms
+        self._doc_lengths = fresh._doc_lengths
+        self._total_length = fresh._total_length
+        self._vocabulary = fresh._vocabulary
+        self._trigrams = fresh._trigrams
+        self._fuzzy_counts = fresh._fuzzy_counts
+        self._doc_fuzzy_terms = fresh._doc_fuzzy_terms
+        self.ready = True
+        logger.info("Product search index rebuilt with %d products", len(self))
+
+# Process-wide index used by ProductService
+product_search_index = ProductSearchIndex()
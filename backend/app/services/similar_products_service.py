@@ -0,0 +1,392 @@
+import asyncio
+import logging
+import math
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pydantic import BaseModel, Field
+from pymongo import UpdateOne
+from scipy import sparse
+
+from app.core.config import settings
+from app.models.product import Product, ProductStatus
+from app.models.product_neighbors import ProductNeighbors
+from app.utils.slug import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+# Weight of each kind of feature before IDF weighting
+FEATURE_WEIGHTS = {
+    "tag": 1.0,
+    "category": 1.5,
+    "subcategory": 1.0,
+    "brand": 1.0,
+    "price": 0.75,
+}
+
+# Width of a price band, as a ratio between its bounds. Each product gets a
+# band on two grids offset by half a band, so products with close prices
+# always share a band even across a band boundary
+PRICE_BAND_RATIO = 1.6
+
+# Neighbor scores are multiplied by 1 + RATING_BOOST * rating / 5, so that
+# equally similar products rank by quality
+RATING_BOOST = 0.1
+
+class SimilarityDocument(BaseModel):
+    """Projection of the product fields similarity is computed from"""
+    id: PydanticObjectId = Field(alias="_id")
+    category: str
+    subcategory: Optional[str] = None
+    brand: Optional[str] = None
+    tags: List[str] = []
+    base_price: float
+    sale_price: Optional[float] = None
+    rating: float = 0.0
+    status: ProductStatus = ProductStatus.ACTIVE
+
+def product_features(product: SimilarityDocument) -> Dict[str, float]:
+    """Weighted feature tokens of a product (tags, category, brand, price bands)"""
+    features: Dict[str, float] = {}
+
+    for tag in product.tags:
+        key = normalize_search_text(tag)
+        if key:
+            features[f"tag:{key}"] = FEATURE_WEIGHTS["tag"]
+
+    features[f"category:{product.category}"] = FEATURE_WEIGHTS["category"]
+    if product.subcategory:
+        features[f"subcategory:{product.category}/{product.subcategory}"] = FEATURE_WEIGHTS["subcategory"]
+    if product.brand:
+        features[f"brand:{normalize_search_text(product.brand)}"] = FEATURE_WEIGHTS["brand"]
+
+    price = product.sale_price or product.base_price
+    if price > 0:
+        position = math.log(price) / math.log(PRICE_BAND_RATIO)
+        features[f"price:{math.floor(position)}"] = FEATURE_WEIGHTS["price"]
+        features[f"price~:{math.floor(position + 0.5)}"] = FEATURE_WEIGHTS["price"]
+
+    return features
+
+# Vector of an inactive or featureless product
+EMPTY_VECTOR = (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+
+def _signature(product: SimilarityDocument) -> tuple:
+    """Values that affect a product's vector, to skip writes that change none of them"""
+    return (
+        product.category, product.subcategory, product.brand, tuple(product.tags),
+        product.sale_price or product.base_price, product.rating, product.status
+    )
+
+class SimilarProductsIndex:
+    """
+    Top-K similar products by cosine similarity of TF-IDF feature vectors
+
+    Vectors are the rows of a sparse matrix (products x features, a few
+    features per product). Neighbors are computed in row blocks, one sparse
+    block x products product at a time, with blocks sized so that their
+    dense scores stay under BLOCK_ELEMENTS, and kept in K-wide arrays. That
+    lets an update recompute only the rows a changed product can enter or
+    leave.
+    """
+
+    BLOCK_ELEMENTS = 1 << 23  # Scores held at once, 32 MB of float32
+
+    def __init__(self, k: int, max_features: int):
+        self.k = k
+        self.max_features = max_features
+        self.ready = False
+        # Products deleted since the last update, recorded from the event loop
+        # while fit and update run in a worker thread
+        self._removed: set = set()
+        self._removed_lock = threading.Lock()
+        self._vocabulary: Dict[str, int] = {}
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._reset(0)
+
+    def _reset(self, size: int):
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._signatures: List[Optional[tuple]] = []
+        self._vectors: List[Tuple[np.ndarray, np.ndarray]] = []  # (feature columns, weights) per row
+        self._csr: Optional[sparse.csr_matrix] = None  # Built from _vectors when needed
+        self._boost = np.ones(size, dtype=np.float32)
+        self._active = np.zeros(size, dtype=bool)
+        self._neighbors = np.full((size, self.k), -1, dtype=np.int32)
+        self._scores = np.zeros((size, self.k), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return int(self._active.sum())
+
+    def fit(self, documents: Sequence[SimilarityDocument]):
+        """Build the vocabulary, the vectors and every neighbor list"""
+        documents = [document for document in documents if document.status == ProductStatus.ACTIVE]
+        features = [product_features(document) for document in documents]
+
+        # Features of a single product cannot relate two products
+        frequencies = Counter(token for product in features for token in product)
+        shared = sorted(
+            (token for token, count in frequencies.items() if count > 1),
+            key=lambda token: (-frequencies[token], token)
+        )[:self.max_features]
+        self._vocabulary = {token: column for column, token in enumerate(shared)}
+        self._idf = np.array(
+            [math.log(len(documents) / frequencies[token]) + 1 for token in shared],
+            dtype=np.float32
+        )
+
+        # Deletions recorded meanwhile are kept: the next update drops those
+        # products if they were read as active
+        self._reset(len(documents))
+        for row, document in enumerate(documents):
+            self._ids.append(str(document.id))
+            self._rows[str(document.id)] = row
+            self._signatures.append(None)
+            self._vectors.append(EMPTY_VECTOR)
+            self._set_row(row, document, features[row])
+
+        self._compute(np.arange(len(documents)))
+        self.ready = True
+
+    def update(self, documents: Sequence[SimilarityDocument]) -> Tuple[List[str], List[str]]:
+        """
+        Apply product changes and recompute the neighbor lists they affect
+        Features unknown to the vocabulary are ignored until the next fit
+        Returns (products whose neighbor list was recomputed, products removed)
+        """
+        new = [
+            document for document in documents
+            if str(document.id) not in self._rows and document.status == ProductStatus.ACTIVE
+        ]
+        self._grow(new)
+
+        changed = []
+        for document in documents:
+            row = self._rows.get(str(document.id))
+            if row is None or self._signatures[row] == _signature(document):
+                continue
+            self._set_row(row, document, product_features(document))
+            changed.append(row)
+
+        with self._removed_lock:
+            removed_ids, self._removed = self._removed, set()
+        for product_id in removed_ids:
+            row = self._rows.get(product_id)
+            if row is not None and self._active[row]:
+                self._deactivate(row)
+                changed.append(row)
+
+        if not changed:
+            return [], []
+
+        changed = np.unique(np.array(changed, dtype=np.int64))
+        removed = [self._ids[row] for row in changed if not self._active[row]]
+
+        # A list changes if it holds a changed product, or if a changed
+        # product now scores above its K-th neighbor
+        matrix = self._matrix()
+        affected = np.isin(self._neighbors, changed).any(axis=1)
+        chunk = max(1, self.BLOCK_ELEMENTS // len(self._ids))
+        for start in range(0, len(changed), chunk):
+            columns = changed[start:start + chunk]
+            # Sparse: most products share no feature with a changed one
+            scores = (matrix @ matrix[columns].T).tocoo()
+            scores.data *= self._boost[columns[scores.col]]
+            above = scores.data > self._scores[scores.row, -1]
+            affected[scores.row[above]] = True
+        affected[changed] = True
+        affected &= self._active
+
+        rows = np.flatnonzero(affected)
+        self._compute(rows)
+        return [self._ids[row] for row in rows], removed
+
+    def discard(self, product_id: str):
+        """Remove a deleted product at the next update"""
+        with self._removed_lock:
+            self._removed.add(str(product_id))
+
+    def neighbors(self, product_id: str) -> List[Tuple[str, float]]:
+        """(product_id, score) pairs most similar first"""
+        row = self._rows.get(str(product_id))
+        if row is None:
+            return []
+        return [
+            (self._ids[neighbor], float(score))
+            for neighbor, score in zip(self._neighbors[row], self._scores[row])
+            if neighbor >= 0
+        ]
+
+    def _vector(self, features: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        columns, weights = [], []
+        for token, weight in features.items():
+            column = self._vocabulary.get(token)
+            if column is not None:
+                columns.append(column)
+                weights.append(weight * self._idf[column])
+        weights = np.array(weights, dtype=np.float32)
+        norm = np.linalg.norm(weights)
+        return np.array(columns, dtype=np.int32), weights / norm if norm > 0 else weights
+
+    def _matrix(self) -> sparse.csr_matrix:
+        """Products x features matrix of the current vectors"""
+        if self._csr is None:
+            lengths = np.fromiter((len(columns) for columns, _ in self._vectors), dtype=np.int64, count=len(self._vectors))
+            self._csr = sparse.csr_matrix(
+                (
+                    np.concatenate([EMPTY_VECTOR[1]] + [weights for _, weights in self._vectors]),
+                    np.concatenate([EMPTY_VECTOR[0]] + [columns for columns, _ in self._vectors]),
+                    np.concatenate([[0], np.cumsum(lengths)])
+                ),
+                shape=(len(self._vectors), len(self._vocabulary))
+            )
+        return self._csr
+
+    def _set_row(self, row: int, document: SimilarityDocument, features: Dict[str, float]):
+        if document.status != ProductStatus.ACTIVE:
+            self._deactivate(row)
+        else:
+            self._vectors[row] = self._vector(features)
+            self._csr = None
+            self._boost[row] = 1 + RATING_BOOST * document.rating / 5
+            self._active[row] = True
+        self._signatures[row] = _signature(document)
+
+    def _deactivate(self, row: int):
+        self._vectors[row] = EMPTY_VECTOR
+        self._csr = None
+        self._active[row] = False
+        self._neighbors[row] = -1
+        self._scores[row] = 0
+
+    def _grow(self, documents: Sequence[SimilarityDocument]):
+        """Append empty rows for products not indexed yet"""
+        if not documents:
+            return
+        count = len(documents)
+        for document in documents:
+            self._rows[str(document.id)] = len(self._ids)
+            self._ids.append(str(document.id))
+            self._signatures.append(None)
+            self._vectors.append(EMPTY_VECTOR)
+        self._csr = None
+        self._boost = np.concatenate([self._boost, np.ones(count, dtype=np.float32)])
+        self._active = np.concatenate([self._active, np.zeros(count, dtype=bool)])
+        self._neighbors = np.vstack([self._neighbors, np.full((count, self.k), -1, dtype=np.int32)])
+        self._scores = np.vstack([self._scores, np.zeros((count, self.k), dtype=np.float32)])
+
+    def _compute(self, rows: np.ndarray):
+        """Recompute the top-K neighbors of rows"""
+        width = min(self.k, len(self._ids))
+        if width == 0:
+            return
+
+        matrix = self._matrix()
+        transposed = matrix.T.tocsr()
+        block_size = max(1, self.BLOCK_ELEMENTS // len(self._ids))
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            # Inactive products have empty vectors, so they score 0
+            scores = (matrix[block] @ transposed).toarray() * self._boost
+            scores[np.arange(len(block)), block] = 0  # A product is not its own neighbor
+
+            top = np.argpartition(-scores, width - 1, axis=1)[:, :width]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            # Products sharing no feature are not neighbors
+            top[top_scores <= 0] = -1
+            top_scores[top_scores <= 0] = 0
+
+            self._neighbors[block] = -1
+            self._scores[block] = 0
+            self._neighbors[block, :width] = top
+            self._scores[block, :width] = top_scores
+
+# Process-wide index used by SimilarProductsService
+similar_products_index = SimilarProductsIndex(
+    k=settings.SIMILAR_PRODUCTS_K,
+    max_features=settings.SIMILAR_PRODUCTS_MAX_FEATURES
+)
+
+class SimilarProductsService:
+    """
+    Precomputed similar products, stored in the product_neighbors collection
+
+    A full rebuild fits the similarity index on all active products and
+    rewrites every neighbor list. The incremental refresh reads the products
+    updated since the previous run and only rewrites the lists they change.
+    """
+
+    _lock = asyncio.Lock()
+    _watermark: Optional[datetime] = None
+
+    @staticmethod
+    async def rebuild():
+        """Recompute the neighbors of every active product"""
+        async with SimilarProductsService._lock:
+            started = datetime.utcnow()
+            documents = await Product.find(
+                Product.status == ProductStatus.ACTIVE
+            ).project(SimilarityDocument).to_list()
+
+            # CPU-bound, kept off the event loop
+            await asyncio.to_thread(similar_products_index.fit, documents)
+            await SimilarProductsService._store([str(document.id) for document in documents])
+
+            # Lists not rewritten belong to products that are no longer active
+            await ProductNeighbors.find(ProductNeighbors.updated_at < started).delete()
+
+            SimilarProductsService._watermark = started
+            logger.info("Similar products computed for %d products", len(similar_products_index))
+
+    @staticmethod
+    async def refresh():
+        """Update the neighbor lists affected by products changed since the last run"""
+        if not similar_products_index.ready:
+            await SimilarProductsService.rebuild()
+            return
+
+        async with SimilarProductsService._lock:
+            started = datetime.utcnow()
+            documents = await Product.find(
+                Product.updated_at >= SimilarProductsService._watermark
+            ).project(SimilarityDocument).to_list()
+
+            updated, removed = await asyncio.to_thread(similar_products_index.update, documents)
+            await SimilarProductsService._store(updated)
+            if removed:
+                await ProductNeighbors.find(
+                    In(ProductNeighbors.id, [PydanticObjectId(product_id) for product_id in removed])
+                ).delete()
+
+            SimilarProductsService._watermark = started
+            if updated or removed:
+                logger.info("Similar products refreshed: %d lists updated, %d removed", len(updated), len(removed))
+
+    @staticmethod
+    async def _store(product_ids: List[str], batch_size: int = 1000):
+        now = datetime.utcnow()
+        collection = ProductNeighbors.get_motor_collection()
+
+        for start in range(0, len(product_ids), batch_size):
+            operations = []
+            for product_id in product_ids[start:start + batch_size]:
+                neighbors = similar_products_index.neighbors(product_id)
+                operations.append(UpdateOne(
+                    {"_id": PydanticObjectId(product_id)},
+                    {"$set": {
+                        "neighbor_ids": [PydanticObjectId(neighbor_id) for neighbor_id, _ in neighbors],
+                        "scores": [round(score, 4) for _, score in neighbors],
+                        "updated_at": now,
+                    }},
+                    upsert=True
+                ))
+            await collection.bulk_write(operations, ordered=False)
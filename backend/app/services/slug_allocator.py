@@ -0,0 +1,129 @@
+import re
+from typing import Dict, List, Type
+
+from beanie import Document
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.models.product import Product
+from app.models.boutique import Boutique
+from app.utils.slug import generate_slug
+
+SUFFIX = re.compile(r"-(\d+)$")
+DUPLICATE_KEY = 11000
+
+class SlugAllocator:
+    """
+    Unique slug allocation for a document model with a unique slug index
+
+    The taken variants of a base slug ("robe-kabyle", "robe-kabyle-1", ...)
+    are read with one anchored prefix query, which is an index range scan on
+    the slug index, and the next free suffix is used. Two concurrent creates
+    can still pick the same slug, so the unique index is the arbiter: the
+    losing insert allocates again and retries.
+    """
+
+    def __init__(self, document_model: Type[Document], field: str = "slug", max_attempts: int = 5):
+        self.document_model = document_model
+        self.field = field
+        self.max_attempts = max_attempts
+
+    async def next_slug(self, text: str) -> str:
+        """Slug for text that no document currently uses"""
+        return (await self.allocate([text]))[0]
+
+    async def allocate(self, texts: List[str]) -> List[str]:
+        """
+        Distinct free slugs for a batch of texts, in order
+        Texts sharing a base slug get consecutive suffixes, and all bases are
+        looked up with a single query
+        """
+        if not texts:
+            return []
+        base_slugs = [generate_slug(text) for text in texts]
+        distinct = list(dict.fromkeys(base_slugs))
+
+        # One anchored pattern per base, each one an index range scan.
+        # Only the slug is read, so the query is covered by the index
+        cursor = self.document_model.get_motor_collection().find(
+            {"$or": [{self.field: {"$regex": f"^{re.escape(base_slug)}(-[0-9]+)?$"}} for base_slug in distinct]},
+            {self.field: 1, "_id": 0}
+        )
+        taken = {document[self.field] async for document in cursor}
+
+        # Continue after the highest suffix in use, so gaps are not refilled
+        next_suffix = {base_slug: 0 for base_slug in distinct}
+        for slug in taken:
+            if slug in next_suffix:
+                next_suffix[slug] = max(next_suffix[slug], 1)
+            match = SUFFIX.search(slug)
+            if match and slug[:match.start()] in next_suffix:
+                base_slug = slug[:match.start()]
+                next_suffix[base_slug] = max(next_suffix[base_slug], int(match.group(1)) + 1)
+
+        slugs = []
+        for base_slug in base_slugs:
+            suffix = next_suffix[base_slug]
+            # A base can itself look suffixed ("robe-2"), skip slugs another base holds
+            while (f"{base_slug}-{suffix}" if suffix else base_slug) in taken:
+                suffix += 1
+            slug = f"{base_slug}-{suffix}" if suffix else base_slug
+            taken.add(slug)
+            slugs.append(slug)
+            next_suffix[base_slug] = suffix + 1
+        return slugs
+
+    async def insert(self, document: Document, text: str) -> Document:
+        """Insert document under a unique slug derived from text"""
+        setattr(document, self.field, await self.next_slug(text))
+
+        for attempt in range(self.max_attempts):
+            try:
+                return await document.insert()
+            except DuplicateKeyError as e:
+                key_pattern = (e.details or {}).get("keyPattern") or {}
+                if self.field not in key_pattern or attempt == self.max_attempts - 1:
+                    raise
+                # Taken by a concurrent insert since the lookup
+                setattr(document, self.field, await self.next_slug(text))
+
+    async def insert_many(self, documents: List[Document], texts: List[str]) -> Dict[int, str]:
+        """
+        Insert documents under unique slugs derived from texts
+        Returns the error of each document that could not be inserted, by
+        position. Documents need their id set beforehand, insert_many does
+        not assign it.
+        """
+        slugs = await self.allocate(texts)
+        for document, slug in zip(documents, slugs):
+            setattr(document, self.field, slug)
+
+        errors: Dict[int, str] = {}
+        pending = list(range(len(documents)))
+
+        for attempt in range(self.max_attempts):
+            try:
+                await self.document_model.insert_many([documents[i] for i in pending], ordered=False)
+                return errors
+            except BulkWriteError as e:
+                conflicts = []
+                for error in e.details.get("writeErrors", []):
+                    position = pending[error["index"]]
+                    key_pattern = error.get("keyPattern") or {}
+                    if error.get("code") == DUPLICATE_KEY and self.field in key_pattern and attempt < self.max_attempts - 1:
+                        conflicts.append(position)
+                    else:
+                        errors[position] = error.get("errmsg", "Insert failed")
+
+            if not conflicts:
+                return errors
+
+            # Taken by concurrent inserts since the lookup: allocate again
+            slugs = await self.allocate([texts[i] for i in conflicts])
+            for position, slug in zip(conflicts, slugs):
+                setattr(documents[position], self.field, slug)
+            pending = conflicts
+
+        return errors
+
+product_slugs = SlugAllocator(Product)
+boutique_slugs = SlugAllocator(Boutique)
@@ -0,0 +1,419 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.models.product import Product, ProductStatus
+from app.services.search_service import STOPWORDS
+from app.utils.slug import normalize_search_text
+
+logger = logging.getLogger(__name__)
+
+# Kind boost applied to log(1 + weight): broad suggestions (a category, a
+# brand) rank above single product names with a similar weight
+KIND_BOOSTS = {
+    "category": 3.0,
+    "subcategory": 2.5,
+    "brand": 2.5,
+    "query": 2.0,
+    "product": 1.0,
+}
+
+class SuggestDocument(BaseModel):
+    """Projection of the product fields that feed the suggestion index"""
+    id: PydanticObjectId = Field(alias="_id")
+    name: str
+    name_ar: Optional[str] = None
+    slug: str = ""
+    brand: Optional[str] = None
+    category: str = ""
+    subcategory: Optional[str] = None
+    views: int = 0
+    sales_count: int = 0
+    status: ProductStatus = ProductStatus.ACTIVE
+
+# Brands and categories repeat across products
+normalize_facet = lru_cache(maxsize=4096)(normalize_search_text)
+
+TermKey = Tuple[str, str]  # (kind, normalized text)
+
+class _Term:
+    """A suggestion: its display text, weight and the products behind it"""
+    __slots__ = ("text", "weight", "score", "members", "best")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.weight = 0.0
+        self.score = 0.0
+        self.members: Dict[str, float] = {}  # product_id -> weight contributed
+        self.best: Optional[str] = None  # Most popular product, for product names
+
+def popularity(product) -> float:
+    """Weight of a product name suggestion (same view/sale weights as the trending score)"""
+    return (
+        1.0
+        + settings.TRENDING_VIEW_WEIGHT * max(product.views, 0)
+        + settings.TRENDING_SALE_WEIGHT * max(product.sales_count, 0)
+    )
+
+class SuggestionIndex:
+    """
+    In-memory search-as-you-type index of product names, brands, categories
+    and popular search queries
+
+    Every suggestion is stored under each of its word starts ("robe kabyle"
+    and "kabyle") in one sorted array of keys, so a prefix lookup is two
+    bisections. Short prefixes match thousands of keys: their best
+    suggestions are precomputed and kept until a suggestion under them
+    changes. Product writes update the index in place.
+    """
+
+    MAX_SCAN = 256  # Matching keys ranked directly; larger ranges use the hot prefix cache
+    HOT_DEPTH = 20  # Suggestions kept per hot prefix (the largest limit served)
+    MAX_KEY_WORDS = 6  # Word starts indexed per suggestion
+    MAX_KEY_LENGTH = 64
+    MIN_QUERY_LENGTH = 3
+
+    def __init__(self):
+        self.ready = False
+        self._pending: Optional[List[Tuple[str, object]]] = None  # Writes seen during a rebuild
+        self._query_counts: Dict[str, List] = {}  # normalized query -> [text, count]
+        self._reset()
+
+    def _reset(self):
+        self._terms: Dict[TermKey, _Term] = {}
+        self._keys: List[Tuple[str, str, str]] = []  # Sorted (key, kind, normalized text)
+        self._product_terms: Dict[str, List[TermKey]] = {}
+        self._slugs: Dict[str, str] = {}
+        self._hot: Dict[str, List[TermKey]] = {}
+        self._bulk = False  # Keys appended unsorted, sorted once at the end of a rebuild
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    @classmethod
+    def _term_keys(cls, normalized: str) -> List[str]:
+        """Keys of a suggestion: its text from each word start"""
+        words = normalized.split()
+        keys = []
+        for position in range(min(len(words), cls.MAX_KEY_WORDS)):
+            if position and words[position] in STOPWORDS:
+                continue
+            key = normalized if not position else " ".join(words[position:])
+            key = key[:cls.MAX_KEY_LENGTH]
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def add(self, product):
+        """Index or re-index a product; inactive products are removed"""
+        if self._pending is not None:
+            self._pending.append(("add", product))
+
+        product_id = str(product.id)
+        if product.status != ProductStatus.ACTIVE:
+            self._unindex(product_id)
+            return
+
+        weight = popularity(product)
+        entries = [("product", product.name, normalize_search_text(product.name), weight)]
+        if product.name_ar:
+            entries.append(("product", product.name_ar, normalize_search_text(product.name_ar), weight))
+        for kind in ("brand", "category", "subcategory"):
+            value = getattr(product, kind, None)
+            if value:
+                entries.append((kind, value, normalize_facet(value), 1.0))
+
+        contributions: Dict[TermKey, Tuple[str, float]] = {}
+        for kind, text, normalized, contribution in entries:
+            if normalized:
+                contributions.setdefault((kind, normalized), (text, contribution))
+
+        # Only touch the suggestions this write changes, a re-saved product
+        # usually keeps its brand and category
+        for term_key in self._product_terms.get(product_id, ()):
+            if term_key not in contributions:
+                self._remove_member(term_key, product_id)
+        for term_key, (text, contribution) in contributions.items():
+            term = self._terms.get(term_key)
+            if term is None or term.members.get(product_id) != contribution:
+                self._add_member(term_key, text, product_id, contribution)
+
+        self._product_terms[product_id] = list(contributions)
+        self._slugs[product_id] = product.slug
+
+    def remove(self, product_id: str):
+        """Drop a product from the index"""
+        if self._pending is not None:
+            self._pending.append(("remove", product_id))
+
+        self._unindex(str(product_id))
+
+    def _unindex(self, product_id: str):
+        term_keys = self._product_terms.pop(product_id, None)
+        if term_keys is None:
+            return
+
+        del self._slugs[product_id]
+        for term_key in term_keys:
+            self._remove_member(term_key, product_id)
+
+    def _add_member(self, term_key: TermKey, text: str, product_id: str, contribution: float):
+        term = self._terms.get(term_key)
+        if term is None:
+            term = self._create_term(term_key, text)
+
+        previous = term.members.get(product_id, 0.0)
+        term.members[product_id] = contribution
+        if term_key[0] == "product":
+            # Product name suggestions link to their most popular product
+            if term.best == product_id and contribution < previous:
+                term.best = max(term.members, key=term.members.get)
+            elif term.best is None or contribution > term.members[term.best]:
+                term.best = product_id
+            if term.best == product_id:
+                term.text = text
+        self._set_weight(term_key, term, term.weight - previous + contribution)
+
+    def _remove_member(self, term_key: TermKey, product_id: str):
+        term = self._terms[term_key]
+        contribution = term.members.pop(product_id)
+        if not term.members:
+            self._drop_term(term_key)
+            return
+
+        if term.best == product_id:
+            term.best = max(term.members, key=term.members.get)
+        self._set_weight(term_key, term, term.weight - contribution)
+
+    def _create_term(self, term_key: TermKey, text: str) -> _Term:
+        term = self._terms[term_key] = _Term(text)
+        kind, normalized = term_key
+        for key in self._term_keys(normalized):
+            if self._bulk:
+                self._keys.append((key, kind, normalized))
+            else:
+                bisect.insort(self._keys, (key, kind, normalized))
+        return term
+
+    def _drop_term(self, term_key: TermKey):
+        del self._terms[term_key]
+        kind, normalized = term_key
+        for key in self._term_keys(normalized):
+            entry = (key, kind, normalized)
+            del self._keys[bisect.bisect_left(self._keys, entry)]
+            self._invalidate(key)
+
+    def _set_weight(self, term_key: TermKey, term: _Term, weight: float):
+        term.weight = weight
+        term.score = KIND_BOOSTS[term_key[0]] * math.log1p(max(weight, 0.0))
+        if not self._bulk:
+            for key in self._term_keys(term_key[1]):
+                self._invalidate(key)
+
+    def _invalidate(self, key: str):
+        """Forget the cached suggestions of every prefix of key"""
+        if self._hot:
+            for length in range(1, len(key) + 1):
+                self._hot.pop(key[:length], None)
+
+    def record_query(self, query: str):
+        """
+        Count a search query that returned results
+        Queries become suggestions once searched SUGGEST_MIN_QUERY_COUNT times
+        """
+        normalized = normalize_search_text(query)
+        if len(normalized) < self.MIN_QUERY_LENGTH or len(normalized) > self.MAX_KEY_LENGTH:
+            return
+
+        entry = self._query_counts.get(normalized)
+        if entry is None:
+            if len(self._query_counts) >= settings.SUGGEST_MAX_TRACKED_QUERIES:
+                self._prune_queries()
+            entry = self._query_counts[normalized] = [query.strip(), 0]
+        entry[1] += 1
+
+        if entry[1] >= settings.SUGGEST_MIN_QUERY_COUNT:
+            self._set_query(normalized, entry[0], entry[1])
+
+    def _set_query(self, normalized: str, text: str, count: int):
+        term_key = ("query", normalized)
+        term = self._terms.get(term_key)
+        if term is None:
+            term = self._create_term(term_key, text)
+        self._set_weight(term_key, term, float(count))
+
+    def _prune_queries(self):
+        """Forget the least searched half of the tracked queries"""
+        ranked = sorted(self._query_counts.items(), key=lambda item: item[1][1], reverse=True)
+        keep = len(ranked) // 2
+        for normalized, _ in ranked[keep:]:
+            del self._query_counts[normalized]
+            if ("query", normalized) in self._terms:
+                self._drop_term(("query", normalized))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        Best suggestions starting with prefix (at any word start)
+        Returns dicts with text, kind, and product_id/slug for product names
+        """
+        normalized = normalize_search_text(prefix)
+        if not normalized:
+            return []
+
+        start = bisect.bisect_left(self._keys, (normalized,))
+        end = bisect.bisect_left(self._keys, (normalized + "\uffff",), start)
+
+        if end - start <= self.MAX_SCAN:
+            ranked = self._rank(start, end, limit)
+        else:
+            ranked = self._top(normalized, start, end)[:limit]
+
+        suggestions = []
+        for term_key in ranked:
+            term = self._terms[term_key]
+            suggestion = {"text": term.text, "kind": term_key[0], "product_id": None, "slug": None}
+            if term_key[0] == "product":
+                suggestion["product_id"] = term.best
+                suggestion["slug"] = self._slugs[term.best]
+            suggestions.append(suggestion)
+        return suggestions
+
+    def _score_key(self, term_key: TermKey) -> Tuple[float, TermKey]:
+        return self._terms[term_key].score, term_key
+
+    def _rank(self, start: int, end: int, limit: int) -> List[TermKey]:
+        """Best suggestions among the keys in [start, end)"""
+        term_keys = {(kind, normalized) for _, kind, normalized in self._keys[start:end]}
+        return heapq.nlargest(limit, term_keys, key=self._score_key)
+
+    def _top(self, prefix: str, start: int, end: int) -> List[TermKey]:
+        """
+        HOT_DEPTH best suggestions of a prefix whose keys are [start, end)
+        Prefixes matching more than MAX_SCAN keys are cached; they are ranked
+        from the best suggestions of their one character longer prefixes
+        """
+        ranked = self._hot.get(prefix)
+        if ranked is not None:
+            return ranked
+        if end - start <= self.MAX_SCAN:
+            return self._rank(start, end, self.HOT_DEPTH)
+
+        keys = self._keys
+        depth = len(prefix) + 1
+        candidates = set()
+        position = start
+        # Keys equal to the prefix sort first
+        while position < end and len(keys[position][0]) < depth:
+            candidates.add(keys[position][1:])
+            position += 1
+        while position < end:
+            child = keys[position][0][:depth]
+            child_end = bisect.bisect_left(keys, (child + "\uffff",), position, end)
+            candidates.update(self._top(child, position, child_end))
+            position = child_end
+
+        ranked = self._hot[prefix] = heapq.nlargest(self.HOT_DEPTH, candidates, key=self._score_key)
+        return ranked
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the index (containers, keys and suggestions)"""
+        size = sys.getsizeof
+        total = size(self._keys) + size(self._terms) + size(self._product_terms) + size(self._slugs)
+        total += size(self._hot) + size(self._query_counts)
+        for entry in self._keys:
+            total += size(entry) + size(entry[0])  # kind and text are shared with the term keys
+        for term_key, term in self._terms.items():
+            total += size(term_key) + size(term_key[1]) + size(term) + size(term.text) + size(term.members)
+        for product_id, term_keys in self._product_terms.items():
+            total += size(product_id) + size(term_keys) + size(self._slugs[product_id])
+        for normalized, entry in self._query_counts.items():
+            total += size(normalized) + size(entry) + size(entry[0])
+        for prefix, ranked in self._hot.items():
+            total += size(prefix) + size(ranked)
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "suggestions": len(self._terms),
+            "keys": len(self._keys),
+            "products": len(self._product_terms),
+            "tracked_queries": len(self._query_counts),
+            "hot_prefixes": len(self._hot),
+            "memory_bytes": self.memory_usage(),
+        }
+
+    def _build(self, products: Iterable, queries: Iterable[Tuple[str, str, int]] = ()) -> int:
+        """
+        Index a batch of products and popular (normalized, text, count)
+        queries with a single sort of the keys, returns the memory footprint
+        """
+        self._bulk = True
+        try:
+            for product in products:
+                self.add(product)
+            for normalized, text, count in queries:
+                if count >= settings.SUGGEST_MIN_QUERY_COUNT:
+                    self._set_query(normalized, text, count)
+        finally:
+            self._bulk = False
+        self._keys.sort()
+
+        # Rank every hot prefix now rather than on its first lookup
+        self._hot = {}
+        if len(self._keys) > self.MAX_SCAN:
+            self._top("", 0, len(self._keys))
+            del self._hot[""]
+        return self.memory_usage()
+
+    async def rebuild(self):
+        """
+        Rebuild the index from a snapshot of the active products
+        The new index is built aside in a worker thread and swapped in, so
+        lookups keep using the previous one while the rebuild runs
+        """
+        fresh = SuggestionIndex()
+        self._pending = []
+        try:
+            documents = await Product.find(
+                Product.status == ProductStatus.ACTIVE
+            ).project(SuggestDocument).to_list()
+            queries = [(normalized, text, count) for normalized, (text, count) in self._query_counts.items()]
+            memory_bytes = await asyncio.to_thread(fresh._build, documents, queries)
+
+            # Replay writes made while the snapshot was being read and indexed
+            for action, item in self._pending:
+                if action == "add":
+                    fresh.add(item)
+                else:
+                    fresh.remove(item)
+        finally:
+            self._pending = None
+
+        self._terms = fresh._terms
+        self._keys = fresh._keys
+        self._product_terms = fresh._product_terms
+        self._slugs = fresh._slugs
+        self._hot = fresh._hot
+        self.ready = True
+
+        # Queries that became popular during the rebuild
+        for normalized, (text, count) in list(self._query_counts.items()):
+            if count >= settings.SUGGEST_MIN_QUERY_COUNT and ("query", normalized) not in self._terms:
+                self._set_query(normalized, text, count)
+
+        logger.info(
+            "Suggestion index rebuilt: %d suggestions, %d keys, %.1f MB",
+            len(self._terms), len(self._keys), memory_bytes / 1e6
+        )
+
+# Process-wide index used by ProductService
+product_suggestions = SuggestionIndex()
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_activity import ProductActivity
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_KINDS = ("views", "sales", "wishlists")
+EPOCH = datetime(1970, 1, 1)
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the activity bucket containing moment (naive UTC)"""
+    seconds = int((moment - EPOCH).total_seconds())
+    return EPOCH + timedelta(seconds=seconds - seconds % settings.TRENDING_BUCKET_SECONDS)
+
+def activity_weights() -> np.ndarray:
+    """Weight of one view, sale and wishlist add, in ACTIVITY_KINDS order"""
+    return np.array([
+        settings.TRENDING_VIEW_WEIGHT,
+        settings.TRENDING_SALE_WEIGHT,
+        settings.TRENDING_WISHLIST_WEIGHT,
+    ])
+
+def decayed_scores(
+    codes: np.ndarray,
+    ages_hours: np.ndarray,
+    counts: np.ndarray,
+    weights: np.ndarray,
+    half_life_hours: float,
+    product_count: int
+) -> np.ndarray:
+    """
+    Trending score per product code: weighted activity of each bucket, halved
+    every half-life of its age, summed per product
+    codes, ages_hours: one entry per bucket; counts: (buckets, kinds)
+    NumPy reference of decayed_score_expression, which recompute runs
+    """
+    contributions = (counts @ weights) * np.exp2(-ages_hours / half_life_hours)
+    scores = np.bincount(codes, weights=contributions, minlength=product_count)
+    # Cancelled sales are recorded as negative counts
+    return np.maximum(scores, 0.0)
+
+def decayed_score_expression(now: datetime) -> dict:
+    """
+    $group accumulator computing decayed_scores server-side: the weighted
+    activity of each bucket, halved every half-life of the age of the
+    bucket's middle at now
+    """
+    weighted = {"$add": [
+        {"$multiply": [{"$ifNull": [f"${kind}", 0]}, float(weight)]}
+        for kind, weight in zip(ACTIVITY_KINDS, activity_weights())
+    ]}
+    ages_hours = {"$max": [
+        {"$subtract": [
+            {"$divide": [{"$subtract": [now, "$bucket"]}, 3600000.0]},
+            settings.TRENDING_BUCKET_SECONDS / 7200.0
+        ]},
+        0.0
+    ]}
+    decay = {"$pow": [0.5, {"$divide": [ages_hours, float(settings.TRENDING_HALF_LIFE_HOURS)]}]}
+    return {"$sum": {"$multiply": [weighted, decay]}}
+
+async def load_columns(cursor, fields: Tuple[str, ...], batch_size: int) -> List[np.ndarray]:
+    """Read a cursor in batches of rows, returns one array per field"""
+    batches: List[list] = []
+    while True:
+        rows = await cursor.to_list(batch_size)
+        if not rows:
+            break
+        batches.append(rows)
+    return [np.array([row[field] for rows in batches for row in rows]) for field in fields]
+
+class ProductActivityBuffer:
+    """
+    Write-behind counter of product activity per time bucket
+
+    Events are accumulated in memory per (product, bucket) and flushed with
+    one bulk_write of $inc upserts, like ViewCounterBuffer.
+    """
+
+    def __init__(self):
+        self._counts: Dict[Tuple[str, datetime], Dict[str, int]] = {}
+
+    def record(self, product_id: str, kind: str, count: int = 1):
+        """Record activity of a product (kind is one of ACTIVITY_KINDS)"""
+        counts = self._counts.setdefault((product_id, bucket_start(datetime.utcnow())), {})
+        counts[kind] = counts.get(kind, 0) + count
+
+    async def flush(self) -> int:
+        """Write buffered activity to the database, returns the number of buckets updated"""
+        if not self._counts:
+            return 0
+
+        # Swap the buffer first so activity recorded during the write is kept for the next flush
+        counts, self._counts = self._counts, {}
+        operations = [
+            UpdateOne({"product_id": product_id, "bucket": bucket}, {"$inc": increments}, upsert=True)
+            for (product_id, bucket), increments in counts.items()
+        ]
+
+        try:
+            await ProductActivity.get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Some updates were applied, retrying all of them would count activity twice
+            logger.warning("%d activity updates failed: %s", len(e.details.get("writeErrors", [])), e)
+            return len(operations) - len(e.details.get("writeErrors", []))
+        except Exception:
+            # Put the counts back so they are retried on the next flush
+            for (product_id, bucket), increments in counts.items():
+                merged = self._counts.setdefault((product_id, bucket), {})
+                for kind, count in increments.items():
+                    merged[kind] = merged.get(kind, 0) + count
+            raise
+
+        return len(operations)
+
+# Activity recorded by this process, flushed periodically and on shutdown
+product_activity = ProductActivityBuffer()
+
+class TrendingService:
+    """
+    Time-decayed trending score
+
+    The activity buckets within the horizon are scored and summed per
+    product by one aggregation, so only a score per product leaves the
+    database; scores and stored values are compared as NumPy arrays. Scores
+    are written back to Product.trending_score, only for products whose
+    score moved by more than TRENDING_SCORE_TOLERANCE, so a run does not
+    rewrite every product while all scores decay.
+    """
+
+    _lock = asyncio.Lock()
+
+    @staticmethod
+    async def recompute(batch_size: int = 1000) -> int:
+        """Score every product with recent activity, returns the number of products updated"""
+        async with TrendingService._lock:
+            await product_activity.flush()
+
+            now = datetime.utcnow()
+            since = bucket_start(now - timedelta(hours=settings.TRENDING_HORIZON_HOURS))
+
+            # Buckets are decayed and summed per product in the database
+            pipeline = [
+                {"$match": {"bucket": {"$gte": since}}},
+                {"$group": {"_id": "$product_id", "score": decayed_score_expression(now)}},
+            ]
+            active_ids, active_scores = await load_columns(
+                ProductActivity.get_motor_collection().aggregate(pipeline, batchSize=batch_size * 10),
+                ("_id", "score"),
+                batch_size * 10
+            )
+
+            # Products saved before trending_score existed: a missing field sorts
+            # as null in MongoDB but as 0.0 in cursors and the catalog snapshot.
+            # Served by the trending_score index, so cheap once backfilled
+            await Product.get_motor_collection().update_many(
+                {"trending_score": {"$exists": False}},
+                {"$set": {"trending_score": 0.0}}
+            )
+
+            # Stored scores, including products whose activity left the horizon
+            stored_ids, stored_scores = await load_columns(
+                Product.get_motor_collection().aggregate([
+                    {"$match": {"trending_score": {"$gt": 0}}},
+                    {"$project": {"_id": {"$toString": "$_id"}, "trending_score": 1}},
+                ], batchSize=batch_size * 10),
+                ("_id", "trending_score"),
+                batch_size * 10
+            )
+
+            # Product codes index the score arrays
+            product_ids, codes = np.unique(
+                np.concatenate([active_ids.astype(str), stored_ids.astype(str)]),
+                return_inverse=True
+            )
+            active_codes, stored_codes = codes[:len(active_ids)], codes[len(active_ids):]
+            # Cancelled sales are recorded as negative counts
+            scores = np.zeros(len(product_ids))
+            scores[active_codes] = np.round(np.maximum(active_scores.astype(np.float64), 0.0), 4)
+            current = np.zeros(len(product_ids))
+            current[stored_codes] = stored_scores.astype(np.float64)
+
+            changed = np.abs(scores - current) > settings.TRENDING_SCORE_TOLERANCE * np.maximum(scores, current)
+            changed |= (scores == 0) != (current == 0)
+            changed_codes = np.flatnonzero(changed)
+
+            collection = Product.get_motor_collection()
+            for start in range(0, len(changed_codes), batch_size):
+                operations = [
+                    UpdateOne(
+                        {"_id": PydanticObjectId(product_ids[code])},
+                        {"$set": {"trending_score": float(scores[code])}}
+                    )
+                    for code in changed_codes[start:start + batch_size]
+                ]
+                await collection.bulk_write(operations, ordered=False)
+
+            logger.info("Trending scores: %d products scored, %d updated", len(product_ids), len(changed_codes))
+            return len(changed_codes)
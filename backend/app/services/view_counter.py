@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, List, Type
+
+from beanie import Document, PydanticObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.models.product import Product
+
+logger = logging.getLogger(__name__)
+
+class ViewCounterBuffer:
+    """
+    Write-behind counter for document views
+
+    Views are accumulated in memory per document id and flushed with a
+    single bulk_write of $inc updates, instead of saving the whole document
+    on every view. $inc also keeps concurrent increments from overwriting
+    each other.
+    """
+
+    def __init__(self, document_model: Type[Document], field: str = "views"):
+        self.document_model = document_model
+        self.field = field
+        self._counts: Dict[str, int] = {}
+
+    def add(self, document_id: str, count: int = 1):
+        """Record views of a document"""
+        self._counts[document_id] = self._counts.get(document_id, 0) + count
+
+    def pending(self, document_id: str) -> int:
+        """Views recorded for a document and not flushed yet"""
+        return self._counts.get(document_id, 0)
+
+    async def flush(self) -> int:
+        """Write buffered views to the database, returns the number of documents updated"""
+        if not self._counts:
+            return 0
+
+        # Swap the buffer first so views recorded during the write are kept for the next flush
+        counts, self._counts = self._counts, {}
+        operations = [
+            UpdateOne({"_id": PydanticObjectId(document_id)}, {"$inc": {self.field: count}})
+            for document_id, count in counts.items()
+        ]
+
+        try:
+            await self.document_model.get_motor_collection().bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # Some updates were applied, retrying all of them would count views twice
+            logger.warning("%d view updates failed: %s", len(e.details.get("writeErrors", [])), e)
+            return len(operations) - len(e.details.get("writeErrors", []))
+        except Exception:
+            # Put the counts back so they are retried on the next flush
+            for document_id, count in counts.items():
+                self.add(document_id, count)
+            raise
+
+        return len(operations)
+
+# View buffers flushed periodically and on shutdown
+product_views = ViewCounterBuffer(Product)
+
+VIEW_COUNTERS: List[ViewCounterBuffer] = [product_views]
+
+async def flush_view_counters():
+    """Flush every view buffer"""
+    for buffer in VIEW_COUNTERS:
+        try:
+            await buffer.flush()
+        except Exception:
+            logger.exception("Failed to flush %s views", buffer.document_model.__name__)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Returned by cache lookups on a miss, so falsy values such as 0 can be cached
+MISSING = object()
+
+class TTLCache:
+    """
+    Small in-process cache with per-entry expiry
+    Entries are evicted oldest-first once max_entries is reached
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, "asyncio.Future"] = {}
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or MISSING if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return MISSING
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value for ttl seconds (defaults to the cache ttl)"""
+        if key in self._entries:
+            del self._entries[key]
+        elif len(self._entries) >= self.max_entries:
+            self._entries.popitem(last=False)
+
+        self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached value, loading and storing it on a miss
+        Concurrent misses on the same key share a single loader call, so a
+        cold entry is only computed once
+        """
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, loader, ttl))
+            self._loading[key] = future
+
+        # A cancelled caller must not cancel the load the other callers wait for
+        return await asyncio.shield(future)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        try:
+            value = await loader()
+            self.set(key, value, ttl)
+            return value
+        finally:
+            del self._loading[key]
+
+    def delete(self, key: Hashable):
+        """Remove a single entry"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class GenerationCounter:
+    """
+    Version number of cached data, bumped by writes
+    Cache keys that embed the current generation stop matching as soon as
+    it is bumped, so stale entries are never served and simply expire
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self) -> int:
+        """Start a new generation, returns it"""
+        self.value += 1
+        return self.value
+
+class KeyedGenerationCounter:
+    """
+    GenerationCounter per key (a category, a boutique...)
+    Lets a write invalidate only the cached data that depends on its keys
+    """
+
+    def __init__(self):
+        self._values: Dict[Hashable, int] = {}
+
+    def get(self, key: Hashable) -> int:
+        return self._values.get(key, 0)
+
+    def bump(self, key: Hashable) -> int:
+        """Start a new generation for key, returns it"""
+        value = self._values[key] = self._values.get(key, 0) + 1
+        return value
+
+class ByteSizeLRUCache(TTLCache):
+    """
+    TTLCache of rendered bodies bounded by their total size
+    Least recently used entries are evicted first; hits, misses and
+    evictions are counted for monitoring
+    """
+
+    def __init__(self, ttl: float, max_bytes: int):
+        super().__init__(ttl, max_entries=0)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self.delete(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: bytes, ttl: Optional[float] = None):
+        self.delete(key)
+        if len(value) > self.max_bytes:
+            return
+
+        while self.size + len(value) > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+        self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self.size += len(value)
+
+    def delete(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,71 @@
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bson import json_util
+from bson.errors import BSONError
+from pymongo import ASCENDING
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+def encode_cursor(sort_key: str, values: Sequence[Any]) -> str:
+    """
+    Encode the sort values of the last returned document into an opaque cursor
+    The sort key is embedded so a cursor cannot be replayed with another sort
+    """
+    payload = json_util.dumps({"s": sort_key, "v": list(values)})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort_key: str, types: Optional[Sequence[type]] = None) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor for the given sort key
+    When types is given, the cursor must hold one value of each type, in order
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, OverflowError, BSONError):
+        # Crafted Extended JSON ({"$oid": "zz"}, {"$date": {}}, ...) fails in json_util with any of these
+        raise InvalidCursorError("Invalid pagination cursor")
+
+    if not isinstance(payload, dict) or payload.get("s") != sort_key or not isinstance(payload.get("v"), list):
+        raise InvalidCursorError("Pagination cursor does not match the requested sort")
+
+    values = payload["v"]
+    # Documents or arrays would be read as query operators once placed in the keyset filter
+    if any(isinstance(value, (dict, list)) for value in values):
+        raise InvalidCursorError("Invalid pagination cursor")
+    if types is not None and (
+        len(values) != len(types)
+        or not all(isinstance(value, expected) for value, expected in zip(values, types))
+    ):
+        raise InvalidCursorError("Pagination cursor does not match the requested sort")
+
+    return values
+
+def keyset_filter(sort_criteria: Sequence[Tuple[str, int]], values: Sequence[Any]) -> Dict[str, Any]:
+    """
+    Build the keyset condition selecting documents strictly after `values`
+    in the order described by `sort_criteria`:
+        (k1 > v1) OR (k1 == v1 AND k2 > v2) OR ...
+    with > replaced by < for descending keys
+    """
+    if len(values) != len(sort_criteria):
+        raise InvalidCursorError("Pagination cursor does not match the requested sort")
+
+    clauses = []
+    for i, (field, direction) in enumerate(sort_criteria):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort_criteria[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+
+    return {"$or": clauses}
+
+def document_sort_values(document: Any, sort_criteria: Sequence[Tuple[str, int]]) -> List[Any]:
+    """Extract the values of the sort fields from a Beanie document"""
+    return [
+        document.id if field == "_id" else getattr(document, field)
+        for field, _ in sort_criteria
+    ]
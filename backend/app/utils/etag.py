@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+# Generation counters are per process: listing ETags embed the process so a
+# tag issued by one worker never validates against another worker's state
+INSTANCE_ID = uuid.uuid4().hex[:12]
+
+def version_tag(moment: datetime) -> str:
+    """Compact, exact representation of a modification time"""
+    return moment.strftime("%Y%m%d%H%M%S%f")
+
+def strong_etag(*parts: object) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def weak_etag(*parts: object) -> str:
+    return "W/" + strong_etag(*parts)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check, with the weak comparison RFC 9110 prescribes for it"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    """Validator headers: caches may store the response but must revalidate it"""
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def check_not_modified(if_none_match: Optional[str], etag: str):
+    """Raise a bodyless 304 when the client already holds this version"""
+    if etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -0,0 +1,35 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+def _model_fields(value: Any) -> Any:
+    """orjson fallback: serialize pydantic models through their field values"""
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dump_json(content: Any) -> bytes:
+    """JSON body of content, as rendered by FastJSONResponse"""
+    return orjson.dumps(
+        content,
+        default=_model_fields,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson response that also accepts pydantic models
+
+    Models are dumped straight from their field values, so responses built
+    with model_construct are neither validated nor serialized by pydantic.
+    Routes must return the response itself: FastAPI re-validates any other
+    return value against the route's response_model.
+    Bytes are taken as an already rendered body (e.g. from a cache).
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dump_json(content)
@@ -0,0 +1,101 @@
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+# (line number, parsed row or None, error message or None)
+StreamRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_length: int) -> AsyncIterator[Tuple[int, Optional[str]]]:
+    """
+    Split a byte stream into numbered text lines as it arrives
+    A line longer than max_line_length is yielded as None and skipped, so a
+    malformed upload cannot grow the buffer without bound
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    line_number = 0
+    oversized = False
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_number += 1
+            yield line_number, None if oversized else line.rstrip("\r")
+            oversized = False
+
+        if len(buffer) > max_line_length:
+            oversized = True
+            buffer = ""
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer or oversized:
+        yield line_number + 1, None if oversized else buffer.rstrip("\r")
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes], max_line_length: int) -> AsyncIterator[StreamRow]:
+    """One JSON object per line, blank lines are ignored"""
+    async for line_number, line in iter_lines(chunks, max_line_length):
+        if line is None:
+            yield line_number, None, f"Row longer than {max_line_length} characters"
+            continue
+        if not line.strip():
+            continue
+
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes], max_line_length: int) -> AsyncIterator[StreamRow]:
+    """
+    CSV with a header row, one dict of non-empty cells per record
+    Quoted cells may span lines, a record is numbered by its first line
+    """
+    header = None
+    record = []
+    first_line = 0
+
+    async for line_number, line in iter_lines(chunks, max_line_length):
+        if line is None:
+            yield line_number, None, f"Row longer than {max_line_length} characters"
+            record = []
+            continue
+        if not record:
+            if not line.strip():
+                continue
+            first_line = line_number
+        record.append(line)
+
+        # An odd number of quotes means a quoted cell continues on the next line
+        text = "\n".join(record)
+        if text.count('"') % 2:
+            if len(text) > max_line_length:
+                yield first_line, None, f"Row longer than {max_line_length} characters"
+                record = []
+            continue
+        record = []
+
+        try:
+            cells = next(csv.reader([text]))
+        except csv.Error as e:
+            yield first_line, None, f"Invalid CSV: {e}"
+            continue
+
+        if header is None:
+            header = [name.strip() for name in cells]
+            continue
+        if len(cells) > len(header):
+            yield first_line, None, f"Expected {len(header)} columns, got {len(cells)}"
+            continue
+
+        yield first_line, {name: value for name, value in zip(header, cells) if value.strip()}, None
+
+    if record:
+        yield first_line, None, "Unterminated quoted cell"
@@ -1,6 +1,8 @@
 import re
 import unicodedata
-from typing import str
+from typing import List
+
+ARABIC_DIACRITICS = re.compile(r'[\u064B-\u065F\u0670\u0640]')
 
 def generate_slug(text: str) -> str:
     """
@@ -11,8 +13,7 @@ def generate_slug(text: str) -> str:
     text = unicodedata.normalize('NFKD', text)
     
     # Remove Arabic diacritics and normalize
-    arabic_diacritics = re.compile(r'[\u064B-\u065F\u0670\u0640]')
-    text = arabic_diacritics.sub('', text)
+    text = ARABIC_DIACRITICS.sub('', text)
     
     # Convert to lowercase
     text = text.lower()
@@ -35,7 +36,7 @@ def slugify_arabic(text: str) -> str:
     Specialized slugify for Arabic text
     """
     # Remove diacritics
-    text = re.sub(r'[\u064B-\u065F\u0670\u0640]', '', text)
+    text = ARABIC_DIACRITICS.sub('', text)
     
     # Replace spaces with hyphens
     text = re.sub(r'\s+', '-', text)
@@ -79,3 +80,34 @@ def transliterate_arabic_to_latin(text: str) -> str:
     result = result.strip('-')
     
     return result.lower()
+
+def normalize_search_text(text: str) -> str:
+    """
+    Fold text for search matching
+    Strips French accents and Arabic diacritics, lowercases and
+    transliterates Arabic words so both scripts share one vocabulary
+    """
+    return ' '.join(search_words(text))
+
+def search_words(text: str) -> List[str]:
+    """
+    Split text into normalized words
+    Same folding as normalize_search_text, one entry per word
+    """
+    if not text.isascii():
+        # Decompose accented letters and drop the combining marks (é -> e)
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        text = ARABIC_DIACRITICS.sub('', text)
+    text = text.lower()
+
+    words = []
+    for word in re.findall(r'[\w\u0600-\u06FF]+', text):
+        # Latin words come out of transliteration unchanged, skip its per-character loop
+        if not word.isascii():
+            word = transliterate_arabic_to_latin(word)
+        word = word.replace('_', '')
+        if word:
+            words.append(word)
+
+    return words
@@ -0,0 +1,76 @@
+"""
+Backfill the variant filter arrays of existing products
+
+Products are kept in sync on every write, but documents saved before
+color_names, size_names and in_stock_sizes existed (or modified outside
+the application) need them derived once from colors and variants.
+Only documents whose arrays differ are updated, so the script is safe
+to run again.
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/backfill_variant_filters.py --batch-size 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import List
+
+from beanie import init_beanie, PydanticObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import BaseModel, Field
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product, Color, ProductVariant, variant_filter_values
+
+class VariantSource(BaseModel):
+    """Projection of the fields the filter arrays are derived from"""
+    id: PydanticObjectId = Field(alias="_id")
+    colors: List[Color] = []
+    variants: List[ProductVariant] = []
+    color_names: List[str] = []
+    size_names: List[str] = []
+    in_stock_sizes: List[str] = []
+
+async def flush(operations: List[UpdateOne]) -> int:
+    if not operations:
+        return 0
+    result = await Product.get_motor_collection().bulk_write(operations, ordered=False)
+    return result.modified_count
+
+async def run(batch_size: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await init_beanie(database=client[settings.DATABASE_NAME], document_models=[Product])
+
+    scanned = 0
+    updated = 0
+    operations: List[UpdateOne] = []
+
+    try:
+        async for product in Product.find_all().project(VariantSource):
+            scanned += 1
+            values = variant_filter_values(product.colors, product.variants)
+            current = {field: getattr(product, field) for field in values}
+            if values == current:
+                continue
+
+            operations.append(UpdateOne({"_id": product.id}, {"$set": values}))
+            if len(operations) >= batch_size:
+                updated += await flush(operations)
+                operations = []
+
+        updated += await flush(operations)
+    finally:
+        client.close()
+
+    print(f"{scanned} products scanned, {updated} updated")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.batch_size))
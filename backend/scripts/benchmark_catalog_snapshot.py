@@ -0,0 +1,174 @@
+"""
+Benchmark: columnar catalog snapshot listings
+
+Publishes a catalog snapshot file of generated product cards, maps it and
+times listing pages (filters, every sort order, first and deeper pages)
+against a full lexsort of the matching rows, checking both return the same
+products. Also times incremental updates, then maps the file from several
+worker processes and reports their resident and proportional (shared pages
+split between processes) memory. No database is needed.
+
+Usage (from backend/):
+    python scripts/benchmark_catalog_snapshot.py --products 200000 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.product import ProductCard, ProductCondition, ProductStatus
+from app.schemas.product import ProductFilters, ProductSort
+from app.services.catalog_snapshot import CatalogSnapshot, MappedTable, publish_snapshot_file, sort_keys
+from app.services.product_service import ProductService
+
+CATEGORIES = ["robes", "caftans", "chaussures", "sacs", "bijoux", "accessoires", "hommes", "enfants"]
+SUBCATEGORIES = [None, "mariage", "soiree", "ete", "sport", "traditionnel"]
+
+def generate(count: int, rng: random.Random):
+    brands = [None] + [f"Marque {index}" for index in range(count // 200 + 1)]
+    boutiques = [str(ObjectId()) for _ in range(count // 100 + 1)]
+    started = datetime(2024, 1, 1)
+    for index in range(count):
+        yield ProductCard.model_construct(
+            id=ObjectId(),
+            name=f"Produit {index}",
+            slug=f"produit-{index}",
+            description="",
+            boutique_id=rng.choice(boutiques),
+            boutique_name="Boutique",
+            category=rng.choice(CATEGORIES),
+            subcategory=rng.choice(SUBCATEGORIES),
+            brand=rng.choice(brands),
+            base_price=rng.randint(5, 500) * 100.0,
+            main_image="image.jpg",
+            condition=rng.choice(list(ProductCondition)),
+            status=ProductStatus.ACTIVE,
+            is_featured=rng.random() < 0.05,
+            is_trending=rng.random() < 0.05,
+            total_stock=rng.choice((0, 1, 2, 5, 10, 20)),
+            views=int(rng.paretovariate(1.2)) - 1,
+            rating=rng.choice((0.0, 0.0, 3.5, 4.0, 4.5, 5.0)),
+            rating_count=int(rng.paretovariate(2)) - 1,
+            sales_count=int(rng.paretovariate(2.5)) - 1,
+            trending_score=round(rng.expovariate(0.1), 1) if rng.random() < 0.3 else 0.0,
+            created_at=started + timedelta(seconds=rng.randrange(365 * 86400)),
+        )
+
+def full_sort(table: MappedTable, filters: ProductFilters, sort_criteria, skip: int, limit: int):
+    """Reference: sort every matching row"""
+    rows = np.flatnonzero(table.mask(filters))
+    keys = sort_keys(sort_criteria)
+    ordered = rows[np.lexsort([table.key_values(key, rows) for key in reversed(keys)])]
+    return [table.card(row) for row in ordered[skip:skip + limit]]
+
+def process_memory() -> dict:
+    """Resident and proportional set sizes of this process, in MB"""
+    with open("/proc/self/smaps_rollup") as file:
+        values = dict(line.split(":", 1) for line in file if line.startswith(("Rss", "Pss:")))
+    return {name: int(value.split()[0]) / 1024 for name, value in values.items()}
+
+def worker(directory: str, results):
+    baseline = process_memory()
+    snapshot = CatalogSnapshot()
+    snapshot.sync(Path(directory))
+    # Touch every column of the mapping
+    for sort in ProductSort:
+        snapshot.query(ProductFilters(in_stock_only=False), ProductService._sort_criteria(sort), 0, 20)
+    memory = process_memory()
+    results.put({name: memory[name] - baseline[name] for name in memory})
+
+def run(product_count: int, worker_count: int, seed: int):
+    rng = random.Random(seed)
+    cards = list(generate(product_count, rng))
+    directory = Path(tempfile.mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None))
+
+    started = time.perf_counter()
+    path = publish_snapshot_file(directory, cards, time.time())
+    publish_seconds = time.perf_counter() - started
+    snapshot = CatalogSnapshot()
+    snapshot.enabled = True
+    snapshot.sync(directory)
+    print(
+        f"{product_count} products: published in {publish_seconds:.2f} s, "
+        f"{path.stat().st_size / 1e6:.1f} MB file"
+    )
+
+    filter_sets = {
+        "all": ProductFilters(in_stock_only=False),
+        "in stock": ProductFilters(),
+        "category": ProductFilters(category="robes"),
+        "category+price": ProductFilters(category="robes", min_price=2000, max_price=15000),
+        "brand": ProductFilters(brand="Marque 1"),
+    }
+    for label, filters in filter_sets.items():
+        timings, reference_timings, mismatches = [], [], 0
+        for sort in ProductSort:
+            sort_criteria = ProductService._sort_criteria(sort)
+            for page in (1, 2, 10):
+                skip = (page - 1) * 20
+                query_started = time.perf_counter()
+                products, _ = snapshot.query(filters, sort_criteria, skip, 20)
+                timings.append(time.perf_counter() - query_started)
+
+                reference_started = time.perf_counter()
+                expected = full_sort(snapshot._base, filters, sort_criteria, skip, 20)
+                reference_timings.append(time.perf_counter() - reference_started)
+                mismatches += [card.id for card in products] != [card.id for card in expected]
+        print(
+            f"{label}: median {statistics.median(timings) * 1000:.2f} ms, max {max(timings) * 1000:.2f} ms "
+            f"(full sort median {statistics.median(reference_timings) * 1000:.2f} ms), {mismatches} mismatches"
+        )
+
+    updates = []
+    for _ in range(10000):
+        card = cards[rng.randrange(product_count)].model_copy()
+        card.views += 1
+        card.total_stock = max(card.total_stock - 1, 0)
+        updates.append(card)
+    update_started = time.perf_counter()
+    for card in updates:
+        snapshot.upsert(card)
+    print(f"upsert: {(time.perf_counter() - update_started) / len(updates) * 1e6:.1f} us per product")
+    query_started = time.perf_counter()
+    snapshot.query(ProductFilters(), ProductService._sort_criteria(ProductSort.POPULARITY), 0, 20)
+    print(f"listing with {len(snapshot._local)} local writes: {(time.perf_counter() - query_started) * 1000:.2f} ms")
+
+    if worker_count:
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(str(directory), results)) for _ in range(worker_count)]
+        for process in processes:
+            process.start()
+        memory = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        # Resident counts shared pages in full, proportional splits them between the processes
+        print(
+            f"{worker_count} workers mapping the file, per worker: "
+            f"{statistics.mean(item['Rss'] for item in memory):.1f} MB resident, "
+            f"{statistics.mean(item['Pss'] for item in memory):.1f} MB proportional"
+        )
+
+    for item in directory.iterdir():
+        item.unlink()
+    directory.rmdir()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    run(args.products, args.workers, args.seed)
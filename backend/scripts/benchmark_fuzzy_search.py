@@ -0,0 +1,83 @@
+"""
+Benchmark: typo-tolerant trigram lookups
+
+Builds the trigram index of the search index from a generated vocabulary
+(syllable words standing for the distinct name, brand and tag terms of a
+catalog of several hundred thousand products) and times
+similar-term lookups for misspelled words. No database is needed.
+
+Usage (from backend/):
+    python scripts/benchmark_fuzzy_search.py --terms 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.search_service import TrigramIndex
+
+ONSETS = ["b", "c", "ch", "d", "dj", "f", "g", "j", "k", "l", "m", "n", "p", "q", "r", "s", "t", "v", "z", "br", "tr", "bl"]
+VOWELS = ["a", "e", "i", "o", "u", "ou", "ai", "é"]
+CODAS = ["", "", "", "n", "r", "s", "l", "t"]
+
+def word(rng: random.Random) -> str:
+    return "".join(
+        rng.choice(ONSETS) + rng.choice(VOWELS) + rng.choice(CODAS)
+        for _ in range(rng.randint(2, 4))
+    ).replace("é", "e")
+
+def misspell(term: str, rng: random.Random) -> str:
+    position = rng.randrange(len(term))
+    edit = rng.choice(("replace", "drop", "insert", "swap"))
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    if edit == "replace":
+        return term[:position] + letter + term[position + 1:]
+    if edit == "drop":
+        return term[:position] + term[position + 1:]
+    if edit == "insert":
+        return term[:position] + letter + term[position:]
+    return term[:position] + term[position + 1:position + 2] + term[position:position + 1] + term[position + 2:]
+
+def run(term_count: int, lookups: int, seed: int):
+    rng = random.Random(seed)
+    terms = set()
+    while len(terms) < term_count:
+        terms.add(word(rng))
+    terms = sorted(terms)
+
+    index = TrigramIndex()
+    started = time.perf_counter()
+    for term in terms:
+        index.add(term)
+    build_seconds = time.perf_counter() - started
+
+    queries = [misspell(rng.choice(terms), rng) for _ in range(lookups)]
+    timings = []
+    found = 0
+    for query in queries:
+        lookup_started = time.perf_counter()
+        matches = index.similar(query, settings.SEARCH_FUZZY_MIN_SIMILARITY, settings.SEARCH_FUZZY_MAX_EXPANSIONS)
+        timings.append(time.perf_counter() - lookup_started)
+        found += bool(matches)
+    timings.sort()
+
+    print(f"{len(terms)} terms indexed in {build_seconds:.1f} s")
+    print(
+        f"lookup: median {statistics.median(timings) * 1000:.2f} ms, "
+        f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms, "
+        f"{found / len(queries):.0%} of misspellings matched"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    run(args.terms, args.lookups, args.seed)
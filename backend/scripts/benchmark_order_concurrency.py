@@ -0,0 +1,151 @@
+"""
+Benchmark: concurrent orders on scarce stock (flash sale)
+
+Creates a few products with little stock in a scratch database, then places
+many concurrent orders for them with OrderService.create_order and checks
+that no unit was sold beyond the stock: units in saved orders, stock taken
+from the products and sales counts must all agree. The same load is run
+against a check-then-act reference (read, check, save per product, as
+create_order used to do) to show the overselling it allows.
+
+The scratch database is dropped at the end.
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/benchmark_order_concurrency.py --products 5 --stock 20 --orders 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.order import Order
+from app.models.product import Product
+from app.models.product_activity import ProductActivity
+from app.models.user import User
+from app.schemas.order import OrderCreate
+from app.services.order_service import OrderService
+
+SHIPPING_ADDRESS = {
+    "first_name": "Amina",
+    "last_name": "Benali",
+    "phone": "0555123456",
+    "street": "12 rue Didouche Mourad",
+    "city": "Alger",
+    "state": "Alger",
+    "postal_code": "16000",
+}
+
+async def check_then_act(order_data: OrderCreate):
+    """Reference: per-product read, check and save, racing with other orders"""
+    products = []
+    for item in order_data.items:
+        product = await Product.get(item.product_id)
+        if product.total_stock < item.quantity:
+            raise ValueError(f"Product {product.name} is out of stock")
+        products.append(product)
+    for product, item in zip(products, order_data.items):
+        product.total_stock -= item.quantity
+        product.sales_count += item.quantity
+        await product.save()
+
+async def reset_products(product_count: int, stock: int):
+    await Product.delete_all()
+    await Order.delete_all()
+    products = [
+        Product(
+            name=f"Caftan édition limitée {index}",
+            slug=f"caftan-edition-limitee-{index}",
+            description="Vente flash",
+            boutique_id="benchmark",
+            boutique_name="Benchmark",
+            category="caftans",
+            base_price=12000,
+            main_image="caftan.jpg",
+            total_stock=stock,
+        )
+        for index in range(product_count)
+    ]
+    await Product.insert_many(products)
+    return await Product.find_all().to_list()
+
+async def place_orders(label: str, place, products, order_count: int, stock: int, rng: random.Random):
+    orders = []
+    for _ in range(order_count):
+        lines = rng.sample(products, rng.randint(1, min(3, len(products))))
+        orders.append(OrderCreate(
+            items=[{"product_id": str(product.id), "quantity": rng.randint(1, 3)} for product in lines],
+            shipping_address=SHIPPING_ADDRESS,
+            payment_info={"method": "cash_on_delivery"},
+        ))
+
+    async def attempt(order_data: OrderCreate):
+        try:
+            await place(order_data)
+            return order_data
+        except ValueError:
+            return None
+
+    started = time.perf_counter()
+    accepted = [order for order in await asyncio.gather(*(attempt(order) for order in orders)) if order]
+    elapsed = time.perf_counter() - started
+
+    ordered = {str(product.id): 0 for product in products}
+    for order_data in accepted:
+        for item in order_data.items:
+            ordered[item.product_id] += item.quantity
+
+    oversold = 0
+    inconsistent = 0
+    for product in await Product.find_all().to_list():
+        units = ordered[str(product.id)]
+        oversold += max(0, units - stock)
+        inconsistent += product.total_stock != stock - units or product.sales_count != units or product.total_stock < 0
+
+    print(
+        f"{label}: {len(accepted)}/{order_count} orders accepted in {elapsed:.2f} s, "
+        f"{sum(ordered.values())} units sold for {stock * len(products)} in stock, "
+        f"{oversold} oversold, {inconsistent} products with inconsistent stock"
+    )
+
+async def run(product_count: int, stock: int, order_count: int, database: str, seed: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL, maxPoolSize=200)
+    await init_beanie(database=client[database], document_models=[User, Product, Order, ProductActivity])
+
+    try:
+        await User.find(User.email == "benchmark@example.com").delete()
+        customer = User(email="benchmark@example.com", password_hash="-", first_name="Bench", last_name="Mark")
+        await customer.insert()
+
+        products = await reset_products(product_count, stock)
+        await place_orders(
+            "create_order", lambda order_data: OrderService.create_order(order_data, str(customer.id)),
+            products, order_count, stock, random.Random(seed)
+        )
+
+        products = await reset_products(product_count, stock)
+        await place_orders(
+            "check-then-act", check_then_act,
+            products, order_count, stock, random.Random(seed)
+        )
+    finally:
+        await client.drop_database(database)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_order_benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.products, args.stock, args.orders, args.database, args.seed))
@@ -0,0 +1,140 @@
+"""
+Benchmark: full Product documents vs ProductCard projection on listing pages
+
+Seeds a throwaway database (<DATABASE_NAME>_bench) with products carrying
+many variants and colors, then compares both read models on the same
+listing query:
+- query + decode time per page
+- decode-only time per page (pydantic validation of the raw documents)
+- BSON bytes transferred per page
+- memory held by a decoded page
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/benchmark_product_cards.py --products 2000 --variants 60
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import bson
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product, ProductCard, PRODUCT_CARD_PROJECTION
+
+def make_product(index: int, variant_count: int) -> Product:
+    """Product with variant_count variants spread over colors and sizes"""
+    sizes = ["XS", "S", "M", "L", "XL", "XXL"]
+    color_count = max(1, variant_count // len(sizes))
+    colors = [
+        {
+            "name": f"Couleur {c}",
+            "color_code": f"#{c:06x}",
+            "images": [f"products/{index}/color-{c}-{i}.jpg" for i in range(3)],
+            "sizes": [{"size": size, "stock": 3, "price_adjustment": 0.0} for size in sizes],
+        }
+        for c in range(color_count)
+    ]
+    variants = [
+        {
+            "sku": f"SKU-{index}-{v}",
+            "color": f"Couleur {v % color_count}",
+            "size": sizes[v % len(sizes)],
+            "stock": 3,
+            "price": 4500.0,
+            "images": [f"products/{index}/variant-{v}.jpg"],
+        }
+        for v in range(variant_count)
+    ]
+    return Product(
+        name=f"Robe kabyle brodée {index}",
+        slug=f"bench-robe-kabyle-{index}",
+        description="Robe kabyle traditionnelle brodée à la main, tissu léger. " * 4,
+        boutique_id="bench",
+        boutique_name="Boutique Bench",
+        category="robes",
+        subcategory="traditionnel",
+        tags=["kabyle", "mariage", "brodé"],
+        brand="Bench",
+        base_price=4500.0,
+        main_image=f"products/{index}/main.jpg",
+        images=[f"products/{index}/{i}.jpg" for i in range(5)],
+        variants=variants,
+        colors=colors,
+        total_stock=variant_count * 3,
+        seo={"meta_title": f"Robe kabyle {index}", "meta_description": "Robe kabyle " * 10, "keywords": ["robe"] * 10},
+        shipping_details={"weight": 0.8, "dimensions": {"width": 30, "height": 5, "depth": 40}},
+        created_at=datetime(2024, 1, 1) + timedelta(minutes=index),
+    )
+
+def measure_memory(decode):
+    """Bytes still allocated after decoding, i.e. held by the decoded page"""
+    tracemalloc.start()
+    page = decode()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del page
+    return current
+
+async def run(product_count: int, variant_count: int, page_size: int, repeats: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[f"{settings.DATABASE_NAME}_bench"]
+    await init_beanie(database=database, document_models=[Product])
+    collection = Product.get_motor_collection()
+
+    try:
+        await collection.delete_many({})
+        batch = [make_product(i, variant_count) for i in range(product_count)]
+        await Product.insert_many(batch)
+
+        query = Product.find(Product.status == "active", Product.total_stock > 0)
+        filter_query = query.get_filter_query()
+        sort = [("created_at", -1)]
+
+        read_models = [
+            ("Product", None, lambda: query.clone().sort(*sort).limit(page_size).to_list(), Product),
+            ("ProductCard", PRODUCT_CARD_PROJECTION, lambda: query.clone().sort(*sort).limit(page_size).project(ProductCard).to_list(), ProductCard),
+        ]
+
+        print(f"{product_count} products, {variant_count} variants each, page size {page_size}, {repeats} repeats")
+        print(f"{'model':<12} {'query+decode ms':>16} {'decode ms':>10} {'bytes/page':>12} {'memory/page':>12}")
+
+        for name, projection, fetch, model in read_models:
+            await fetch()  # Warm up
+
+            started = time.perf_counter()
+            for _ in range(repeats):
+                await fetch()
+            query_ms = (time.perf_counter() - started) * 1000 / repeats
+
+            raw = await collection.find(filter_query, projection).sort(sort).limit(page_size).to_list(None)
+            page_bytes = sum(len(bson.encode(document)) for document in raw)
+
+            started = time.perf_counter()
+            for _ in range(repeats):
+                [model.model_validate(document) for document in raw]
+            decode_ms = (time.perf_counter() - started) * 1000 / repeats
+
+            memory = measure_memory(lambda: [model.model_validate(document) for document in raw])
+
+            print(f"{name:<12} {query_ms:>16.2f} {decode_ms:>10.2f} {page_bytes:>12,} {memory:>12,}")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--variants", type=int, default=60)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.products, args.variants, args.page_size, args.repeats))
@@ -0,0 +1,166 @@
+"""
+Benchmark: per-item cost of serializing product pages
+
+Builds product pages in memory (card projections for listings, full
+documents for detail routes) and compares, per product, the cost of
+turning them into a JSON response body:
+- validated: ProductResponse(...) per item, then FastAPI's response_model
+  validation and JSONResponse (how product routes used to respond)
+- constructed: model_construct responses returned through response_model
+- fast: model_construct responses rendered by FastJSONResponse (orjson),
+  returned directly so FastAPI skips response_model validation
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/benchmark_product_serialization.py --page-size 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from beanie import init_beanie
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product, ProductCard, PRODUCT_CARD_PROJECTION
+from app.schemas.product import ProductResponse, ProductDetailResponse, ProductListResponse
+from app.services.product_serializer import (
+    product_response_data,
+    product_detail_data,
+    to_product_response,
+    to_product_detail_response,
+)
+from app.utils.responses import FastJSONResponse
+
+def make_product(index: int) -> Product:
+    """Product with a few colors and variants, like a typical listing item"""
+    sizes = ["S", "M", "L", "XL"]
+    return Product(
+        name=f"Robe kabyle brodée {index}",
+        slug=f"bench-robe-kabyle-{index}",
+        description="Robe kabyle traditionnelle brodée à la main, tissu léger. " * 4,
+        boutique_id="bench",
+        boutique_name="Boutique Bench",
+        category="robes",
+        subcategory="traditionnel",
+        tags=["kabyle", "mariage", "brodé"],
+        brand="Bench",
+        base_price=4500.0,
+        sale_price=3900.0 if index % 3 == 0 else None,
+        main_image=f"products/{index}/main.jpg",
+        images=[f"products/{index}/{i}.jpg" for i in range(5)],
+        colors=[
+            {
+                "name": f"Couleur {c}",
+                "color_code": f"#{c:06x}",
+                "sizes": [{"size": size, "stock": 3} for size in sizes],
+            }
+            for c in range(3)
+        ],
+        variants=[
+            {"sku": f"SKU-{index}-{v}", "color": f"Couleur {v % 3}", "size": sizes[v % 4], "stock": 3, "price": 4500.0}
+            for v in range(12)
+        ],
+        total_stock=36,
+        created_at=datetime(2024, 1, 1) + timedelta(minutes=index),
+    )
+
+def page_response(products, response_model):
+    return ProductListResponse(
+        products=[response_model(product) for product in products],
+        total=len(products),
+        page=1,
+        size=len(products),
+        total_pages=1,
+        has_next=False,
+        has_prev=False,
+    )
+
+async def validated_list(products, field):
+    page = page_response(products, lambda product: ProductResponse(**product_response_data(product)))
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+async def constructed_list(products, field):
+    page = page_response(products, to_product_response)
+    content = await serialize_response(field=field, response_content=page)
+    return JSONResponse(content).body
+
+async def fast_list(products, field):
+    return FastJSONResponse(page_response(products, to_product_response)).body
+
+async def validated_detail(products, field):
+    for product in products:
+        response = ProductDetailResponse(**product_detail_data(product))
+        JSONResponse(await serialize_response(field=field, response_content=response)).body
+
+async def constructed_detail(products, field):
+    for product in products:
+        response = to_product_detail_response(product)
+        JSONResponse(await serialize_response(field=field, response_content=response)).body
+
+async def fast_detail(products, field):
+    for product in products:
+        FastJSONResponse(to_product_detail_response(product)).body
+
+async def run(page_size: int, repeats: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[f"{settings.DATABASE_NAME}_bench"]
+    await init_beanie(database=database, document_models=[Product])
+
+    try:
+        products = [make_product(i) for i in range(page_size)]
+        # Listing routes serialize card projections, detail routes full documents
+        cards = [
+            ProductCard.model_validate({
+                field: value for field, value in product.model_dump(by_alias=True).items()
+                if field in PRODUCT_CARD_PROJECTION
+            })
+            for product in products
+        ]
+        list_field = create_response_field("response", ProductListResponse)
+        detail_field = create_response_field("response", ProductDetailResponse)
+
+        # The fast path must produce the same document as the validated one
+        assert json.loads(await validated_list(cards, list_field)) == json.loads(await fast_list(cards, list_field))
+
+        cases = [
+            ("list", "validated", validated_list, cards, list_field),
+            ("list", "constructed", constructed_list, cards, list_field),
+            ("list", "fast", fast_list, cards, list_field),
+            ("detail", "validated", validated_detail, products, detail_field),
+            ("detail", "constructed", constructed_detail, products, detail_field),
+            ("detail", "fast", fast_detail, products, detail_field),
+        ]
+
+        print(f"page size {page_size}, {repeats} repeats")
+        print(f"{'route':<8} {'path':<12} {'ms/page':>9} {'us/item':>9}")
+
+        for route, name, serialize, items, field in cases:
+            await serialize(items, field)  # Warm up
+
+            started = time.perf_counter()
+            for _ in range(repeats):
+                await serialize(items, field)
+            page_ms = (time.perf_counter() - started) * 1000 / repeats
+
+            print(f"{route:<8} {name:<12} {page_ms:>9.2f} {page_ms * 1000 / page_size:>9.1f}")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.page_size, args.repeats))
@@ -0,0 +1,106 @@
+"""
+Benchmark: search-as-you-type suggestion index
+
+Builds the in-memory suggestion index from generated products (French and
+Arabic names, brands, categories) and times lookups for prefixes of 1 to 8
+characters, cold (first lookup of a prefix) and warm. Also reports the
+index memory footprint. No database is needed.
+
+Usage (from backend/):
+    python scripts/benchmark_suggest.py --products 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.product import ProductStatus
+from app.services.suggest_service import SuggestionIndex
+
+WORDS = [
+    "robe", "kabyle", "caftan", "karakou", "gandoura", "burnous", "djellaba", "chedda",
+    "brodée", "soirée", "mariage", "été", "velours", "soie", "satin", "lin", "coton",
+    "élégante", "traditionnelle", "moderne", "longue", "courte", "fleurie", "dorée",
+]
+ARABIC_WORDS = ["فستان", "قفطان", "قندورة", "برنوس", "عرس", "سهرة", "تقليدي", "حرير"]
+CATEGORIES = ["robes", "caftans", "chaussures", "sacs", "bijoux", "accessoires", "hommes", "enfants"]
+
+def generate(count: int, rng: random.Random):
+    brands = [f"Maison {rng.choice(WORDS).title()} {index}" for index in range(count // 50 + 1)]
+    for index in range(count):
+        yield SimpleNamespace(
+            id=f"{index:024x}",
+            name=" ".join(rng.sample(WORDS, rng.randint(2, 4))).capitalize() + f" {index % 500}",
+            name_ar=" ".join(rng.sample(ARABIC_WORDS, 2)) if rng.random() < 0.3 else None,
+            slug=f"produit-{index}",
+            brand=rng.choice(brands) if rng.random() < 0.7 else None,
+            category=rng.choice(CATEGORIES),
+            subcategory=rng.choice(WORDS) if rng.random() < 0.5 else None,
+            views=int(rng.paretovariate(1.5)),
+            sales_count=int(rng.paretovariate(3)) - 1,
+            status=ProductStatus.ACTIVE,
+        )
+
+def run(product_count: int, lookups: int, seed: int):
+    rng = random.Random(seed)
+    products = list(generate(product_count, rng))
+    index = SuggestionIndex()
+
+    started = time.perf_counter()
+    index._build(products)
+    build_seconds = time.perf_counter() - started
+
+    prefixes = []
+    for _ in range(lookups):
+        word = rng.choice(WORDS + ARABIC_WORDS + CATEGORIES)
+        prefixes.append(word[:rng.randint(1, min(len(word), 8))])
+
+    for label in ("cold", "warm"):
+        timings = []
+        for prefix in prefixes:
+            lookup_started = time.perf_counter()
+            index.suggest(prefix, 8)
+            timings.append(time.perf_counter() - lookup_started)
+        timings.sort()
+        print(
+            f"{label}: median {statistics.median(timings) * 1e6:.0f} us, "
+            f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us, max {timings[-1] * 1e6:.0f} us"
+        )
+
+    # Re-saved products (new view count) and renamed ones
+    update_timings = {}
+    for label in ("re-save", "rename"):
+        updates = []
+        for _ in range(1000):
+            product = products[rng.randrange(product_count)]
+            if label == "rename":
+                product = next(generate(1, rng))
+                product.id = products[rng.randrange(product_count)].id
+            product.views += 1
+            updates.append(product)
+        update_started = time.perf_counter()
+        for product in updates:
+            index.add(product)
+        update_timings[label] = (time.perf_counter() - update_started) / len(updates)
+
+    stats = index.stats()
+    print(f"{product_count} products: built in {build_seconds:.1f} s")
+    print(", ".join(f"{label}: {seconds * 1e6:.0f} us per product" for label, seconds in update_timings.items()))
+    print(
+        f"{stats['suggestions']} suggestions, {stats['keys']} keys, {stats['hot_prefixes']} hot prefixes, "
+        f"{stats['memory_bytes'] / 1e6:.1f} MB"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    run(args.products, args.lookups, args.seed)
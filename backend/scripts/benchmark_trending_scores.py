@@ -0,0 +1,117 @@
+"""
+Benchmark: trending score recompute
+
+Generates activity buckets (a few active hours per product over the scoring
+horizon) and times:
+- decayed_scores, the NumPy reference of the scoring, on arrays in memory
+- TrendingService.recompute end to end in a scratch database: the scoring
+  aggregation, loading its results, comparing them with the stored scores
+  and writing the changed ones. The first run writes every score, the
+  second one only those that moved since.
+The stored scores are checked against decayed_scores. The scratch database
+is dropped at the end.
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/benchmark_trending_scores.py --products 200000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from beanie import init_beanie
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_activity import ProductActivity
+from app.services.trending_service import ACTIVITY_KINDS, TrendingService, activity_weights, bucket_start, decayed_scores
+
+def generate(product_count: int, buckets_per_product: float, rng: np.random.Generator):
+    """Activity buckets: product codes, bucket ages in whole buckets and counts per kind"""
+    bucket_count = int(product_count * buckets_per_product)
+    horizon = settings.TRENDING_HORIZON_HOURS * 3600 // settings.TRENDING_BUCKET_SECONDS
+
+    # One row per (product, bucket), as the unique index requires
+    keys = np.unique(rng.integers(0, product_count, bucket_count) * horizon + rng.integers(0, horizon, bucket_count))
+    codes, ages = keys // horizon, keys % horizon
+    counts = np.column_stack([
+        rng.poisson(5, len(keys)),  # views
+        rng.poisson(0.1, len(keys)),  # sales
+        rng.poisson(0.3, len(keys)),  # wishlist adds
+    ])
+    assert counts.shape[1] == len(ACTIVITY_KINDS)
+    return codes, ages, counts
+
+def time_numpy(codes, ages_hours, counts, product_count: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scores = decayed_scores(codes, ages_hours, counts, activity_weights(), settings.TRENDING_HALF_LIFE_HOURS, product_count)
+        np.argsort(-scores)
+        timings.append(time.perf_counter() - started)
+    print(f"decayed_scores + rank: best {min(timings) * 1000:.0f} ms, median {np.median(timings) * 1000:.0f} ms")
+
+async def run(product_count: int, buckets_per_product: float, repeat: int, database: str, seed: int):
+    codes, ages, counts = generate(product_count, buckets_per_product, np.random.default_rng(seed))
+    print(f"{product_count} products, {len(codes)} buckets")
+
+    bucket_hours = settings.TRENDING_BUCKET_SECONDS / 3600.0
+    time_numpy(codes, ages * bucket_hours, counts.astype(np.float64), product_count, repeat)
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await init_beanie(database=client[database], document_models=[Product, ProductActivity])
+
+    try:
+        product_ids = [ObjectId() for _ in range(product_count)]
+        await Product.get_motor_collection().insert_many(
+            # Only the fields recompute reads, slugs are unique
+            [{"_id": product_id, "slug": str(product_id), "trending_score": 0.0} for product_id in product_ids]
+        )
+        now = bucket_start(datetime.utcnow())
+        step = timedelta(seconds=settings.TRENDING_BUCKET_SECONDS)
+        await ProductActivity.get_motor_collection().insert_many([
+            {
+                "product_id": str(product_ids[code]),
+                "bucket": now - int(age) * step,
+                **dict(zip(ACTIVITY_KINDS, map(int, row))),
+            }
+            for code, age, row in zip(codes, ages, counts)
+        ])
+
+        for label in ("first run", "second run"):
+            started = time.perf_counter()
+            updated = await TrendingService.recompute()
+            print(f"recompute, {label}: {time.perf_counter() - started:.2f} s, {updated} scores written")
+
+        # Age of the middle of each bucket, as recompute measures it; the
+        # relative tolerance covers the decay between the two runs
+        elapsed_hours = (datetime.utcnow() - now).total_seconds() / 3600.0
+        ages_hours = np.maximum(ages * bucket_hours + elapsed_hours - bucket_hours / 2, 0.0)
+        expected = decayed_scores(codes, ages_hours, counts.astype(np.float64), activity_weights(), settings.TRENDING_HALF_LIFE_HOURS, product_count)
+        stored = np.zeros(product_count)
+        codes_by_id = {product_id: code for code, product_id in enumerate(product_ids)}
+        async for product in Product.get_motor_collection().find({"trending_score": {"$gt": 0}}, {"trending_score": 1}):
+            stored[codes_by_id[product["_id"]]] = product["trending_score"]
+        mismatches = np.count_nonzero(~np.isclose(stored, expected, rtol=settings.TRENDING_SCORE_TOLERANCE, atol=1e-3))
+        print(f"{mismatches} stored scores differ from decayed_scores")
+    finally:
+        await client.drop_database(database)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=200000)
+    parser.add_argument("--buckets-per-product", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", default=f"{settings.DATABASE_NAME}_trending_benchmark")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.products, args.buckets_per_product, args.repeat, args.database, args.seed))
@@ -0,0 +1,45 @@
+"""
+Compute the similar products of every active product
+
+Runs the same full rebuild as the in-app job and stores the neighbor lists
+in the product_neighbors collection. Use it from cron when the in-app job
+is disabled (SIMILAR_PRODUCTS_REFRESH_INTERVAL=0), or to fill the
+collection right after a deployment.
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/compute_similar_products.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_neighbors import ProductNeighbors
+from app.services.similar_products_service import SimilarProductsService, similar_products_index
+
+async def run():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await init_beanie(database=client[settings.DATABASE_NAME], document_models=[Product, ProductNeighbors])
+
+    try:
+        started = time.perf_counter()
+        await SimilarProductsService.rebuild()
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+
+    print(f"Neighbors of {len(similar_products_index)} products computed in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    asyncio.run(run())
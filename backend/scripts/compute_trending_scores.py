@@ -0,0 +1,45 @@
+"""
+Compute the trending score of every product
+
+Runs the same scoring as the in-app job: the activity buckets within
+TRENDING_HORIZON_HOURS are decayed and summed per product, and the scores
+that moved are written to products.trending_score. Use it from cron when
+the in-app job is disabled (TRENDING_REFRESH_INTERVAL=0).
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/compute_trending_scores.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product
+from app.models.product_activity import ProductActivity
+from app.services.trending_service import TrendingService
+
+async def run():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    await init_beanie(database=client[settings.DATABASE_NAME], document_models=[Product, ProductActivity])
+
+    try:
+        started = time.perf_counter()
+        updated = await TrendingService.recompute()
+        elapsed = time.perf_counter() - started
+    finally:
+        client.close()
+
+    print(f"{updated} trending scores updated in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    asyncio.run(run())
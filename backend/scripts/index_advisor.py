@@ -0,0 +1,285 @@
+"""
+Index advisor for product listings
+
+Enumerates the filter x sort combinations search_products can generate,
+builds their queries with the service's own filter and sort code, and
+runs explain for each one against a seeded throwaway database
+(<DATABASE_NAME>_bench). Three index sets are compared:
+- current: the indexes declared in Product.Settings.indexes
+- single-field: only the single-field indexes of the model
+- proposed: single-field indexes plus ESR (equality, sort, range) compound
+  indexes, one per sort, extended with a filter-specific ESR index for each
+  combination that still examines more than --max-examined documents
+
+For every combination the report shows the winning index, whether the sort
+is done in memory and how many keys/documents were examined per page. The
+single-field indexes of the current set that no listing plan picks, or that
+prefix a compound index, are listed as candidates for removal. The proposed
+compound indexes are printed in model and init-mongo.js syntax.
+
+Text search (relevance with a search query) is served by the text index and
+the in-process search index, so it is left out.
+
+Usage (from backend/, with MongoDB reachable at MONGODB_URL):
+    python scripts/index_advisor.py --products 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from beanie import init_beanie
+from beanie.operators import And
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, ASCENDING
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models.product import Product
+from app.schemas.product import ProductFilters, ProductSort
+from app.services.product_service import ProductService
+
+IndexKey = List[Tuple[str, int]]
+
+CATEGORIES = ["robes", "caftans", "chaussures", "sacs", "bijoux", "hijabs", "enfants", "accessoires"]
+SUBCATEGORIES = ["mariage", "soiree", "quotidien"]
+COLORS = ["Rouge", "Noir", "Blanc", "Bleu", "Vert", "Beige", "Doré", "Rose"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+
+# Equality fields are placed in this order after status in ESR keys
+EQUALITY_ORDER = [
+    "status", "category", "subcategory", "boutique_id", "brand", "condition",
+    "is_featured", "is_trending", "color_names", "size_names", "in_stock_sizes",
+]
+
+def make_product(index: int, rnd: random.Random) -> Product:
+    """Product with a skewed but plausible distribution of filterable values"""
+    category = CATEGORIES[min(int(rnd.expovariate(0.45)), len(CATEGORIES) - 1)]
+    colors = rnd.sample(COLORS, rnd.randint(1, 3))
+    return Product(
+        name=f"Produit {index}",
+        slug=f"advisor-{index}",
+        description="Produit de test pour le conseiller d'index",
+        boutique_id=f"boutique-{rnd.randint(0, 299)}",
+        boutique_name="Boutique",
+        category=category,
+        subcategory=rnd.choice(SUBCATEGORIES + [None]),
+        brand=rnd.choice([None, None] + [f"Marque {b}" for b in range(40)]),
+        base_price=round(rnd.lognormvariate(8.5, 0.6), -1),
+        main_image="main.jpg",
+        condition=rnd.choices(["new", "used_like_new", "used_good", "used_fair"], [85, 8, 5, 2])[0],
+        colors=[
+            {"name": color, "color_code": "#000000", "sizes": [{"size": size, "stock": rnd.randint(0, 4)} for size in SIZES]}
+            for color in colors
+        ],
+        total_stock=0 if rnd.random() < 0.1 else rnd.randint(1, 50),
+        status=rnd.choices(["active", "inactive", "draft"], [90, 5, 5])[0],
+        is_featured=rnd.random() < 0.15,
+        is_trending=rnd.random() < 0.05,
+        views=int(rnd.expovariate(1 / 200)),
+        rating=rnd.choice([0.0, 3.5, 4.0, 4.5, 5.0]),
+        rating_count=rnd.randint(0, 40),
+        sales_count=int(rnd.expovariate(1 / 20)),
+        created_at=datetime(2024, 1, 1) + timedelta(minutes=index * 7),
+    )
+
+def workload() -> List[Tuple[str, ProductFilters]]:
+    """Filter sets the listing UI generates: the default one and one refinement at a time"""
+    return [
+        ("default", ProductFilters()),
+        ("category", ProductFilters(category="robes")),
+        ("category+subcategory", ProductFilters(category="robes", subcategory="mariage")),
+        ("boutique", ProductFilters(boutique_id="boutique-7")),
+        ("brand", ProductFilters(brand="Marque 3")),
+        ("price range", ProductFilters(min_price=3000, max_price=8000)),
+        ("category+price", ProductFilters(category="caftans", min_price=3000, max_price=8000)),
+        ("condition", ProductFilters(condition="used_good")),
+        ("featured", ProductFilters(is_featured=True)),
+        ("trending", ProductFilters(is_trending=True)),
+        ("color", ProductFilters(color="Rouge")),
+        ("size", ProductFilters(size="M")),
+        ("all stock", ProductFilters(in_stock_only=False)),
+    ]
+
+def listing_query(filters: ProductFilters) -> dict:
+    """MongoDB filter search_products sends for filters (no text search)"""
+    conditions = ProductService._filter_conditions(filters)
+    return Product.find(And(*conditions)).get_filter_query() if conditions else {}
+
+def split_predicates(query: dict) -> Tuple[List[str], List[str]]:
+    """Equality and range fields of a listing filter"""
+    clauses = query.get("$and", [query]) if query else []
+    equality, ranges = [], []
+    for clause in clauses:
+        for field, value in clause.items():
+            if isinstance(value, dict):
+                values = value.get("$in")
+                if values is not None and len(values) == 1 and len(value) == 1:
+                    equality.append(field)
+                else:
+                    ranges.append(field)
+            else:
+                equality.append(field)
+    equality.sort(key=lambda field: EQUALITY_ORDER.index(field) if field in EQUALITY_ORDER else len(EQUALITY_ORDER))
+    return equality, sorted(set(ranges))
+
+def esr_key(equality: List[str], sort: IndexKey, ranges: List[str]) -> IndexKey:
+    """Compound key: equality fields, then sort keys, then range fields"""
+    key: IndexKey = [(field, ASCENDING) for field in equality]
+    key += [(field, direction) for field, direction in sort if field not in equality]
+    key += [(field, ASCENDING) for field in ranges if field not in dict(key)]
+    return key
+
+def canonical(equality: List[str], sort: IndexKey, ranges: List[str]) -> Tuple:
+    """
+    Identity of an ESR index: a reversed scan serves the opposite sort, and
+    the direction of equality and range fields does not matter
+    """
+    if sort and sort[0][1] < 0:
+        sort = [(field, -direction) for field, direction in sort]
+    return tuple(equality), tuple(sort), tuple(ranges)
+
+def plan_stages(plan: dict) -> List[dict]:
+    """Flatten a (classic or slot-based) winning plan into its stages"""
+    stages = [plan]
+    for child in ("inputStage", "queryPlan"):
+        if child in plan:
+            stages += plan_stages(plan[child])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+async def explain(collection, query: dict, sort: IndexKey, page_size: int) -> Dict[str, object]:
+    result = await collection.find(query).sort(sort).limit(page_size).explain()
+    stages = plan_stages(result["queryPlanner"]["winningPlan"])
+    stats = result.get("executionStats", {})
+    index_names = [stage["indexName"] for stage in stages if "indexName" in stage]
+    return {
+        "index": ",".join(index_names) or "COLLSCAN",
+        "in_memory_sort": any(stage.get("stage") == "SORT" for stage in stages),
+        "keys": stats.get("totalKeysExamined", 0),
+        "docs": stats.get("totalDocsExamined", 0),
+        "returned": stats.get("nReturned", 0),
+    }
+
+async def evaluate(collection, combinations, page_size: int) -> Dict[Tuple[str, str], Dict[str, object]]:
+    return {
+        (label, sort.value): await explain(collection, query, sort_key, page_size)
+        for label, sort, query, sort_key in combinations
+    }
+
+def single_field_indexes() -> List[IndexModel]:
+    return [IndexModel([(field, ASCENDING)]) for field in Product.Settings.indexes if isinstance(field, str)]
+
+def redundancy_report(results: Dict[Tuple[str, str], Dict[str, object]]):
+    """Single-field indexes of the model that no listing plan picks, or that prefix a compound index"""
+    fields = [field for field in Product.Settings.indexes if isinstance(field, str)]
+    compound_prefixes = {
+        next(iter(index.document["key"]))
+        for index in Product.Settings.indexes if isinstance(index, IndexModel)
+    }
+    used = {name for row in results.values() for name in str(row["index"]).split(",")}
+    print("\nSingle-field indexes no listing plan uses (check the other queries before dropping):")
+    print("    " + (", ".join(field for field in fields if f"{field}_1" not in used) or "none"))
+    print("Single-field indexes prefixing a compound index (redundant):")
+    print("    " + (", ".join(field for field in fields if field in compound_prefixes) or "none"))
+
+async def use_indexes(collection, indexes: List[IndexModel]):
+    await collection.drop_indexes()
+    if indexes:
+        await collection.create_indexes(indexes)
+
+def report(title: str, results: Dict[Tuple[str, str], Dict[str, object]]):
+    print(f"\n== {title}")
+    print(f"{'filters':<22} {'sort':<11} {'index':<34} {'mem sort':>8} {'keys':>7} {'docs':>7} {'ret':>4}")
+    for (label, sort), row in results.items():
+        print(
+            f"{label:<22} {sort:<11} {str(row['index'])[:34]:<34} "
+            f"{'yes' if row['in_memory_sort'] else '':>8} {row['keys']:>7} {row['docs']:>7} {row['returned']:>4}"
+        )
+    blocking = sum(1 for row in results.values() if row["in_memory_sort"])
+    print(f"{blocking} of {len(results)} combinations sort in memory, "
+          f"{max(row['docs'] for row in results.values())} documents examined at most")
+
+def key_spec(key: IndexKey) -> str:
+    return ", ".join(f'"{field}": {direction}' for field, direction in key)
+
+async def run(product_count: int, page_size: int, max_examined: int, seed: int):
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    database = client[f"{settings.DATABASE_NAME}_bench"]
+    await init_beanie(database=database, document_models=[Product])
+    collection = Product.get_motor_collection()
+
+    try:
+        rnd = random.Random(seed)
+        await collection.delete_many({})
+        for start in range(0, product_count, 5000):
+            batch = [make_product(i, rnd) for i in range(start, min(start + 5000, product_count))]
+            for product in batch:
+                product.sync_variant_filters()
+            await Product.insert_many(batch)
+
+        combinations = []
+        for label, filters in workload():
+            query = listing_query(filters)
+            for sort in ProductSort:
+                sort_key = ProductService._sort_criteria(sort)
+                combinations.append((label, sort, query, sort_key))
+
+        print(f"{product_count} products, page size {page_size}, {len(combinations)} filter x sort combinations")
+
+        current = await evaluate(collection, combinations, page_size)
+        report("current (Product.Settings.indexes)", current)
+        redundancy_report(current)
+
+        await use_indexes(collection, single_field_indexes())
+        report("single-field indexes", await evaluate(collection, combinations, page_size))
+
+        # One ESR index per sort on the filters every listing applies
+        base_equality, base_ranges = split_predicates(listing_query(ProductFilters()))
+        proposed: Dict[Tuple, IndexKey] = {}
+        for _, sort, _, sort_key in combinations:
+            proposed.setdefault(
+                canonical(base_equality, sort_key, base_ranges),
+                esr_key(base_equality, sort_key, base_ranges)
+            )
+
+        await use_indexes(collection, single_field_indexes() + [IndexModel(key) for key in proposed.values()])
+        results = await evaluate(collection, combinations, page_size)
+
+        # Filter-specific ESR indexes where the per-sort indexes still scan too much
+        for label, sort, query, sort_key in combinations:
+            row = results[(label, sort.value)]
+            if row["docs"] > max_examined or (row["in_memory_sort"] and row["docs"] > page_size * 10):
+                equality, ranges = split_predicates(query)
+                proposed.setdefault(
+                    canonical(equality, sort_key, ranges),
+                    esr_key(equality, sort_key, ranges)
+                )
+
+        await use_indexes(collection, single_field_indexes() + [IndexModel(key) for key in proposed.values()])
+        report("proposed (single-field + ESR)", await evaluate(collection, combinations, page_size))
+
+        print("\nProposed compound indexes (Product.Settings.indexes):")
+        for key in proposed.values():
+            print(f"    IndexModel({key!r}),")
+        print("\nscripts/init-mongo.js:")
+        for key in proposed.values():
+            print(f"db.products.createIndex({{ {key_spec(key)} }});")
+    finally:
+        await client.drop_database(database.name)
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--max-examined", type=int, default=1000, help="Documents examined per page before a filter gets its own index")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.products, args.page_size, args.max_examined, args.seed))
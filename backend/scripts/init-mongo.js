@@ -25,17 +25,37 @@ db.boutiques.createIndex({ "created_at": 1 });
 db.createCollection('products');
 db.products.createIndex({ "name": "text", "description": "text", "tags": "text" });
 db.products.createIndex({ "slug": 1 }, { unique: true });
-db.products.createIndex({ "boutique_id": 1 });
 db.products.createIndex({ "category": 1 });
 db.products.createIndex({ "subcategory": 1 });
 db.products.createIndex({ "brand": 1 });
-db.products.createIndex({ "status": 1 });
-db.products.createIndex({ "base_price": 1 });
-db.products.createIndex({ "is_featured": 1 });
 db.products.createIndex({ "is_trending": 1 });
-db.products.createIndex({ "rating": 1 });
-db.products.createIndex({ "sales_count": 1 });
-db.products.createIndex({ "created_at": 1 });
+db.products.createIndex({ "trending_score": 1 });
+db.products.createIndex({ "updated_at": 1 });
+db.products.createIndex({ "color_names": 1 });
+db.products.createIndex({ "size_names": 1 });
+db.products.createIndex({ "in_stock_sizes": 1 });
+db.products.createIndex({ "boutique_id": 1, "variants.sku": 1 }, { name: "boutique_variant_sku" });
+// Listings: status equality, sort keys (with the _id tiebreaker), total_stock range
+db.products.createIndex({ "status": 1, "is_featured": -1, "rating": -1, "views": -1, "_id": -1, "total_stock": 1 }, { name: "listing_relevance" });
+db.products.createIndex({ "status": 1, "base_price": 1, "_id": 1, "total_stock": 1 }, { name: "listing_price" });
+db.products.createIndex({ "status": 1, "created_at": -1, "_id": -1, "total_stock": 1 }, { name: "listing_created" });
+db.products.createIndex({ "status": 1, "trending_score": -1, "views": -1, "_id": -1, "total_stock": 1 }, { name: "listing_trending" });
+db.products.createIndex({ "status": 1, "rating": -1, "rating_count": -1, "_id": -1, "total_stock": 1 }, { name: "listing_rating" });
+db.products.createIndex({ "status": 1, "sales_count": -1, "_id": -1, "total_stock": 1 }, { name: "listing_sales" });
+
+db.createCollection('product_neighbors');
+db.product_neighbors.createIndex({ "updated_at": 1 });
+
+db.createCollection('product_activity');
+db.product_activity.createIndex({ "product_id": 1, "bucket": 1 }, { unique: true });
+// Buckets expire after the trending horizon (TRENDING_HORIZON_HOURS) plus one bucket
+db.product_activity.createIndex({ "bucket": 1 }, { expireAfterSeconds: 336 * 3600 + 3600 });
+
+db.createCollection('category_stats');
+db.category_stats.createIndex({ "category": 1, "subcategory": 1 }, { unique: true });
+
+db.createCollection('brand_stats');
+db.brand_stats.createIndex({ "brand": 1 }, { unique: true });
 
 db.createCollection('orders');
 db.orders.createIndex({ "order_number": 1 }, { unique: true });
@@ -94,5 +114,5 @@ db.inspiration_posts.createIndex({ "created_at": 1 });
 
 // Insert sample data (optional)
 print("Database initialized successfully!");
-print("Collections created: users, boutiques, products, orders, reviews, wishlists, chat_rooms, chat_messages, inspiration_posts");
+print("Collections created: users, boutiques, products, product_neighbors, product_activity, category_stats, brand_stats, orders, reviews, wishlists, chat_rooms, chat_messages, inspiration_posts");
 print("Indexes created for optimal performance");
@@ -0,0 +1,14 @@
+import pytest_asyncio
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from app.models.order import Order
+from app.models.product import Product
+
+@pytest_asyncio.fixture
+async def database():
+    """Fresh in-memory database with the models the service tests write"""
+    client = AsyncMongoMockClient()
+    await init_beanie(database=client["test"], document_models=[Product, Order])
+    yield client["test"]
+    client.close()
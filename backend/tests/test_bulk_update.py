@@ -0,0 +1,83 @@
+import pytest
+
+from app.models.product import Product, ProductVariant
+from app.schemas.product import ProductStockPriceUpdate
+from app.services.product_service import ProductService
+
+async def product(name: str, boutique_id: str = "b1", stock: int = 5, variants=()) -> Product:
+    item = Product(
+        name=name, slug=name, description="", boutique_id=boutique_id, boutique_name="Atelier",
+        category="robes", base_price=100, main_image="robe.jpg", total_stock=stock,
+        variants=[ProductVariant(sku=sku, size=size, stock=count, price=100) for sku, size, count in variants]
+    )
+    await item.insert()
+    return item
+
+async def update(*rows: dict, user_id: str = "b1"):
+    return await ProductService.bulk_update_products([ProductStockPriceUpdate(**row) for row in rows], user_id)
+
+@pytest.mark.asyncio
+async def test_product_rows_set_price_and_stock(database):
+    robe = await product("robe")
+
+    response = await update({"product_id": str(robe.id), "total_stock": 0, "base_price": 250, "sale_price": 200})
+
+    assert response.updated == 1 and response.failed == 0
+    current = await Product.get(robe.id)
+    assert (current.total_stock, current.base_price, current.sale_price) == (0, 250, 200)
+
+@pytest.mark.asyncio
+async def test_sku_rows_update_the_variant_and_its_product_totals(database):
+    robe = await product("robe", stock=5, variants=[("R-M", "M", 2), ("R-L", "L", 3)])
+
+    response = await update({"sku": "R-M", "total_stock": 0}, {"sku": "R-L", "total_stock": 10, "base_price": 120})
+
+    assert response.updated == 2
+    current = await Product.get(robe.id)
+    assert [(variant.stock, variant.price) for variant in current.variants] == [(0, 100), (10, 120)]
+    assert current.total_stock == 10
+    assert current.in_stock_sizes == ["l"]  # Filter keys
+
+@pytest.mark.asyncio
+async def test_invalid_rows_fail_alone(database):
+    mine = await product("robe", variants=[("DUP", "S", 1)])
+    await product("caftan", variants=[("DUP", "S", 1)])
+    theirs = await product("gandoura", boutique_id="b2")
+
+    response = await update(
+        {"product_id": str(theirs.id), "total_stock": 1},
+        {"product_id": "unknown", "total_stock": 1},
+        {"sku": "ZZZ", "total_stock": 1},
+        {"sku": "DUP", "total_stock": 1},
+        {"product_id": str(mine.id)},
+        {"product_id": str(mine.id), "sku": "DUP", "total_stock": 1},
+        {"product_id": str(mine.id), "total_stock": 4},
+        {"product_id": str(mine.id), "base_price": 80},
+    )
+
+    assert [result.error for result in response.results] == [
+        "Not authorized to update this product",
+        "Product not found",
+        "SKU not found",
+        "SKU matches several products",
+        "Nothing to update",
+        "Provide either product_id or sku",
+        "Product has variants, update their stock by SKU",
+        None,
+    ]
+    assert (response.updated, response.failed) == (1, 7)
+    assert (await Product.get(theirs.id)).total_stock == 5
+
+@pytest.mark.asyncio
+async def test_later_rows_see_earlier_prices(database):
+    robe = await product("robe")
+
+    response = await update(
+        {"product_id": str(robe.id), "base_price": 250},
+        {"product_id": str(robe.id), "sale_price": 200},
+        {"product_id": str(robe.id), "base_price": 150},
+    )
+
+    assert [result.error for result in response.results] == [None, None, "Sale price must be less than base price"]
+    current = await Product.get(robe.id)
+    assert (current.base_price, current.sale_price) == (250, 200)
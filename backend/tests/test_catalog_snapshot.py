@@ -0,0 +1,81 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from app.models.product import ProductCard, ProductStatus
+from app.schemas.product import ProductFilters
+from app.services.catalog_snapshot import LocalTable, sort_keys
+
+SORTS = [
+    [("is_featured", DESCENDING), ("rating", DESCENDING), ("views", DESCENDING), ("_id", DESCENDING)],
+    [("base_price", ASCENDING), ("_id", ASCENDING)],
+    [("created_at", DESCENDING), ("_id", DESCENDING)],
+    [("trending_score", DESCENDING), ("views", DESCENDING), ("_id", DESCENDING)],
+]
+
+def card(rng: random.Random, index: int, **fields) -> ProductCard:
+    values = dict(
+        _id=ObjectId(), name=f"Produit {index}", slug=f"produit-{index}", description="",
+        boutique_id=rng.choice(["b1", "b2"]), boutique_name="Boutique",
+        category=rng.choice(["robes", "caftans", "sacs"]), brand=rng.choice([None, "Atlas", "Kabyle"]),
+        # Few distinct values, so every sort key has ties
+        base_price=rng.choice([1000.0, 2500.0, 4000.0]), main_image="image.jpg",
+        is_featured=rng.random() < 0.2, total_stock=rng.choice([0, 1, 5]),
+        views=rng.choice([0, 10, 100]), rating=rng.choice([0.0, 4.5, 5.0]),
+        trending_score=rng.choice([0.0, 2.5]),
+        created_at=datetime(2024, 1, 1) + timedelta(days=rng.randrange(5)),
+    )
+    values.update(fields)
+    return ProductCard.model_validate(values)
+
+@pytest.fixture
+def table():
+    rng = random.Random(7)
+    table = LocalTable()
+    table.build([card(rng, index) for index in range(300)])
+    return table
+
+def full_sort(table: LocalTable, filters: ProductFilters, sort_criteria):
+    """Reference: lexsort every matching row"""
+    rows = np.flatnonzero(table.mask(filters))
+    keys = sort_keys(sort_criteria)
+    return rows[np.lexsort([table.key_values(key, rows) for key in reversed(keys)])]
+
+def test_mask_applies_every_filter(table):
+    filters = ProductFilters(category="robes", brand="Atlas", min_price=2000, max_price=4000, is_featured=False)
+
+    expected = [
+        row for row, item in enumerate(table.cards)
+        if item.category == "robes" and item.brand == "Atlas" and 2000 <= item.base_price <= 4000
+        and not item.is_featured and item.total_stock > 0
+    ]
+    assert np.flatnonzero(table.mask(filters)).tolist() == expected
+
+def test_mask_of_unknown_value_is_empty(table):
+    assert not table.mask(ProductFilters(brand="Inconnue")).any()
+
+@pytest.mark.parametrize("sort_criteria", SORTS)
+@pytest.mark.parametrize("count", [1, 20, 1000])
+def test_top_matches_full_sort(table, sort_criteria, count):
+    filters = ProductFilters(in_stock_only=False)
+
+    rows, matched = table.top(filters, sort_keys(sort_criteria), count)
+
+    assert matched == len(table)
+    assert rows.tolist() == full_sort(table, filters, sort_criteria)[:count].tolist()
+
+def test_upsert_updates_rows_and_drops_inactive_products(table):
+    first = table.cards[0]
+    table.upsert(first.model_copy(update={"views": 10 ** 6, "total_stock": 3}))
+    table.discard(str(table.cards[1].id))
+    table.upsert(table.cards[2].model_copy(update={"status": ProductStatus.INACTIVE}))
+
+    rows, _ = table.top(ProductFilters(), sort_keys([("views", DESCENDING), ("_id", DESCENDING)]), 1)
+
+    assert rows.tolist() == [0]
+    assert len(table) == 298
+    assert not table.mask(ProductFilters(in_stock_only=False))[1:3].any()
@@ -0,0 +1,49 @@
+import pytest
+
+from app.schemas.product import CountStrategy, ProductFilters
+from app.services.count_service import ProductCountService
+
+@pytest.mark.parametrize("filters, filtered", [
+    (ProductFilters(), False),
+    (ProductFilters(in_stock_only=False, status=None), False),
+    (ProductFilters(category="robes"), True),
+    (ProductFilters(search="robe"), True),
+    (ProductFilters(is_featured=False), True),
+    (ProductFilters(min_price=0), True),
+])
+def test_is_filtered(filters, filtered):
+    assert ProductCountService.is_filtered(filters) is filtered
+
+@pytest.mark.parametrize("filters, unconditional", [
+    (ProductFilters(), False),
+    (ProductFilters(in_stock_only=False), False),
+    (ProductFilters(status=None), False),
+    (ProductFilters(in_stock_only=False, status=None), True),
+    (ProductFilters(in_stock_only=False, status=None, brand="Atlas"), False),
+])
+def test_is_unconditional(filters, unconditional):
+    assert ProductCountService.is_unconditional(filters) is unconditional
+
+@pytest.mark.parametrize("requested, filtered, cursor_mode, unconditional, expected", [
+    (None, False, False, True, CountStrategy.ESTIMATED),
+    # The default listing has status and stock conditions the estimate ignores
+    (None, False, False, False, CountStrategy.CACHED),
+    (None, True, False, False, CountStrategy.CACHED),
+    (None, True, True, False, CountStrategy.NONE),
+    (None, False, True, True, CountStrategy.NONE),
+    (CountStrategy.EXACT, True, True, False, CountStrategy.EXACT),
+    (CountStrategy.ESTIMATED, False, False, True, CountStrategy.ESTIMATED),
+    (CountStrategy.ESTIMATED, False, False, False, CountStrategy.CACHED),
+])
+def test_resolve_strategy(requested, filtered, cursor_mode, unconditional, expected):
+    assert ProductCountService.resolve_strategy(requested, filtered, cursor_mode, unconditional) == expected
+
+def test_estimated_count_of_filtered_listing_is_refused():
+    with pytest.raises(ValueError):
+        ProductCountService.resolve_strategy(CountStrategy.ESTIMATED, filtered=True, cursor_mode=False)
+
+def test_cache_key_ignores_field_order_and_search_case():
+    assert ProductCountService.cache_key(ProductFilters(search="  Robe  Kabyle", category="robes")) == \
+        ProductCountService.cache_key(ProductFilters(category="robes", search="robe kabyle"))
+    assert ProductCountService.cache_key(ProductFilters(category="robes")) != \
+        ProductCountService.cache_key(ProductFilters(category="sacs"))
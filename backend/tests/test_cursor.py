@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from app.utils.cursor import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+
+def raw_cursor(payload: str) -> str:
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def test_round_trip_keeps_bson_types():
+    values = [12.5, datetime(2024, 3, 1, 10, 30), ObjectId()]
+    cursor = encode_cursor("price_asc", values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, "price_asc") == values
+
+def test_round_trip_checks_types():
+    cursor = encode_cursor("relevance", [3.25, "65f0c0ffee0000000000beef"])
+
+    assert decode_cursor(cursor, "relevance", types=(float, str)) == [3.25, "65f0c0ffee0000000000beef"]
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "relevance", types=(str, str))
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "relevance", types=(float,))
+
+def test_cursor_of_another_sort_is_rejected():
+    cursor = encode_cursor("price_asc", [100.0, ObjectId()])
+
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "newest")
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    raw_cursor("not json"),
+    raw_cursor('["s", "v"]'),
+    raw_cursor('{"s": "newest", "v": 3}'),
+    raw_cursor('{"s": "newest", "v": [{"$oid": "zz"}]}'),
+    raw_cursor('{"s": "newest", "v": [{"$date": {}}]}'),
+    raw_cursor('{"s": "newest", "v": [{"$date": {"$numberLong": "x"}}]}'),
+    raw_cursor('{"s": "newest", "v": [{"$numberDecimal": 1}]}'),
+    raw_cursor('{"s": "newest", "v": [{"$binary": {"base64": 1}}]}'),
+    raw_cursor('{"s": "newest", "v": [{"$ne": null}]}'),
+    raw_cursor('{"s": "newest", "v": [[1, 2]]}'),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode("ascii"),
+])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, "newest")
+
+def test_invalid_cursor_error_is_a_value_error():
+    # Endpoints turn ValueError into 400 responses
+    assert issubclass(InvalidCursorError, ValueError)
+
+def test_keyset_filter():
+    last_id = ObjectId()
+    criteria = [("base_price", ASCENDING), ("_id", DESCENDING)]
+
+    assert keyset_filter(criteria, [100.0, last_id]) == {"$or": [
+        {"base_price": {"$gt": 100.0}},
+        {"base_price": 100.0, "_id": {"$lt": last_id}},
+    ]}
+    with pytest.raises(InvalidCursorError):
+        keyset_filter(criteria, [100.0])
@@ -0,0 +1,36 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.etag import check_not_modified, etag_matches, strong_etag, weak_etag
+
+def test_weak_comparison_ignores_the_weak_prefix():
+    etag = weak_etag("listing", 3)
+
+    assert etag == 'W/"listing-3"'
+    assert etag_matches('"listing-3"', etag)
+    assert etag_matches('W/"listing-3"', strong_etag("listing", 3))
+
+def test_any_tag_of_a_list_matches():
+    etag = strong_etag("product", "20240101120000000000")
+
+    assert etag_matches('"other", W/"product-20240101120000000000"', etag)
+    assert not etag_matches('"other", "product-20240101120000000001"', etag)
+
+def test_missing_header_never_matches_and_star_always_does():
+    etag = weak_etag("listing", 3)
+
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+    assert etag_matches(" * ", etag)
+
+def test_not_modified_raises_a_304_with_the_validators():
+    etag = weak_etag("listing", 3)
+
+    with pytest.raises(HTTPException) as raised:
+        check_not_modified('W/"listing-3"', etag)
+
+    assert raised.value.status_code == 304
+    assert raised.value.headers == {"ETag": etag, "Cache-Control": "no-cache"}
+
+def test_changed_version_is_served():
+    assert check_not_modified('W/"listing-3"', weak_etag("listing", 4)) is None
@@ -0,0 +1,38 @@
+from app.schemas.product import CountStrategy, ProductFilters, ProductSort
+from app.services.product_service import ProductService
+
+def key(filters: ProductFilters, page: int = 1, cursor=None):
+    return ProductService.listing_cache_key(filters, ProductSort.NEWEST, page, 20, cursor, CountStrategy.CACHED)
+
+def test_write_invalidates_listings_of_its_category_and_boutique_only():
+    robes = ProductFilters(category="robes")
+    caftans = ProductFilters(category="caftans")
+    boutique = ProductFilters(boutique_id="b1")
+    before = {filters.model_dump_json(): key(filters) for filters in (robes, caftans, boutique)}
+
+    ProductService._bump_generations({"robes"}, {"b1"})
+
+    assert key(robes) != before[robes.model_dump_json()]
+    assert key(boutique) != before[boutique.model_dump_json()]
+    assert key(caftans) == before[caftans.model_dump_json()]
+
+def test_any_write_invalidates_listings_without_category_or_boutique():
+    unscoped = ProductFilters(brand="Atlas")
+    before = key(unscoped)
+
+    ProductService._bump_generations({"caftans"}, set())
+
+    assert key(unscoped) != before
+
+def test_key_covers_the_request():
+    filters = ProductFilters(category="robes")
+
+    assert key(filters) == key(ProductFilters(category="robes"))
+    assert key(filters) != key(ProductFilters(category="robes", min_price=1000))
+    assert key(filters) != key(filters, page=2)
+
+def test_cursor_and_deep_pages_are_not_cached():
+    filters = ProductFilters(category="robes")
+
+    assert key(filters, cursor="opaque") is None
+    assert key(filters, page=100) is None
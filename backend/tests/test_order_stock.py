@@ -0,0 +1,57 @@
+import pytest
+
+from app.models.product import Product
+from app.services.order_service import OrderService
+
+async def product(name: str, stock: int) -> Product:
+    item = Product(
+        name=name, slug=name, description="", boutique_id="b1", boutique_name="Atelier",
+        category="robes", base_price=100, main_image="robe.jpg", total_stock=stock
+    )
+    await item.insert()
+    return item
+
+async def stock(item: Product) -> tuple:
+    current = await Product.get(item.id)
+    return current.total_stock, current.sales_count
+
+@pytest.mark.asyncio
+async def test_reserve_decrements_every_line(database):
+    robe, caftan = await product("robe", 3), await product("caftan", 1)
+
+    await OrderService._reserve_stock({str(robe.id): 2, str(caftan.id): 1}, {})
+
+    assert await stock(robe) == (1, 2)
+    assert await stock(caftan) == (0, 1)
+
+@pytest.mark.asyncio
+async def test_short_line_refuses_the_order_and_gives_back_the_others(database):
+    robe, caftan = await product("robe", 3), await product("caftan", 1)
+    products = {str(robe.id): robe, str(caftan.id): caftan}
+
+    with pytest.raises(ValueError, match="caftan is out of stock"):
+        await OrderService._reserve_stock({str(robe.id): 2, str(caftan.id): 2}, products)
+
+    assert await stock(robe) == (3, 0)
+    assert await stock(caftan) == (1, 0)
+
+@pytest.mark.asyncio
+async def test_deleted_product_is_reported_as_not_found(database):
+    robe, caftan = await product("robe", 3), await product("caftan", 1)
+    products = {str(robe.id): robe, str(caftan.id): caftan}
+    await caftan.delete()
+
+    with pytest.raises(ValueError, match=f"Product {caftan.id} not found"):
+        await OrderService._reserve_stock({str(robe.id): 1, str(caftan.id): 1}, products)
+
+    assert await stock(robe) == (3, 0)
+
+@pytest.mark.asyncio
+async def test_release_gives_back_reserved_stock(database):
+    robe = await product("robe", 3)
+    await OrderService._reserve_stock({str(robe.id): 2}, {})
+
+    await OrderService._release_stock({str(robe.id): 2})
+    await OrderService._release_stock({})
+
+    assert await stock(robe) == (3, 0)
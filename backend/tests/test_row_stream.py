@@ -0,0 +1,61 @@
+import pytest
+
+from app.utils.row_stream import iter_csv_rows, iter_lines, iter_ndjson_rows
+
+async def chunks(data: bytes, size: int = 7):
+    """The upload split in small chunks, cutting through lines and UTF-8 sequences"""
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+async def collect(rows):
+    return [row async for row in rows]
+
+@pytest.mark.asyncio
+async def test_lines_are_numbered_across_chunks():
+    data = "\ufeffrobe brodée\r\ncaftan\n\nsac".encode("utf-8")
+
+    lines = await collect(iter_lines(chunks(data), 100))
+
+    assert lines == [(1, "robe brodée"), (2, "caftan"), (3, ""), (4, "sac")]
+
+@pytest.mark.asyncio
+async def test_oversized_line_is_skipped():
+    data = b"ok\n" + b"x" * 50 + b"\nfine\n"
+
+    lines = await collect(iter_lines(chunks(data, 4), 10))
+
+    assert lines == [(1, "ok"), (2, None), (3, "fine")]
+
+@pytest.mark.asyncio
+async def test_ndjson_rows_and_errors():
+    data = b'{"name": "Robe"}\n\n[1, 2]\n{"name": \n{"name": "Sac"}'
+
+    rows = await collect(iter_ndjson_rows(chunks(data), 100))
+
+    assert [(line, row) for line, row, _ in rows] == [(1, {"name": "Robe"}), (3, None), (4, None), (5, {"name": "Sac"})]
+    assert rows[1][2] == "Expected a JSON object"
+    assert rows[2][2].startswith("Invalid JSON")
+
+@pytest.mark.asyncio
+async def test_csv_rows_keep_non_empty_cells_and_multiline_quotes():
+    data = (
+        'name,description,brand\n'
+        'Robe,"Brodée\nà la main",\n'
+        '\n'
+        'Sac,Cuir,Atlas\n'
+        'Trop,de,cellules,ici\n'
+    ).encode("utf-8")
+
+    rows = await collect(iter_csv_rows(chunks(data), 100))
+
+    assert rows == [
+        (2, {"name": "Robe", "description": "Brodée\nà la main"}, None),
+        (5, {"name": "Sac", "description": "Cuir", "brand": "Atlas"}, None),
+        (6, None, "Expected 3 columns, got 4"),
+    ]
+
+@pytest.mark.asyncio
+async def test_csv_unterminated_quote():
+    rows = await collect(iter_csv_rows(chunks(b'name\n"Robe\n'), 100))
+
+    assert rows == [(2, None, "Unterminated quoted cell")]
@@ -0,0 +1,51 @@
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.product import ProductStatus
+from app.services import product_service
+from app.services.product_service import ProductService
+from app.services.search_service import ProductSearchIndex, SearchDocument
+
+def document(name: str, description: str = "", **fields) -> SearchDocument:
+    return SearchDocument.model_validate({"_id": ObjectId(), "name": name, "description": description, **fields})
+
+def build(*documents: SearchDocument) -> ProductSearchIndex:
+    index = ProductSearchIndex()
+    for item in documents:
+        index.add(item)
+    return index
+
+def test_name_match_ranks_above_description_match():
+    in_name = document("Robe kabyle", "Tenue traditionnelle")
+    in_description = document("Tenue de fête", "Inspirée de la robe kabyle")
+    unrelated = document("Sac en cuir", "Cuir de Tlemcen")
+    index = build(in_description, unrelated, in_name)
+
+    ranked = [product_id for product_id, _ in index.search("robe kabyle")]
+
+    assert ranked == [str(in_name.id), str(in_description.id)]
+
+def test_last_word_matches_as_prefix():
+    robe = document("Robe de soirée")
+    index = build(robe, document("Babouches brodées"))
+
+    assert [product_id for product_id, _ in index.search("rob")] == [str(robe.id)]
+
+def test_removed_and_inactive_products_are_not_found():
+    removed = document("Robe kabyle")
+    inactive = document("Robe kabyle", status=ProductStatus.INACTIVE)
+    index = build(removed, inactive)
+    index.remove(str(removed.id))
+
+    assert len(index) == 0
+    assert index.search("robe") == []
+
+def test_search_beyond_the_candidate_limit_falls_back_to_text_index(monkeypatch):
+    index = build(*(document(f"Robe {number}") for number in range(3)))
+    index.ready = True
+    monkeypatch.setattr(product_service, "product_search_index", index)
+
+    # A truncated candidate list would drop matches once filters apply
+    monkeypatch.setattr(settings, "SEARCH_MAX_CANDIDATES", 2)
+    condition, search_scores, text_search = ProductService._search_condition("robe")
+    assert search_scores is None and text_search
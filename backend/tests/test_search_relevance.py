@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from app.services.search_service import TEXT_RELEVANCE_EXPRESSION, blend_relevance, is_text_searchable
+
+def evaluate(expression, document: dict, text_score: float):
+    """Evaluate the aggregation operators used by TEXT_RELEVANCE_EXPRESSION"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return document[expression[1:]]
+    if not isinstance(expression, dict):
+        return expression
+    (operator, arguments), = expression.items()
+    if operator == "$meta":
+        return text_score
+    if operator == "$cond":
+        condition, then, otherwise = (evaluate(argument, document, text_score) for argument in arguments)
+        return then if condition else otherwise
+    if operator == "$log10":
+        return math.log10(evaluate(arguments, document, text_score))
+    values = [evaluate(argument, document, text_score) for argument in arguments]
+    return {"$multiply": math.prod, "$add": sum, "$max": max}[operator](values)
+
+PRODUCTS = [
+    ({"rating": 0.0, "views": 0, "is_featured": False}, 2.0),
+    ({"rating": 5.0, "views": 10, "is_featured": False}, 2.0),
+    ({"rating": 4.0, "views": 5000, "is_featured": True}, 2.0),
+    ({"rating": 0.0, "views": 0, "is_featured": False}, 3.0),
+    ({"rating": 5.0, "views": 1000000, "is_featured": True}, 1.0),
+]
+
+@pytest.mark.parametrize("document, text_score", PRODUCTS)
+def test_text_expression_matches_blend(document, text_score):
+    assert evaluate(TEXT_RELEVANCE_EXPRESSION, document, text_score) == pytest.approx(
+        blend_relevance(text_score, document["rating"], document["views"], document["is_featured"])
+    )
+
+def test_ranking_order():
+    def rank(score):
+        return sorted(range(len(PRODUCTS)), key=lambda index: -score(*PRODUCTS[index]))
+
+    by_blend = rank(lambda document, text_score: blend_relevance(
+        text_score, document["rating"], document["views"], document["is_featured"]
+    ))
+    by_text_index = rank(lambda document, text_score: evaluate(TEXT_RELEVANCE_EXPRESSION, document, text_score))
+
+    # Popularity orders equal text matches and can lift a product over a
+    # slightly better match, but not over one with twice its text score
+    assert by_blend == by_text_index == [2, 3, 1, 0, 4]
+
+def test_negative_views_do_not_lower_relevance():
+    assert blend_relevance(1.0, 0.0, -5, False) == blend_relevance(1.0, 0.0, 0, False)
+
+@pytest.mark.parametrize("query, searchable", [
+    ("robe kabyle", True),
+    ("robe de soirée", True),  # Stopwords are ignored
+    ("robe ka", False),  # Partial word, needs substring matching
+    ("de la", False),
+    ("", False),
+])
+def test_is_text_searchable(query, searchable):
+    assert is_text_searchable(query) is searchable
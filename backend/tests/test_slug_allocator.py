@@ -0,0 +1,72 @@
+import re
+
+import pytest
+
+from app.services.slug_allocator import SlugAllocator
+
+class Cursor:
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class Collection:
+    """Slugs in use, answering the allocator's anchored $regex lookups"""
+
+    def __init__(self, slugs):
+        self.slugs = slugs
+        self.queries = 0
+
+    def find(self, query, projection):
+        self.queries += 1
+        patterns = [re.compile(condition["slug"]["$regex"]) for condition in query["$or"]]
+        return Cursor({"slug": slug} for slug in self.slugs if any(pattern.search(slug) for pattern in patterns))
+
+class Model:
+    collection = None
+
+    @classmethod
+    def get_motor_collection(cls):
+        return cls.collection
+
+def allocator(*taken: str) -> SlugAllocator:
+    Model.collection = Collection(list(taken))
+    return SlugAllocator(Model)
+
+@pytest.mark.asyncio
+async def test_free_base_slug_is_used_as_is():
+    assert await allocator("robe-de-soiree").next_slug("Robe kabyle") == "robe-kabyle"
+
+@pytest.mark.asyncio
+async def test_next_suffix_follows_the_highest_in_use():
+    # Gaps are not refilled, and other bases sharing the prefix are ignored
+    slugs = allocator("robe-kabyle", "robe-kabyle-3", "robe-kabyle-brodee")
+
+    assert await slugs.next_slug("Robe Kabyle") == "robe-kabyle-4"
+
+@pytest.mark.asyncio
+async def test_batch_allocates_distinct_slugs_with_one_query():
+    slugs = allocator("caftan")
+
+    assert await slugs.allocate(["Caftan", "Sac", "Caftan", "sac"]) == ["caftan-1", "sac", "caftan-2", "sac-1"]
+    assert Model.collection.queries == 1
+
+@pytest.mark.asyncio
+async def test_suffixed_looking_base_skips_slugs_held_by_another_base():
+    slugs = allocator("robe", "robe-2")
+
+    assert await slugs.allocate(["Robe 2", "Robe"]) == ["robe-2-1", "robe-3"]
+
+@pytest.mark.asyncio
+async def test_empty_batch_does_not_query():
+    slugs = allocator()
+
+    assert await slugs.allocate([]) == []
+    assert Model.collection.queries == 0
@@ -0,0 +1,66 @@
+from bson import ObjectId
+
+from app.core.config import settings
+from app.models.product import ProductStatus
+from app.services.suggest_service import SuggestDocument, SuggestionIndex
+
+def product(name: str, views: int = 0, **fields) -> SuggestDocument:
+    return SuggestDocument.model_validate({
+        "_id": ObjectId(), "name": name, "slug": name.lower().replace(" ", "-"), "category": "robes",
+        "views": views, **fields
+    })
+
+def texts(suggestions):
+    return [suggestion["text"] for suggestion in suggestions]
+
+def test_matches_any_word_start_ignoring_accents():
+    index = SuggestionIndex()
+    index.add(product("Robe kabyle brodée"))
+
+    assert texts(index.suggest("kab")) == ["Robe kabyle brodée"]
+    assert texts(index.suggest("brode")) == ["Robe kabyle brodée"]
+    assert index.suggest("yle") == []
+
+def test_product_suggestions_link_to_the_most_popular_product():
+    index = SuggestionIndex()
+    quiet = product("Caftan velours", views=1)
+    popular = product("Caftan velours", views=500)
+    index.add(quiet)
+    index.add(popular)
+
+    suggestion, = [item for item in index.suggest("caftan") if item["kind"] == "product"]
+
+    assert suggestion["product_id"] == str(popular.id)
+    assert suggestion["slug"] == popular.slug
+
+def test_popular_products_rank_first_and_categories_are_boosted():
+    index = SuggestionIndex()
+    index.add(product("Robe simple", views=2))
+    index.add(product("Robe de mariée", views=5000))
+
+    suggestions = index.suggest("robe")
+
+    # A category backed by two products beats a product name viewed twice
+    assert texts(suggestions) == ["Robe de mariée", "robes", "Robe simple"]
+    assert suggestions[1]["kind"] == "category"
+
+def test_queries_are_suggested_once_searched_often_enough():
+    index = SuggestionIndex()
+    for _ in range(settings.SUGGEST_MIN_QUERY_COUNT - 1):
+        index.record_query("Tenue de soirée")
+    assert index.suggest("tenue") == []
+
+    index.record_query("tenue de soiree")
+
+    assert index.suggest("tenue") == [{"text": "Tenue de soirée", "kind": "query", "product_id": None, "slug": None}]
+
+def test_removed_and_inactive_products_leave_no_suggestion():
+    index = SuggestionIndex()
+    removed = product("Babouches cuir", brand="Atlas")
+    index.add(removed)
+    index.add(product("Babouches brodées", status=ProductStatus.INACTIVE))
+    index.remove(str(removed.id))
+
+    assert len(index) == 0
+    assert index.suggest("ba") == []
+    assert index.suggest("atlas") == []
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.trending_service import ACTIVITY_KINDS, activity_weights, bucket_start, decayed_score_expression, decayed_scores
+
+HALF_LIFE = settings.TRENDING_HALF_LIFE_HOURS
+
+def scores(codes, ages_hours, counts, product_count):
+    return decayed_scores(
+        np.array(codes), np.array(ages_hours, dtype=float), np.array(counts, dtype=float),
+        activity_weights(), HALF_LIFE, product_count
+    )
+
+def evaluate(expression, row: dict):
+    """Evaluate the aggregation operators used by decayed_score_expression on one bucket"""
+    if isinstance(expression, str) and expression.startswith("$"):
+        return row.get(expression[1:])
+    if not isinstance(expression, dict):
+        return expression
+    (operator, arguments), = expression.items()
+    if operator == "$sum":
+        return evaluate(arguments, row)
+    if operator == "$ifNull":
+        value = evaluate(arguments[0], row)
+        return evaluate(arguments[1], row) if value is None else value
+    values = [evaluate(argument, row) for argument in arguments]
+    if operator == "$subtract" and isinstance(values[0], datetime):
+        # Date difference in milliseconds
+        return (values[0] - values[1]) / timedelta(milliseconds=1)
+    return {
+        "$add": lambda: sum(values),
+        "$multiply": lambda: np.prod(values),
+        "$subtract": lambda: values[0] - values[1],
+        "$divide": lambda: values[0] / values[1],
+        "$max": lambda: max(values),
+        "$pow": lambda: values[0] ** values[1],
+    }[operator]()
+
+def test_activity_halves_every_half_life():
+    fresh, old = scores([0, 1], [0.0, HALF_LIFE], [[10, 0, 0], [10, 0, 0]], 2)
+
+    assert old == pytest.approx(fresh / 2)
+
+def test_buckets_are_weighted_and_summed_per_product():
+    result = scores([0, 0, 2], [0.0, 0.0, 0.0], [[1, 0, 0], [0, 1, 1], [0, 0, 0]], 3)
+
+    weights = activity_weights()
+    assert result.tolist() == pytest.approx([weights.sum(), 0.0, 0.0])
+
+def test_cancelled_sales_do_not_make_scores_negative():
+    result = scores([0, 0], [0.0, 1.0], [[0, 1, 0], [0, -3, 0]], 1)
+
+    assert result.tolist() == [0.0]
+
+def test_server_side_expression_matches_decayed_scores():
+    now = datetime(2024, 5, 10, 14, 25)
+    accumulator = decayed_score_expression(now)
+    buckets = [
+        {"bucket": bucket_start(now), "views": 4, "sales": 1},
+        {"bucket": bucket_start(now) - timedelta(hours=30), "views": 12, "wishlists": 2},
+        {"bucket": bucket_start(now) - timedelta(hours=200), "views": 40, "sales": 2, "wishlists": 1},
+    ]
+
+    server_side = sum(evaluate(accumulator, row) for row in buckets)
+
+    # Age of the middle of each bucket
+    ages_hours = [
+        max((now - row["bucket"]).total_seconds() / 3600 - settings.TRENDING_BUCKET_SECONDS / 7200, 0.0)
+        for row in buckets
+    ]
+    counts = [[row.get(kind, 0) for kind in ACTIVITY_KINDS] for row in buckets]
+    assert server_side == pytest.approx(scores([0, 0, 0], ages_hours, counts, 1)[0])
+
+def test_bucket_start():
+    assert bucket_start(datetime(2024, 1, 1, 10, 37, 12)) == datetime(2024, 1, 1, 10, 0)
@@ -0,0 +1,46 @@
+from bson import ObjectId
+
+from app.services.search_service import ProductSearchIndex, SearchDocument, TrigramIndex, term_trigrams
+
+def document(name: str, description: str = "", **fields) -> SearchDocument:
+    return SearchDocument.model_validate({"_id": ObjectId(), "name": name, "description": description, **fields})
+
+def build(*documents: SearchDocument) -> ProductSearchIndex:
+    index = ProductSearchIndex()
+    for item in documents:
+        index.add(item)
+    return index
+
+def test_trigrams_ignore_vowels_in_the_skeleton():
+    # Arabic spellings drop short vowels: the consonant skeletons still match
+    assert term_trigrams("caftan") & term_trigrams("kftn")
+
+def test_trigram_similar_ranks_closest_spelling_first():
+    index = TrigramIndex()
+    for term in ("caftan", "kaftan", "karakou", "chaussure"):
+        index.add(term)
+
+    matches = index.similar("caftane", 0.45, 10)
+
+    assert [term for term, _ in matches][:2] == ["caftan", "kaftan"]
+    assert "chaussure" not in [term for term, _ in matches]
+    assert all(0.45 <= similarity <= 1 for _, similarity in matches)
+
+def test_trigram_remove():
+    index = TrigramIndex()
+    index.add("caftan")
+    index.add("caftan")
+    index.remove("caftan")
+
+    assert len(index) == 0
+    assert index.similar("caftan", 0.45, 10) == []
+
+def test_misspelled_word_matches_fuzzily_with_a_lower_score():
+    exact = document("Caftan brodé")
+    index = build(exact, document("Karakou velours"))
+
+    exact_score = dict(index.search("caftan"))[str(exact.id)]
+    fuzzy = dict(index.search("caftane"))
+
+    assert set(fuzzy) == {str(exact.id)}
+    assert 0 < fuzzy[str(exact.id)] < exact_score
@@ -13,7 +13,8 @@ export default {
     const corsHeaders = {
       'Access-Control-Allow-Origin': env.CORS_ORIGINS || '*',
       'Access-Control-Allow-Methods': 'GET,HEAD,POST,OPTIONS,PUT,DELETE,PATCH',
-      'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Requested-With',
+      'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Requested-With,If-None-Match',
+      'Access-Control-Expose-Headers': 'ETag',
       'Access-Control-Max-Age': '86400',
     };
     
@@ -27,23 +28,25 @@ export default {
     
     try {
       // Proxy la requête vers le backend
+      // Les Headers ne se copient pas avec "...": on les recopie explicitement,
+      // sinon If-None-Match n'atteint pas le backend et l'ETag ne revient pas
+      const requestHeaders = new Headers(request.headers);
+      requestHeaders.set('Host', new URL(backendUrl).host);
       const response = await fetch(proxyUrl, {
         method: request.method,
-        headers: {
-          ...request.headers,
-          'Host': new URL(backendUrl).host,
-        },
+        headers: requestHeaders,
         body: request.method !== 'GET' && request.method !== 'HEAD' ? request.body : undefined,
       });
       
-      // Copier la réponse avec headers CORS
-      const modifiedResponse = new Response(response.body, {
+      // Copier la réponse avec headers CORS (une 304 reste sans corps)
+      const responseHeaders = new Headers(response.headers);
+      for (const [name, value] of Object.entries(corsHeaders)) {
+        responseHeaders.set(name, value);
+      }
+      const modifiedResponse = new Response(response.status === 304 ? null : response.body, {
         status: response.status,
         statusText: response.statusText,
-        headers: {
-          ...response.headers,
-          ...corsHeaders,
-        },
+        headers: responseHeaders,
       });
       
       return modifiedResponse;
@@ -90,12 +90,15 @@ export const productService = {
     sort = 'relevance',
     filters: ProductFilters = {}
   ): Promise<ProductListResponse> {
+    // The size filter is sent as product_size, "size" is the page size
+    const { size: productSize, ...otherFilters } = filters;
     const params = new URLSearchParams({
       page: page.toString(),
       size: size.toString(),
       sort,
       ...Object.fromEntries(
-        Object.entries(filters).filter(([_, value]) => value !== undefined && value !== '')
+        Object.entries({ ...otherFilters, product_size: productSize })
+          .filter(([_, value]) => value !== undefined && value !== '')
       )
     });
 